@@ -0,0 +1,223 @@
+# annotated_export.py
+"""
+Exports a folder's stored detections as annotated images and a QA report.
+
+Every image that has detections (from the last folder analysis or the
+detection cache) is decoded on a worker thread, its boxes are drawn onto an
+off-screen QImage with the same overlay the viewer shows, and the result is
+written to <output>/annotated/ with a thumbnail in <output>/thumbnails/.
+report.csv, report.json and report.html list every image with its defect
+counts and are written row by row as images finish, in folder order.
+
+At most two images per worker are in flight, so memory stays at a few
+decoded images however many files a folder holds.
+"""
+import collections
+import csv
+import html
+import json
+import logging
+import os
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from image_loader import load_image_file
+from overlay import draw_detections
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 160
+ANNOTATED_QUALITY = 92
+THUMBNAIL_QUALITY = 85
+ANNOTATED_DIR = "annotated"
+THUMBNAILS_DIR = "thumbnails"
+REPORT_FIELDS = ('file', 'status', 'width', 'height', 'num_detections', 'counts', 'annotated', 'thumbnail', 'error')
+_KEPT_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')  # Anything else (e.g. GIF) is written as PNG
+
+
+def annotated_file_name(file_path):
+    name = os.path.basename(file_path)
+    return name if name.lower().endswith(_KEPT_SUFFIXES) else name + '.png'
+
+
+def render_annotated(file_path, detections, output_dir, thumbnail_size=THUMBNAIL_SIZE):
+    """
+    Draws detections onto file_path off-screen and writes the annotated image
+    and its JPEG thumbnail under output_dir. Safe on worker threads.
+    Returns (width, height, annotated path, thumbnail path) relative to output_dir.
+    """
+    decoded = load_image_file(file_path)
+    has_alpha = decoded.pixels.shape[2] == 4
+    # A converted copy: the decoded pixels are read-only and the overlay paints fastest on 32-bit formats
+    canvas = decoded.qimage.convertToFormat(QImage.Format_ARGB32_Premultiplied if has_alpha else QImage.Format_RGB32)
+    draw_detections(canvas, detections)
+
+    annotated = os.path.join(ANNOTATED_DIR, annotated_file_name(file_path))
+    if not canvas.save(os.path.join(output_dir, annotated), None, ANNOTATED_QUALITY):
+        raise OSError(f"Could not write {annotated}")
+    thumbnail = os.path.join(THUMBNAILS_DIR, os.path.basename(file_path) + '.jpg')
+    small = canvas.scaled(thumbnail_size, thumbnail_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    if not small.save(os.path.join(output_dir, thumbnail), 'JPEG', THUMBNAIL_QUALITY):
+        raise OSError(f"Could not write {thumbnail}")
+    return decoded.width, decoded.height, annotated, thumbnail
+
+
+class ReportWriter:
+    """Streams export records into report.csv, report.json and report.html under output_dir."""
+
+    def __init__(self, output_dir, title):
+        self.output_dir = output_dir
+        self._csv_file = open(os.path.join(output_dir, 'report.csv'), 'w', newline='', encoding='utf-8')
+        self._csv = csv.DictWriter(self._csv_file, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        self._csv.writeheader()
+        self._json = open(os.path.join(output_dir, 'report.json'), 'w', encoding='utf-8')
+        self._json.write('{"title": %s, "images": [' % json.dumps(title))
+        self._json_rows = 0
+        self._html = open(os.path.join(output_dir, 'report.html'), 'w', encoding='utf-8')
+        self._html.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title>\n<style>\n"
+            "body { font-family: sans-serif; margin: 1.5em; }\n"
+            "table { border-collapse: collapse; }\n"
+            "td, th { border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }\n"
+            ".error, .skipped { color: #a00; }\n"
+            "</style></head><body>\n"
+            f"<h1>{html.escape(title)}</h1>\n<table>\n"
+            "<tr><th>Image</th><th>File</th><th>Size</th><th>Detections</th><th>Defects</th></tr>\n"
+        )
+
+    def write(self, record):
+        self._csv.writerow(dict(record, counts=json.dumps(record.get('counts') or {}, sort_keys=True)))
+        self._json.write((',\n' if self._json_rows else '\n') + json.dumps(record, sort_keys=True))
+        self._json_rows += 1
+        self._html.write(self._html_row(record))
+
+    @staticmethod
+    def _html_row(record):
+        if record.get('thumbnail'):
+            image = (f"<a href=\"{urllib.parse.quote(record['annotated'])}\">"
+                     f"<img src=\"{urllib.parse.quote(record['thumbnail'])}\" alt=\"\"></a>")
+        else:
+            image = ""
+        if record['status'] == 'ok':
+            size = f"{record['width']}&times;{record['height']}"
+            defects = ", ".join(f"{html.escape(name)}: {count}" for name, count in sorted(record['counts'].items()))
+            detections = str(record['num_detections'])
+        else:
+            size = detections = ""
+            defects = f"<span class=\"{'error' if record['status'] == 'error' else 'skipped'}\">" \
+                      f"{html.escape(record.get('error') or record['status'])}</span>"
+        return (f"<tr><td>{image}</td><td>{html.escape(record['file'])}</td><td>{size}</td>"
+                f"<td>{detections}</td><td>{defects}</td></tr>\n")
+
+    def close(self, summary):
+        """Finishes all three reports with the export summary and closes them."""
+        self._csv_file.close()
+        self._json.write('\n], "summary": %s}\n' % json.dumps(summary, sort_keys=True))
+        self._json.close()
+        totals = "".join(f"<tr><td>{html.escape(name)}</td><td>{count}</td></tr>"
+                         for name, count in sorted(summary['class_counts'].items()))
+        self._html.write(
+            "</table>\n<h2>Summary</h2>\n"
+            f"<p>{summary['exported']} annotated images, {summary['not_analyzed']} not analyzed, "
+            f"{len(summary['failed'])} unreadable; {summary['detections']} detections.</p>\n"
+            f"<table><tr><th>Defect</th><th>Count</th></tr>{totals}</table>\n</body></html>\n"
+        )
+        self._html.close()
+
+
+class AnnotatedExporter(QObject):
+    """
+    Renders annotated copies of a list of images and writes the reports.
+
+    lookup(file_path) returns the image's stored Detections, or None if it
+    has not been analyzed; detections below min_conf are left out. run() is
+    meant to be executed on an InferenceWorkerPool thread and renders on its
+    own pool of `workers` threads; progress is delivered on the GUI thread.
+    """
+    # done, total, images per second
+    progress = pyqtSignal(int, int, float)
+
+    def __init__(self, lookup, min_conf=0.0, workers=4, thumbnail_size=THUMBNAIL_SIZE, parent=None):
+        super().__init__(parent)
+        self.lookup = lookup
+        self.min_conf = min_conf
+        self.workers = max(1, int(workers))
+        self.thumbnail_size = thumbnail_size
+
+    def _export_one(self, file_path, output_dir):
+        record = {'file': os.path.basename(file_path), 'path': file_path}
+        try:
+            detections = self.lookup(file_path)
+            if detections is None:
+                record.update(status='not analyzed')
+                return record
+            detections = detections.filtered(self.min_conf)
+            width, height, annotated, thumbnail = render_annotated(file_path, detections, output_dir,
+                                                                   self.thumbnail_size)
+        except Exception as e:
+            logger.warning("Export: could not render %s: %s", os.path.basename(file_path), e)
+            record.update(status='error', error=str(e))
+            return record
+        record.update(status='ok', width=width, height=height, num_detections=len(detections),
+                      counts=detections.counts(), annotated=annotated, thumbnail=thumbnail)
+        return record
+
+    def run(self, file_paths, output_dir, cancel_event=None):
+        """
+        Exports file_paths into output_dir and returns a summary dict with the
+        number of exported and not-analyzed images, the unreadable files,
+        per-class totals and the report paths. Stops early if cancel_event is set.
+        """
+        start = time.perf_counter()
+        for subdirectory in (ANNOTATED_DIR, THUMBNAILS_DIR):
+            os.makedirs(os.path.join(output_dir, subdirectory), exist_ok=True)
+        total = len(file_paths)
+        summary = {'total': total, 'exported': 0, 'not_analyzed': 0, 'failed': [], 'detections': 0,
+                   'output_dir': output_dir, 'report': os.path.join(output_dir, 'report.html')}
+        class_counts = collections.Counter()
+        writer = ReportWriter(output_dir, f"Defect report: {os.path.basename(os.path.dirname(file_paths[0]))}"
+                              if file_paths else "Defect report")
+        done = 0
+        report_every = max(1, total // 100)
+        max_in_flight = self.workers * 2
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = collections.deque()
+                paths = iter(file_paths)
+                while True:
+                    cancelled = cancel_event is not None and cancel_event.is_set()
+                    while not cancelled and len(pending) < max_in_flight:
+                        path = next(paths, None)
+                        if path is None:
+                            break
+                        pending.append(pool.submit(self._export_one, path, output_dir))
+                    if not pending:
+                        break
+                    # Oldest first, so the reports list images in folder order
+                    record = pending.popleft().result()
+                    writer.write(record)
+                    if record['status'] == 'ok':
+                        summary['exported'] += 1
+                        summary['detections'] += record['num_detections']
+                        class_counts.update(record['counts'])
+                    elif record['status'] == 'error':
+                        summary['failed'].append(record['path'])
+                    else:
+                        summary['not_analyzed'] += 1
+                    done += 1
+                    if done % report_every == 0 or done == total:
+                        elapsed = time.perf_counter() - start
+                        self.progress.emit(done, total, done / elapsed if elapsed > 0 else 0.0)
+        finally:
+            summary['class_counts'] = dict(class_counts)
+            summary['processed'] = done
+            summary['elapsed'] = time.perf_counter() - start
+            writer.close({key: value for key, value in summary.items() if key not in ('output_dir', 'report')})
+        if done < total:
+            logger.debug("Export cancelled after %s of %s images.", done, total)
+        return summary
@@ -0,0 +1,89 @@
+# app_logging.py
+"""
+Logging setup for the viewer.
+
+Modules log through logging.getLogger(__name__). configure_logging() sends
+records at the configured level to stderr; ConsoleWidget additionally shows
+INFO and above through a RingBufferHandler. Hot-path details (per click,
+per frame) are logged at DEBUG so they cost only a level check by default;
+set IMAGE_VIEWER_LOG_LEVEL=DEBUG to see them.
+"""
+import collections
+import logging
+import sys
+import threading
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+CONSOLE_FORMAT = "[%(asctime)s] %(message)s"
+CONSOLE_WARNING_FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
+CONSOLE_DATE_FORMAT = "%H:%M:%S"
+DEFAULT_RING_CAPACITY = 2000
+
+_stderr_handler = None
+
+
+def configure_logging(level="INFO", stream=None):
+    """
+    Sets the stderr level and installs the stderr handler once; later calls
+    only change the level. The root logger stays at INFO or below so the
+    console panel keeps its INFO records whatever stderr shows; the stderr
+    handler filters by level itself.
+    """
+    global _stderr_handler
+    level = getattr(logging, str(level).upper(), logging.INFO)
+    root = logging.getLogger()
+    root.setLevel(min(level, logging.INFO))
+    if _stderr_handler is None:
+        _stderr_handler = logging.StreamHandler(stream or sys.stderr)
+        _stderr_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(_stderr_handler)
+    _stderr_handler.setLevel(level)
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """CONSOLE_FORMAT, with the level name in front of warnings and errors."""
+
+    def formatMessage(self, record):
+        if record.levelno >= logging.WARNING:
+            return CONSOLE_WARNING_FORMAT % record.__dict__
+        return super().formatMessage(record)
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the most recent `capacity` formatted records in a bounded deque.
+
+    emit() only takes a lock and appends, so any thread may log; the GUI
+    thread collects new lines with drain() on its own schedule. When more
+    than `capacity` records arrive between drains the oldest are dropped
+    and counted in drain()'s second return value.
+    """
+
+    def __init__(self, capacity=DEFAULT_RING_CAPACITY, level=logging.INFO):
+        super().__init__(level)
+        self._records = collections.deque(maxlen=capacity)
+        self._records_lock = threading.Lock()
+        self._dropped = 0
+        self.setFormatter(_ConsoleFormatter(CONSOLE_FORMAT, CONSOLE_DATE_FORMAT))
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._records_lock:
+            if len(self._records) == self._records.maxlen:
+                self._dropped += 1
+            self._records.append((record.levelno, line))
+
+    def hasPending(self):
+        return bool(self._records)
+
+    def drain(self):
+        """Returns ([(levelno, line), ...], dropped_count) for everything logged since the last drain."""
+        with self._records_lock:
+            records = list(self._records)
+            self._records.clear()
+            dropped, self._dropped = self._dropped, 0
+        return records, dropped
@@ -0,0 +1,16 @@
+# app_paths.py
+import os
+import sys
+
+APP_NAME = "image_viewer"
+
+
+def user_cache_dir(*parts):
+    """Returns (and creates) a per-user cache directory for the viewer, optionally a subdirectory of it."""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
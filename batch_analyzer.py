@@ -0,0 +1,119 @@
+# batch_analyzer.py
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from detections import detections_from_results
+from image_loader import load_image_file
+from perf_trace import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 8
+
+
+def _decode_rgb(file_path):
+    try:
+        return load_image_file(file_path).rgb_array()
+    except Exception as e:
+        logger.warning("Batch analysis: could not decode %s: %s", os.path.basename(file_path), e)
+        return None
+
+
+class BatchAnalyzer(QObject):
+    """
+    Runs the detection model over a list of files in tensor batches.
+
+    run() is meant to be executed on an InferenceWorkerPool thread; progress is
+    reported through the progress signal, which Qt delivers on the GUI thread.
+    """
+    # done, total, images per second
+    progress = pyqtSignal(int, int, float)
+
+    def __init__(self, model, batch_size=DEFAULT_BATCH_SIZE, decode_threads=4,
+                 cache=None, weights_hash=None, duplicates=None, reuse_duplicates=True, parent=None):
+        super().__init__(parent)
+        self.model = model
+        # {path: path of an earlier near-duplicate}; those files are not run through the model
+        self.duplicates = duplicates or {}
+        self.reuse_duplicates = reuse_duplicates
+        self.cache = cache if weights_hash else None
+        self.weights_hash = weights_hash
+        self.batch_size = max(1, int(batch_size))
+        self.decode_threads = max(1, int(decode_threads))
+
+    def run(self, file_paths, cancel_event=None):
+        """
+        Returns a dict with per-file detections, the number of images processed
+        and the overall throughput. Stops after the current batch if cancel_event is set.
+        Near-duplicates are listed under 'duplicates' and, with reuse_duplicates,
+        get their representative's detections.
+        """
+        total = len(file_paths)
+        detections = {}
+        failed = []
+        processed = 0
+        start = time.perf_counter()
+
+        requested = set(file_paths)
+        duplicates = {path: rep for path, rep in self.duplicates.items() if path in requested and rep in requested}
+        if duplicates:
+            logger.debug("Batch analysis: skipping %s near-duplicate images.", len(duplicates))
+            processed = len(duplicates)
+            file_paths = [path for path in file_paths if path not in duplicates]
+
+        if self.cache is not None:
+            conf = self.model.conf
+            for path in file_paths:
+                cached = self.cache.get(path, self.weights_hash, conf)
+                if cached is not None:
+                    detections[path] = cached
+            if detections:
+                logger.debug("Batch analysis: %s images served from the detection cache.", len(detections))
+            processed += len(detections)
+            file_paths = [path for path in file_paths if path not in detections]
+
+        with ThreadPoolExecutor(max_workers=self.decode_threads) as decoder:
+            batches = [file_paths[i:i + self.batch_size] for i in range(0, len(file_paths), self.batch_size)]
+            # Decode the next batch while the model works on the current one
+            pending = decoder.map(_decode_rgb, batches[0]) if batches else None
+            for batch_index, batch_paths in enumerate(batches):
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.debug("Batch analysis cancelled.")
+                    break
+
+                images = list(pending)
+                if batch_index + 1 < len(batches):
+                    pending = decoder.map(_decode_rgb, batches[batch_index + 1])
+
+                batch = [(path, img) for path, img in zip(batch_paths, images) if img is not None]
+                failed.extend(path for path, img in zip(batch_paths, images) if img is None)
+                if batch:
+                    with tracer.span("inference.batch", images=len(batch)):
+                        results = self.model([img for _, img in batch])
+                    for (path, _), image_detections in zip(batch, detections_from_results(results)):
+                        detections[path] = image_detections
+                        if self.cache is not None:
+                            self.cache.put(path, self.weights_hash, self.model.conf, image_detections)
+
+                processed += len(batch_paths)
+                elapsed = time.perf_counter() - start
+                self.progress.emit(processed, total, processed / elapsed if elapsed > 0 else 0.0)
+
+        if self.reuse_duplicates:
+            for path, rep in duplicates.items():
+                if rep in detections:
+                    detections[path] = detections[rep]
+        elapsed = time.perf_counter() - start
+        return {
+            'detections': detections,
+            'duplicates': duplicates,
+            'failed': failed,
+            'processed': processed,
+            'total': total,
+            'elapsed': elapsed,
+            'images_per_sec': processed / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# benchmarks/bench_startup.py
+"""
+Measures viewer startup: time to first window and time until the model is ready.
+
+Runs `main.py --startup-benchmark` in fresh processes (offscreen by default)
+and prints the median of each timing as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(timeout):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "main.py"), "--startup-benchmark",
+         "--benchmark-timeout", str(timeout)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout + 30,
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"No timings in output (exit code {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    runs = [run_once(args.timeout) for _ in range(args.runs)]
+    summary = {"runs": runs}
+    for key in ("time_to_first_window", "time_to_model_ready", "model_load_seconds"):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            summary[f"median_{key}"] = statistics.median(values)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# benchmarks/bench_viewer.py
+"""
+Measures the viewer's hot paths over the bundled images/ dataset.
+
+Runs headlessly (offscreen Qt platform by default) and times
+ImageViewer.load_image (cold and from the decode cache),
+ImageDisplayWidget._update_display at several label sizes,
+_qpixmap_to_pil, and model inference throughput at several batch sizes.
+Prints the results as JSON, or writes them with --output; pass a previous
+result file as --compare to print the relative change of every median.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_IMAGES = os.path.join(REPO_ROOT, "images")
+DEFAULT_DISPLAY_SIZES = ("320x240", "800x600", "1920x1080", "3840x2160")
+DEFAULT_BATCH_SIZES = (1, 4, 8, 16)
+
+
+def summarize(samples):
+    """Returns count/median/mean/p95/min/max of samples (seconds) in milliseconds."""
+    values = sorted(s * 1000.0 for s in samples)
+    return {
+        "n": len(values),
+        "median_ms": statistics.median(values),
+        "mean_ms": statistics.fmean(values),
+        "p95_ms": values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+        "min_ms": values[0],
+        "max_ms": values[-1],
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_load_image(viewer, paths, repeat):
+    cold, warm = [], []
+    for _ in range(repeat):
+        for path in paths:
+            viewer.image_cache.clear()
+            cold.append(timed(viewer.load_image, path))
+            warm.append(timed(viewer.load_image, path))
+    return {"load_image_cold": summarize(cold), "load_image_cached": summarize(warm)}
+
+
+def bench_update_display(viewer, paths, sizes, repeat):
+    from PyQt5.QtCore import QSize
+
+    display = viewer.image_display
+    results = {}
+    for size in sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        display.image_label.setFixedSize(QSize(width, height))
+        fresh, cached, fast = [], [], []
+        for _ in range(repeat):
+            for path in paths:
+                viewer.load_image(path)
+                # Drop the scaled copies so the first scale to this size is measured, not a cache hit
+                display._scaled_cache = None
+                fast.append(timed(display._update_display, smooth=False))
+                display._scaled_cache = None
+                fresh.append(timed(display._update_display))
+                cached.append(timed(display._update_display))
+        results[f"update_display_{size}"] = summarize(fresh)
+        results[f"update_display_{size}_cached"] = summarize(cached)
+        results[f"update_display_{size}_fast"] = summarize(fast)
+    display.image_label.setMinimumSize(0, 0)
+    display.image_label.setMaximumSize(16777215, 16777215)
+    return results
+
+
+def bench_qpixmap_to_pil(viewer, paths, repeat):
+    display = viewer.image_display
+    samples = []
+    for _ in range(repeat):
+        for path in paths:
+            viewer.load_image(path)
+            samples.append(timed(display._qpixmap_to_pil, display.original_pixmap))
+    return {"qpixmap_to_pil": summarize(samples)}
+
+
+def bench_inference(config, paths, batch_sizes):
+    """Images per second through BatchAnalyzer for each batch size, or a skip reason without a model."""
+    from batch_analyzer import BatchAnalyzer
+    from image_loader import load_image_file
+    from inference_backend import load_backend
+
+    try:
+        model = load_backend(config)
+    except Exception as e:
+        return {"inference": {"skipped": f"{type(e).__name__}: {e}"}}
+
+    results = {}
+    model([load_image_file(paths[0]).rgb_array()])  # Warm-up pass outside the timings
+    for batch_size in batch_sizes:
+        summary = BatchAnalyzer(model, batch_size=batch_size).run(paths)
+        results[f"inference_batch_{batch_size}"] = {
+            "images": summary["processed"] - len(summary["failed"]),
+            "elapsed_s": summary["elapsed"],
+            "images_per_sec": summary["images_per_sec"],
+        }
+    return results
+
+
+def compare(results, baseline):
+    """Returns lines with the relative change of each shared median (or throughput) against baseline."""
+    lines = []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        for key in ("median_ms", "images_per_sec"):
+            if key in current and key in previous and previous[key]:
+                change = (current[key] - previous[key]) / previous[key] * 100.0
+                lines.append(f"{name:40s} {key:15s} {previous[key]:10.3f} -> {current[key]:10.3f} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="Directory of images to benchmark with.")
+    parser.add_argument("--limit", type=int, default=50, help="Use at most this many images (0 for all).")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the images for each GUI benchmark.")
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_DISPLAY_SIZES),
+                        help="Label sizes for _update_display, as WIDTHxHEIGHT.")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--skip-inference", action="store_true")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous result file to compare against.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QT_VERSION_STR
+    from image_loader import list_image_files
+    from main_window import ImageViewer
+    from perf_trace import tracer
+
+    paths = list_image_files(args.images, ImageViewer.SUPPORTED_FORMATS)
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        parser.error(f"no images found in {args.images}")
+
+    app = QApplication(sys.argv[:1])
+    viewer = ImageViewer()
+    tracer.enabled = False  # Measure the paths without the instrumentation's own overhead
+    if viewer.folder_indexer is not None:
+        viewer.folder_indexer.shutdown()  # Background indexing would compete with the measured paths
+    viewer.prefetch_count = 0  # Likewise neighbour decodes; load_image_cold measures the decode itself
+    viewer.resize(1200, 800)
+
+    results = {}
+    results.update(bench_load_image(viewer, paths, args.repeat))
+    results.update(bench_update_display(viewer, paths, args.sizes, args.repeat))
+    results.update(bench_qpixmap_to_pil(viewer, paths, args.repeat))
+    if not args.skip_inference:
+        results.update(bench_inference(viewer.config, paths, args.batch_sizes))
+    viewer.close()
+    app.processEvents()
+
+    report = {
+        "benchmark": "viewer",
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt": QT_VERSION_STR,
+            "cpu_count": os.cpu_count(),
+            "qpa_platform": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "parameters": {
+            "images": len(paths),
+            "repeat": args.repeat,
+            "backend": viewer.config["backend"],
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {baseline.get('commit') or args.compare}:", file=sys.stderr)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
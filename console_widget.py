@@ -1,15 +1,57 @@
 # console_widget.py
-from PyQt5.QtWidgets import QTextEdit
+import logging
 
-class ConsoleWidget(QTextEdit):
-    def __init__(self, parent=None):
+from PyQt5.QtWidgets import QPlainTextEdit
+from PyQt5.QtCore import QTimer
+
+from app_logging import RingBufferHandler
+
+DEFAULT_MAX_LINES = 2000
+FLUSH_INTERVAL_MS = 100
+
+logger = logging.getLogger("image_viewer")
+# User-facing messages are INFO; the logger's own level keeps them independent of the stderr verbosity (root level)
+logger.setLevel(logging.INFO)
+
+
+class ConsoleWidget(QPlainTextEdit):
+    """
+    Log console showing INFO and above from every module.
+
+    Records arrive through a RingBufferHandler from any thread and are
+    appended in one batch per timer tick; the document keeps at most
+    max_lines lines, and only follows new output while scrolled to the bottom.
+    """
+
+    def __init__(self, parent=None, max_lines=DEFAULT_MAX_LINES, level=logging.INFO):
         super().__init__(parent)
         self.setReadOnly(True)
         self.setMaximumHeight(150) # Keep height restriction
+        self.setMaximumBlockCount(max_lines)
+        self.handler = RingBufferHandler(capacity=max_lines, level=level)
+        logging.getLogger().addHandler(self.handler)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.timeout.connect(self.flush)
+        self._flush_timer.start(FLUSH_INTERVAL_MS)
+        handler = self.handler
+        self.destroyed.connect(lambda: logging.getLogger().removeHandler(handler))
+
+    def logMessage(self, message, level=logging.INFO):
+        """Logs message; it shows up here on the next flush. Safe to call from any thread."""
+        logger.log(level, message)
+
+    def flush(self):
+        if not self.handler.hasPending():
+            return
+        records, dropped = self.handler.drain()
+        lines = []
+        if dropped:
+            lines.append(f"... {dropped} earlier messages dropped ...")
+        lines.extend(line for _, line in records)
 
-    def logMessage(self, message):
-        self.append(message)
-        # Scroll to bottom
-        self.verticalScrollBar().setValue(
-            self.verticalScrollBar().maximum()
-        )
\ No newline at end of file
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
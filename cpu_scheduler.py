@@ -0,0 +1,341 @@
+# cpu_scheduler.py
+"""
+Multi-process CPU inference.
+
+A single model call on a CPU-only machine leaves cores idle between images
+and during the NumPy pre/post-processing. CpuInferenceScheduler runs the
+model in N worker processes, each with its own intra-op thread count, and
+splits every batch across them. Decoded images are copied once into a
+shared-memory segment per worker and read there as NumPy views, so only
+their shapes and offsets, and the (N, 6) results, go through the pipes.
+
+The scheduler is called like an inference_backend backend (one image or a
+list, returning .names and .xyxy), so BatchAnalyzer, VideoAnalyzer and the
+Analyze button use it unchanged. choose_split() picks the process/thread
+split by timing each candidate on a synthetic batch and remembers the
+winner per model and machine.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app_paths import user_cache_dir
+from inference_backend import DetectionResults, _as_rgb_array, load_backend
+
+logger = logging.getLogger(__name__)
+
+TUNING_ROUNDS = 3  # Timed batches per candidate split after a warm-up pass
+_SPLITS_FILE = "cpu_splits.json"
+
+
+def available_cores():
+    """CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _worker_main(config, connection):
+    """Loads the model and answers (segment name, [(shape, offset), ...]) requests until sent None."""
+    # BLAS/OpenMP pools outside the runtime's own setting would otherwise claim every core in every worker
+    os.environ.setdefault("OMP_NUM_THREADS", str(max(1, config["cpu_threads"])))
+    try:
+        model = load_backend(config)
+    except Exception as e:
+        connection.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    from detections import detections_from_results
+    connection.send(('ready', None))
+
+    segment = None
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        name, layout = request
+        if segment is None or segment.name != name:
+            if segment is not None:
+                segment.close()
+            segment = shared_memory.SharedMemory(name=name)
+        images = [np.ndarray(shape, dtype=np.uint8, buffer=segment.buf, offset=offset) for shape, offset in layout]
+        results = detections = None
+        try:
+            results = model(images)
+            detections = detections_from_results(results)
+            connection.send(('ok', (detections[0].names if detections else model.names,
+                                    [d.array for d in detections])))
+        except Exception as e:
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+        # Views into the segment (and results that may hold them) must go before it can be closed
+        del images, results, detections
+    if segment is not None:
+        segment.close()
+
+
+class _Worker:
+    """One model process, its pipe and the shared-memory segment images are handed over in."""
+
+    def __init__(self, context, config):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(config, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.segment = None
+
+    def reserve(self, nbytes):
+        """Returns a segment of at least nbytes, replacing the current one (with room to grow) if it is smaller."""
+        if self.segment is None or self.segment.size < nbytes:
+            size = max(nbytes, 2 * self.segment.size if self.segment is not None else 0)
+            self.release()
+            self.segment = shared_memory.SharedMemory(create=True, size=size)
+        return self.segment
+
+    def release(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def receive(self):
+        try:
+            status, payload = self.connection.recv()
+        except EOFError:
+            raise RuntimeError(f"Inference worker {self.process.pid} exited unexpectedly") from None
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+
+class CpuInferenceScheduler:
+    """
+    Runs the configured backend in `workers` processes with `threads` intra-op
+    threads each. A call splits its images evenly over as many idle workers
+    as it has images and blocks until all of them answer; calls from several
+    threads share the workers. close() stops the processes and frees the shared memory.
+
+    A split tuned for batch throughput leaves a single image (the Analyze
+    button) on one worker with few threads. With latency_threads above
+    `threads`, one more process is started with that many threads and answers
+    every one-image call instead.
+    """
+
+    def __init__(self, config, workers, threads, latency_threads=0):
+        self.workers = max(1, int(workers))
+        self.threads = max(1, int(threads))
+        self.conf = min(config["conf_floor"], config["conf_threshold"])
+        self.img_size = config["img_size"]
+        self.names = {}
+        worker_config = dict(config, cpu_threads=self.threads)
+        # Workers start from a fresh interpreter: forking would copy the GUI's Qt state and threads
+        context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(context, worker_config) for _ in range(self.workers)]
+        self._idle = queue.Queue()
+        self._latency_idle = None
+        if latency_threads > self.threads:
+            self._latency_idle = queue.Queue()
+            self._workers.append(_Worker(context, dict(config, cpu_threads=int(latency_threads))))
+        self._acquire_lock = threading.Lock()
+        try:
+            for worker in self._workers:
+                worker.receive()  # Waits for the model to load
+            for worker in self._workers[:self.workers]:
+                self._idle.put(worker)
+            if self._latency_idle is not None:
+                self._latency_idle.put(self._workers[-1])
+        except Exception:
+            self.close()
+            raise
+        logger.debug("CPU inference scheduler started: %s workers x %s threads%s.", self.workers, self.threads,
+                     f", one-image calls on {latency_threads} threads" if self._latency_idle is not None else "")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, images):
+        single = not isinstance(images, (list, tuple))
+        images = [images] if single else list(images)
+        if not images:
+            return DetectionResults(self.names, [])
+        arrays = [np.ascontiguousarray(_as_rgb_array(image), dtype=np.uint8) for image in images]
+        shards = np.array_split(np.arange(len(arrays)), min(len(arrays), self.workers))
+
+        if len(arrays) == 1 and self._latency_idle is not None:
+            idle = self._latency_idle
+            assigned = [idle.get()]
+        else:
+            idle = self._idle
+            # Taking all of a call's workers under one lock keeps two calls from each holding half and waiting on the other
+            with self._acquire_lock:
+                assigned = [idle.get() for _ in shards]
+        sent = []
+        try:
+            for worker, shard in zip(assigned, shards):
+                layout, offset = [], 0
+                for index in shard.tolist():
+                    layout.append((arrays[index].shape, offset))
+                    offset += arrays[index].nbytes
+                segment = worker.reserve(offset)
+                for (shape, start), index in zip(layout, shard.tolist()):
+                    target = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf, offset=start)
+                    target[...] = arrays[index]
+                    del target
+                worker.connection.send((segment.name, layout))
+                sent.append((worker, shard))
+        finally:
+            # Every request sent is answered before the worker is reused, even when another worker failed
+            xyxy = [None] * len(arrays)
+            error = None
+            for worker, shard in sent:
+                try:
+                    names, results = worker.receive()
+                except RuntimeError as e:
+                    error = error or e
+                    continue
+                self.names = names or self.names
+                for index, result in zip(shard.tolist(), results):
+                    xyxy[index] = result
+            for worker in assigned:
+                idle.put(worker)
+        if error is not None:
+            raise error
+        return DetectionResults(self.names, xyxy)
+
+    def close(self):
+        for worker in self._workers:
+            try:
+                worker.connection.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.connection.close()
+            worker.release()
+        self._workers = []
+
+
+def candidate_splits(cores, batch_size):
+    """(workers, threads) splits worth timing: powers of two up to the core count and the batch size, plus one worker per core."""
+    workers = {1}
+    count = 2
+    while count <= min(cores, batch_size):
+        workers.add(count)
+        count *= 2
+    if cores <= batch_size:
+        workers.add(cores)
+    return [(n, max(1, cores // n)) for n in sorted(workers)]
+
+
+def measure_throughput(config, workers, threads, batch_size, rounds=TUNING_ROUNDS):
+    """Images per second of a scheduler with this split on batch_size synthetic img_size images."""
+    rng = np.random.default_rng(0)
+    size = config["img_size"]
+    images = [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(batch_size)]
+    with CpuInferenceScheduler(config, workers, threads) as scheduler:
+        scheduler(images)  # Warm-up: first passes allocate and pick kernels
+        start = time.perf_counter()
+        for _ in range(rounds):
+            scheduler(images)
+        elapsed = time.perf_counter() - start
+    return rounds * batch_size / elapsed if elapsed > 0 else 0.0
+
+
+def _split_key(config, cores):
+    weights = config["weights_path"]
+    stat = os.stat(weights) if os.path.exists(weights) else None
+    return "|".join(str(part) for part in (
+        config["backend"], os.path.abspath(weights), stat.st_size if stat else 0, int(stat.st_mtime) if stat else 0,
+        config["img_size"], config["batch_size"], cores))
+
+
+def choose_split(config, cores=None, use_cache=True):
+    """
+    Returns the (workers, threads) split with the highest measured throughput
+    for config's model at its batch size. Measured once per model, batch size
+    and core count, then read back from the user cache.
+    """
+    cores = cores or available_cores()
+    key = _split_key(config, cores)
+    path = os.path.join(user_cache_dir(), _SPLITS_FILE)
+    cached = {}
+    if use_cache and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        if key in cached:
+            workers, threads = cached[key]
+            logger.debug("Using measured CPU split of %s workers x %s threads.", workers, threads)
+            return workers, threads
+
+    batch_size = max(1, config["batch_size"])
+    best, best_rate = (1, cores), 0.0
+    for workers, threads in candidate_splits(cores, batch_size):
+        rate = measure_throughput(config, workers, threads, batch_size)
+        logger.info("CPU split %s workers x %s threads: %.1f images/sec", workers, threads, rate)
+        if rate > best_rate:
+            best, best_rate = (workers, threads), rate
+
+    if use_cache:
+        cached[key] = list(best)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(cached, f, indent=2)
+        except OSError as e:
+            logger.warning("Could not save the CPU split to %s: %s", path, e)
+    return best
+
+
+def _uses_gpu(config):
+    """True if the torch.hub backend would run on a GPU, where CPU worker processes do not apply."""
+    if config["backend"] != "torch":
+        return False  # The exported backends always run on the CPU
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def load_scheduled_backend(config):
+    """
+    Creates the model for config's cpu_workers setting: load_backend() in this
+    process for 1, a CpuInferenceScheduler with that many workers for N > 1
+    (cpu_threads each, or an even share of the cores), and the measured best
+    split for 0. A measured split of one worker, a GPU, or a failed measurement
+    loads in-process. A scheduler also gets a worker with a thread per core
+    for one-image calls, so Analyze is not limited to one worker's share.
+    """
+    workers = config["cpu_workers"]
+    if workers == 1:
+        return load_backend(config)
+    cores = available_cores()
+    if workers == 0:
+        if cores == 1 or _uses_gpu(config):
+            return load_backend(config)
+        try:
+            workers, threads = choose_split(config, cores)
+        except Exception as e:
+            logger.warning("Could not measure CPU worker splits, running the model in-process: %s", e)
+            return load_backend(config)
+        if workers == 1:
+            return load_backend(dict(config, cpu_threads=config["cpu_threads"] or threads))
+    else:
+        threads = config["cpu_threads"] or max(1, cores // workers)
+    logger.info("Running inference in %s worker processes with %s threads each.", workers, threads)
+    return CpuInferenceScheduler(config, workers, threads, latency_threads=cores)
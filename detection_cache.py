@@ -0,0 +1,145 @@
+# detection_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app_paths import user_cache_dir
+from detections import Detections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha1(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def default_cache_path():
+    return os.path.join(user_cache_dir(), "detections.sqlite")
+
+
+class DetectionCache:
+    """
+    Persistent SQLite store of detections keyed by image content hash,
+    model weights hash and confidence threshold.
+
+    Entries are evicted least-recently-used first once the stored payloads
+    exceed max_bytes. Entries produced by other weights are dropped by
+    purgeStaleModels(), which ImageDisplayWidget calls whenever it loads a model.
+    Safe to use from worker threads.
+    """
+
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path or default_cache_path()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (path, size, mtime_ns) -> content hash, so unchanged files are only hashed once per session
+        self._hash_memo = {}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            " content_hash TEXT NOT NULL,"
+            " weights_hash TEXT NOT NULL,"
+            " conf REAL NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " names TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, weights_hash, conf))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_access ON detections(last_access)")
+        self._conn.commit()
+
+    def contentHash(self, file_path):
+        st = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+        content_hash = self._hash_memo.get(memo_key)
+        if content_hash is None:
+            content_hash = file_sha1(file_path)
+            self._hash_memo[memo_key] = content_hash
+        return content_hash
+
+    def get(self, file_path, weights_hash, conf, content_hash=None):
+        """
+        Returns the cached detections for file_path, or None on a miss.
+        Pass content_hash when it is already known to skip hashing the file.
+        """
+        try:
+            content_hash = content_hash or self.contentHash(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, names FROM detections WHERE content_hash=? AND weights_hash=? AND conf=?",
+                (content_hash, weights_hash, float(conf)),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE detections SET last_access=? WHERE content_hash=? AND weights_hash=? AND conf=?",
+                (time.time(), content_hash, weights_hash, float(conf)),
+            )
+            self._conn.commit()
+        return Detections.fromBytes(row[0], Detections.parseNames(row[1]))
+
+    def put(self, file_path, weights_hash, conf, detections, content_hash=None):
+        try:
+            content_hash = content_hash or self.contentHash(file_path)
+        except OSError:
+            return
+        payload = detections.toBytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, weights_hash, float(conf), payload, detections.namesJson(),
+                 len(payload), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def purgeStaleModels(self, weights_hash):
+        """Drops every entry that was not produced by the given weights."""
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM detections WHERE weights_hash != ?", (weights_hash,)
+            ).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info("Detection cache: removed %s entries from previous model weights.", removed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM detections")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for content_hash, weights_hash, conf, size in self._conn.execute(
+            "SELECT content_hash, weights_hash, conf, size FROM detections ORDER BY last_access"
+        ):
+            stale.append((content_hash, weights_hash, conf))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany(
+            "DELETE FROM detections WHERE content_hash=? AND weights_hash=? AND conf=?", stale
+        )
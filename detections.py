@@ -0,0 +1,93 @@
+# detections.py
+import json
+
+import numpy as np
+
+# Column layout of Detections.array
+XMIN, YMIN, XMAX, YMAX, CONF, CLASS = range(6)
+
+
+class Detections:
+    """
+    Detections for one image as a compact (N, 6) float32 array of
+    xmin, ymin, xmax, ymax, confidence, class id, plus the model's class names.
+    """
+    __slots__ = ('array', 'names')
+
+    def __init__(self, array, names):
+        self.array = np.asarray(array, dtype=np.float32).reshape(-1, 6)
+        self.names = names
+
+    @classmethod
+    def empty(cls, names=None):
+        return cls(np.zeros((0, 6), dtype=np.float32), names or {})
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        """Yields (class_name, confidence, (xmin, ymin, xmax, ymax)) per detection."""
+        for x1, y1, x2, y2, conf, cls in self.array.tolist():
+            yield self.names.get(int(cls), str(int(cls))), conf, (x1, y1, x2, y2)
+
+    @property
+    def boxes(self):
+        return self.array[:, :4]
+
+    @property
+    def confidences(self):
+        return self.array[:, CONF]
+
+    @property
+    def class_ids(self):
+        return self.array[:, CLASS].astype(np.int64)
+
+    def filtered(self, min_conf=0.0, class_ids=None):
+        """Returns the detections with confidence >= min_conf and, if given, a class id in class_ids."""
+        mask = self.array[:, CONF] >= min_conf
+        if class_ids is not None:
+            mask &= np.isin(self.array[:, CLASS], np.fromiter(class_ids, dtype=np.float32))
+        return Detections(self.array[mask], self.names)
+
+    def scaled(self, sx, sy):
+        """Returns the detections with box x coordinates multiplied by sx and y coordinates by sy."""
+        array = self.array.copy()
+        array[:, [XMIN, XMAX]] *= sx
+        array[:, [YMIN, YMAX]] *= sy
+        return Detections(array, self.names)
+
+    def labels(self):
+        return [f"{self.names.get(int(cls), str(int(cls)))} {conf:.2f}"
+                for conf, cls in self.array[:, CONF:].tolist()]
+
+    def counts(self):
+        """Returns {class_name: number of detections}."""
+        ids, counts = np.unique(self.class_ids, return_counts=True)
+        return {self.names.get(int(i), str(int(i))): int(n) for i, n in zip(ids, counts)}
+
+    def toBytes(self):
+        return self.array.tobytes()
+
+    @classmethod
+    def fromBytes(cls, data, names):
+        return cls(np.frombuffer(data, dtype=np.float32).copy(), names)
+
+    def namesJson(self):
+        return json.dumps({str(k): v for k, v in self.names.items()})
+
+    @staticmethod
+    def parseNames(names_json):
+        return {int(k): v for k, v in json.loads(names_json).items()}
+
+
+def detections_from_results(yolo_results):
+    """Converts YOLOv5-style results into one Detections per input image."""
+    names = yolo_results.names
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    converted = []
+    for xyxy in yolo_results.xyxy:
+        if hasattr(xyxy, 'cpu'):  # torch tensor from the torch.hub backend
+            xyxy = xyxy.cpu().numpy()
+        converted.append(Detections(xyxy, names))
+    return converted
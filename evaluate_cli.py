@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# evaluate_cli.py
+"""
+Re-evaluates the detection model against labelled images.
+
+Runs the same headless pipeline as inspect_cli.py over a directory of images
+with YOLO txt labels (class cx cy w h, normalized; .../images/x.jpg is
+labelled by .../labels/x.txt or x.txt next to it, or see --labels) and
+appends one row to --output with the columns of the training runs'
+results.csv: precision, recall, mAP@0.5 and mAP@0.5:0.95 are filled in, the
+training losses and learning rates are left blank, and the row is followed
+by the image/instance counts and decode, inference and per-image latency
+(mean and p95) in milliseconds, so model quality and speed are tracked in
+one file. Per-class metrics are printed to stderr; --per-image writes one
+CSV row per image with its latency and matches.
+
+    python evaluate_cli.py /data/welds/val/images --weights AIModel/experiment1_gpu/weights/best.pt
+
+Exits with 1 if the model could not be loaded and 2 if any image could not be read.
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+
+import numpy as np
+
+from app_logging import configure_logging
+from evaluation import EvaluationStats, label_path_for, load_yolo_labels
+from inspect_cli import iter_input_paths, run_inspection
+from viewer_config import load_config, default_weights_path
+
+RESULTS_COLUMNS = ('epoch', 'train/box_loss', 'train/obj_loss', 'train/cls_loss', 'metrics/precision',
+                   'metrics/recall', 'metrics/mAP_0.5', 'metrics/mAP_0.5:0.95', 'val/box_loss',
+                   'val/obj_loss', 'val/cls_loss', 'x/lr0', 'x/lr1', 'x/lr2')
+EXTRA_COLUMNS = ('eval/images', 'eval/instances', 'speed/decode_ms', 'speed/inference_ms',
+                 'speed/latency_ms', 'speed/latency_p95_ms', 'weights', 'timestamp')
+PER_IMAGE_FIELDS = ('path', 'status', 'labels', 'detections', 'tp_0.5', 'decode_ms', 'inference_ms',
+                    'latency_ms', 'error')
+COLUMN_WIDTH = 20  # results.csv right-aligns every value to this width
+
+# YOLOv5 val.py settings: keep nearly every box so the PR curves reach full recall
+DEFAULT_CONF = 0.001
+DEFAULT_IOU = 0.6
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+class EvaluationWriter:
+    """
+    Receives inspection records as run_inspection() streams them, matches each
+    image against its labels right away and keeps only the match flags and timings.
+    """
+
+    def __init__(self, labels_dir=None, per_image_stream=None):
+        self.labels_dir = labels_dir
+        self.stats = EvaluationStats()
+        self.decode_ms = []
+        self.inference_ms = []
+        self.latency_ms = []
+        self.names = {}  # Class id -> name, as reported by the model
+        self._per_image = None
+        if per_image_stream is not None:
+            self._per_image = csv.DictWriter(per_image_stream, fieldnames=PER_IMAGE_FIELDS, extrasaction='ignore')
+            self._per_image.writeheader()
+        self._per_image_stream = per_image_stream
+
+    def write(self, records):
+        for record in records:
+            row = {'path': record['path'], 'status': record['status'], 'decode_ms': record['decode_ms'],
+                   'inference_ms': record['inference_ms'], 'latency_ms': record['latency_ms'],
+                   'error': record.get('error', '')}
+            if record['status'] == 'ok':
+                labels = load_yolo_labels(label_path_for(record['path'], self.labels_dir),
+                                          record['width'], record['height'])
+                # The unrounded model output: rounding conf for display would create ties that reorder the PR curve
+                raw = record['raw_detections']
+                detections = raw.array.astype(np.float64)
+                correct = self.stats.add(detections, labels, key=record['path'])
+                self.names.update(raw.names)
+                self.decode_ms.append(record['decode_ms'])
+                self.inference_ms.append(record['inference_ms'])
+                self.latency_ms.append(record['latency_ms'])
+                row.update({'labels': len(labels), 'detections': len(detections),
+                            'tp_0.5': int(correct[:, 0].sum())})
+            if self._per_image is not None:
+                self._per_image.writerow(row)
+        if self._per_image_stream is not None:
+            self._per_image_stream.flush()
+
+    def speed(self):
+        """Mean decode/inference/latency and p95 latency in milliseconds over the readable images."""
+        if not self.latency_ms:
+            return {'decode_ms': 0.0, 'inference_ms': 0.0, 'latency_ms': 0.0, 'latency_p95_ms': 0.0}
+        return {
+            'decode_ms': float(np.mean(self.decode_ms)),
+            'inference_ms': float(np.mean(self.inference_ms)),
+            'latency_ms': float(np.mean(self.latency_ms)),
+            'latency_p95_ms': float(np.percentile(self.latency_ms, 95)),
+        }
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.5g}"
+    return str(value)
+
+
+def append_results_row(path, metrics, speed, weights):
+    """
+    Appends one evaluation row in results.csv layout to path, writing the
+    header first for a new file. The epoch column numbers the evaluation runs in the file.
+    """
+    exists = os.path.exists(path) and os.path.getsize(path) > 0
+    run = 0
+    if exists:
+        with open(path, 'r', encoding='utf-8') as f:
+            run = max(0, sum(1 for line in f if line.strip()) - 1)
+    values = dict.fromkeys(RESULTS_COLUMNS + EXTRA_COLUMNS)
+    values.update({
+        'epoch': run,
+        'metrics/precision': metrics['precision'],
+        'metrics/recall': metrics['recall'],
+        'metrics/mAP_0.5': metrics['map50'],
+        'metrics/mAP_0.5:0.95': metrics['map'],
+        'eval/images': metrics['images'],
+        'eval/instances': metrics['labels'],
+        'speed/decode_ms': speed['decode_ms'],
+        'speed/inference_ms': speed['inference_ms'],
+        'speed/latency_ms': speed['latency_ms'],
+        'speed/latency_p95_ms': speed['latency_p95_ms'],
+        'weights': os.path.basename(weights or ''),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+    })
+    with open(path, 'a', encoding='utf-8') as f:
+        if not exists:
+            f.write(','.join(f"{name:>{COLUMN_WIDTH}}" for name in values) + '\n')
+        f.write(','.join(f"{_format_value(value):>{COLUMN_WIDTH}}" for value in values.values()) + '\n')
+
+
+def _class_table(metrics, names):
+    lines = [f"{'Class':>20}{'Images':>11}{'Instances':>11}{'P':>11}{'R':>11}{'mAP50':>11}{'mAP50-95':>11}",
+             f"{'all':>20}{metrics['images']:>11}{metrics['labels']:>11}{metrics['precision']:>11.3f}"
+             f"{metrics['recall']:>11.3f}{metrics['map50']:>11.3f}{metrics['map']:>11.3f}"]
+    if len(metrics['per_class']) > 1:
+        for row in metrics['per_class']:
+            name = names.get(row['class_id'], str(row['class_id']))
+            lines.append(f"{name:>20}{metrics['images']:>11}{row['labels']:>11}{row['precision']:>11.3f}"
+                         f"{row['recall']:>11.3f}{row['ap50']:>11.3f}{row['ap']:>11.3f}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv, config):
+    parser = argparse.ArgumentParser(description="Evaluate the weld defect model against YOLO-labelled images.")
+    parser.add_argument("inputs", nargs="*", help="Image files or directories; '-' or nothing reads paths from stdin.")
+    parser.add_argument("--labels", help="Directory of <image stem>.txt label files, if not beside the images.")
+    parser.add_argument("--output", "-o", default="evaluation_results.csv",
+                        help="results.csv-style file the evaluation row is appended to.")
+    parser.add_argument("--per-image", help="Also write per-image latency and matches to this CSV file.")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Descend into subdirectories.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Worker processes, each with its own copy of the model.")
+    parser.add_argument("--batch-size", type=int, default=config["batch_size"])
+    parser.add_argument("--backend", default=config["backend"])
+    parser.add_argument("--weights", help="Weights file; defaults to the configured one for the backend.")
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF, help="Confidence threshold for kept boxes.")
+    parser.add_argument("--iou", type=float, default=DEFAULT_IOU, help="NMS IoU threshold.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    config = load_config()
+    configure_logging(config["log_level"])
+    args = parse_args(sys.argv[1:] if argv is None else argv, config)
+
+    workers = max(1, args.workers)
+    if args.backend != config["backend"] and not args.weights:
+        config["weights_path"] = default_weights_path(args.backend)
+    config.update(backend=args.backend, conf_threshold=args.conf, conf_floor=args.conf, iou_threshold=args.iou)
+    if args.weights:
+        config["weights_path"] = args.weights
+    if not config["cpu_threads"]:
+        config["cpu_threads"] = max(1, (os.cpu_count() or 1) // workers)
+
+    per_image_stream = open(args.per_image, 'w', newline='', encoding='utf-8') if args.per_image else None
+    writer = EvaluationWriter(args.labels, per_image_stream)
+    try:
+        summary = run_inspection(iter_input_paths(args.inputs, recursive=args.recursive), config, writer,
+                                 workers=workers, batch_size=max(1, args.batch_size), raw_detections=True)
+    except Exception as e:
+        _log(f"Evaluation failed: {e}")
+        return 1
+    finally:
+        if per_image_stream is not None:
+            per_image_stream.close()
+
+    metrics = writer.stats.summary()
+    speed = writer.speed()
+    append_results_row(args.output, metrics, speed, config["weights_path"])
+    _log(_class_table(metrics, writer.names))
+    _log(f"Speed: {speed['decode_ms']:.1f}ms decode, {speed['inference_ms']:.1f}ms inference, "
+         f"{speed['latency_ms']:.1f}ms latency (p95 {speed['latency_p95_ms']:.1f}ms) per image")
+    _log(f"Evaluated {summary['processed']} images ({summary['failed']} unreadable) in {summary['elapsed']:.1f}s; "
+         f"results appended to {args.output}")
+    return 2 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
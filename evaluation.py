@@ -0,0 +1,186 @@
+# evaluation.py
+"""
+Detection metrics against YOLO-format labels, computed the way YOLOv5's
+val.py computes them so the numbers line up with AIModel/*/results.csv.
+
+Each image's predictions are matched to its labels at the ten IoU
+thresholds 0.50:0.05:0.95 at once (match_predictions), leaving one row of
+per-threshold true-positive flags per prediction. EvaluationStats
+accumulates those rows image by image, and summary() turns them into
+precision, recall, mAP@0.5 and mAP@0.5:0.95.
+"""
+import os
+
+import numpy as np
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def label_path_for(image_path, labels_dir=None):
+    """
+    Returns the YOLO label file for image_path: <labels_dir>/<stem>.txt when
+    labels_dir is given, otherwise the usual dataset layout where .../images/x.jpg
+    is labelled by .../labels/x.txt, falling back to x.txt next to the image.
+    """
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    if labels_dir:
+        return os.path.join(labels_dir, stem + '.txt')
+    directory = os.path.dirname(os.path.abspath(image_path))
+    parent, name = os.path.split(directory)
+    if name == 'images':
+        candidate = os.path.join(parent, 'labels', stem + '.txt')
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join(directory, stem + '.txt')
+
+
+def load_yolo_labels(label_path, width, height):
+    """
+    Reads "class cx cy w h" lines (normalized to 0..1) and returns an (M, 5)
+    float array of class, xmin, ymin, xmax, ymax in pixels. A missing file
+    means an image without objects.
+    """
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5))
+    with open(label_path, 'r', encoding='utf-8') as f:
+        rows = [line.split()[:5] for line in f if line.strip()]
+    if not rows:
+        return np.zeros((0, 5))
+    labels = np.array(rows, dtype=np.float64)
+    cx, cy = labels[:, 1] * width, labels[:, 2] * height
+    half_w, half_h = labels[:, 3] * width / 2, labels[:, 4] * height / 2
+    return np.stack([labels[:, 0], cx - half_w, cy - half_h, cx + half_w, cy + half_h], axis=1)
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes as an (N, M) array."""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_classes, labels, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Returns an (N, T) bool array marking which of N predictions are true
+    positives at each IoU threshold. Each label matches at most one
+    prediction and vice versa, as in YOLOv5's process_batch: a prediction
+    takes its highest-IoU label, and a label claimed by several predictions
+    goes to the first of them (the most confident, in NMS output order).
+    """
+    correct = np.zeros((len(pred_boxes), len(iou_thresholds)), dtype=bool)
+    if not len(pred_boxes) or not len(labels):
+        return correct
+    iou = box_iou(labels[:, 1:], pred_boxes)
+    iou = np.where(labels[:, :1] == pred_classes[None, :], iou, 0.0)
+    for t, threshold in enumerate(iou_thresholds):
+        label_idx, pred_idx = np.nonzero(iou >= threshold)
+        if not len(label_idx):
+            continue
+        order = np.argsort(-iou[label_idx, pred_idx], kind='stable')
+        label_idx, pred_idx = label_idx[order], pred_idx[order]
+        _, first = np.unique(pred_idx, return_index=True)
+        label_idx, pred_idx = label_idx[first], pred_idx[first]
+        _, first = np.unique(label_idx, return_index=True)
+        correct[pred_idx[first], t] = True
+    return correct
+
+
+def _smooth(values, fraction=0.05):
+    """Box filter over `fraction` of the values, padding with the end values."""
+    width = round(len(values) * fraction * 2) // 2 + 1
+    pad = np.ones(width // 2)
+    padded = np.concatenate((pad * values[0], values, pad * values[-1]))
+    return np.convolve(padded, np.ones(width) / width, mode='valid')
+
+
+def average_precision(recall, precision):
+    """COCO 101-point interpolated AP for recall/precision columns of shape (N, T); returns (T,)."""
+    recall = np.vstack([np.zeros((1, recall.shape[1])), recall, np.ones((1, recall.shape[1]))])
+    precision = np.vstack([np.ones((1, precision.shape[1])), precision, np.zeros((1, precision.shape[1]))])
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+    x = np.linspace(0, 1, 101)
+    return np.array([_trapezoid(np.interp(x, recall[:, t], envelope[:, t]), x) for t in range(recall.shape[1])])
+
+
+def ap_per_class(tp, conf, pred_classes, target_classes, eps=1e-16):
+    """
+    Returns (precision, recall, ap, classes): per-class precision and recall at
+    the confidence that maximizes the mean F1 over classes, (C, T) average
+    precision per IoU threshold, and the labelled class ids they belong to.
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_classes = tp[order], conf[order], pred_classes[order]
+    classes, label_counts = np.unique(target_classes, return_counts=True)
+    grid = np.linspace(0, 1, 1000)
+    ap = np.zeros((len(classes), tp.shape[1]))
+    p_curve = np.zeros((len(classes), len(grid)))
+    r_curve = np.zeros((len(classes), len(grid)))
+    for c, (cls, n_labels) in enumerate(zip(classes, label_counts)):
+        mask = pred_classes == cls
+        if not mask.any():
+            continue
+        tp_cum = tp[mask].cumsum(axis=0)
+        fp_cum = (1 - tp[mask]).cumsum(axis=0)
+        recall = tp_cum / (n_labels + eps)
+        precision = tp_cum / (tp_cum + fp_cum)
+        # Curves over confidence (descending), sampled on a common grid for the F1 optimum
+        r_curve[c] = np.interp(-grid, -conf[mask], recall[:, 0], left=0)
+        p_curve[c] = np.interp(-grid, -conf[mask], precision[:, 0], left=1)
+        ap[c] = average_precision(recall, precision)
+    f1 = 2 * p_curve * r_curve / (p_curve + r_curve + eps)
+    best = _smooth(f1.mean(axis=0), 0.1).argmax() if len(classes) else 0
+    return p_curve[:, best], r_curve[:, best], ap, classes
+
+
+class EvaluationStats:
+    """Accumulates per-image matches; only one flag row per prediction is kept, never the images."""
+
+    def __init__(self, iou_thresholds=IOU_THRESHOLDS):
+        self.iou_thresholds = iou_thresholds
+        self._images = []  # (key, correct, conf, pred_classes, target_classes) per image
+
+    @property
+    def images(self):
+        return len(self._images)
+
+    def add(self, detections, labels, key=None):
+        """
+        detections is an (N, 6) array of xmin, ymin, xmax, ymax, conf, class and
+        labels an (M, 5) array from load_yolo_labels(). Returns the image's (N, T)
+        match flags. Images are ranked in key order (e.g. their paths) so that
+        predictions with equal confidence score the same however the images arrived.
+        """
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        correct = match_predictions(detections[:, :4], detections[:, 5], labels, self.iou_thresholds)
+        self._images.append((key if key is not None else len(self._images),
+                             correct, detections[:, 4], detections[:, 5], labels[:, 0]))
+        return correct
+
+    def summary(self):
+        """
+        Returns a dict with overall precision, recall, map50 and map (0.5:0.95),
+        the number of labels, and 'per_class' rows of class id, labels, P, R, AP50, AP.
+        """
+        images = sorted(self._images, key=lambda image: image[0])
+        target_classes = np.concatenate([image[4] for image in images]) if images else np.zeros(0)
+        result = {'images': len(images), 'labels': len(target_classes), 'precision': 0.0, 'recall': 0.0,
+                  'map50': 0.0, 'map': 0.0, 'per_class': []}
+        if not len(target_classes):
+            return result
+        tp = np.concatenate([image[1] for image in images]).astype(np.float64)
+        p, r, ap, classes = ap_per_class(tp, np.concatenate([image[2] for image in images]),
+                                         np.concatenate([image[3] for image in images]), target_classes)
+        counts = np.bincount(target_classes.astype(np.int64))
+        result.update(precision=float(p.mean()), recall=float(r.mean()),
+                      map50=float(ap[:, 0].mean()), map=float(ap.mean()))
+        result['per_class'] = [
+            {'class_id': int(cls), 'labels': int(counts[int(cls)]), 'precision': float(p[c]),
+             'recall': float(r[c]), 'ap50': float(ap[c, 0]), 'ap': float(ap[c].mean())}
+            for c, cls in enumerate(classes)
+        ]
+        return result
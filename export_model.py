@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# export_model.py
+"""
+Exports the YOLOv5 weights to TorchScript and/or ONNX for the torchscript and
+onnx inference backends. Needs torch and the YOLOv5 code once, at export time;
+the exported files then run without either (ONNX) or without the YOLOv5
+code and network access (TorchScript).
+
+    python export_model.py --format onnx
+    IMAGE_VIEWER_BACKEND=onnx python main.py
+"""
+import argparse
+import json
+import os
+
+from viewer_config import load_config, default_weights_path
+
+
+def _load_network(weights_path, yolov5_repo):
+    import torch
+    local_repo = yolov5_repo or os.path.join(torch.hub.get_dir(), "ultralytics_yolov5_master")
+    if os.path.isdir(local_repo):
+        wrapper = torch.hub.load(local_repo, 'custom', path=weights_path, source='local', autoshape=False)
+    else:
+        wrapper = torch.hub.load('ultralytics/yolov5', 'custom', path=weights_path, autoshape=False, trust_repo=True)
+    # DetectMultiBackend wraps the actual DetectionModel
+    network = getattr(wrapper, 'model', wrapper)
+    network.float().eval()
+    for module in network.modules():
+        if type(module).__name__ == 'Detect':
+            module.inplace = False
+            module.export = True  # Return only the concatenated predictions
+    names = getattr(wrapper, 'names', None) or getattr(network, 'names', {})
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    return network, names
+
+
+def export_model(weights_path, fmt, output_path=None, img_size=640, yolov5_repo=""):
+    """Exports weights_path to fmt ("torchscript" or "onnx") and returns the written path."""
+    import torch
+    network, names = _load_network(weights_path, yolov5_repo)
+    dummy = torch.zeros(1, 3, img_size, img_size)
+    output_path = output_path or os.path.splitext(weights_path)[0] + ('.torchscript' if fmt == 'torchscript' else '.onnx')
+
+    with torch.no_grad():
+        if fmt == 'torchscript':
+            traced = torch.jit.trace(network, dummy, strict=False)
+            config = {'names': {str(k): v for k, v in names.items()}, 'shape': list(dummy.shape)}
+            traced.save(output_path, _extra_files={'config.txt': json.dumps(config)})
+        elif fmt == 'onnx':
+            import onnx
+            torch.onnx.export(
+                network, dummy, output_path, opset_version=12, do_constant_folding=True,
+                input_names=['images'], output_names=['output0'],
+                dynamic_axes={'images': {0: 'batch'}, 'output0': {0: 'batch'}},
+            )
+            model = onnx.load(output_path)
+            meta = model.metadata_props.add()
+            meta.key, meta.value = 'names', str(names)
+            onnx.save(model, output_path)
+        else:
+            raise ValueError(f"Unsupported export format {fmt!r}")
+    print(f"Exported {weights_path} to {output_path}")
+    return output_path
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Export YOLOv5 weights for the torchscript/onnx backends.")
+    parser.add_argument("--weights", default=default_weights_path("torch"))
+    parser.add_argument("--format", choices=("torchscript", "onnx", "all"), default="onnx")
+    parser.add_argument("--img-size", type=int, default=config["img_size"])
+    parser.add_argument("--yolov5-repo", default=config["yolov5_repo"])
+    args = parser.parse_args()
+
+    formats = ("torchscript", "onnx") if args.format == "all" else (args.format,)
+    for fmt in formats:
+        export_model(args.weights, fmt, img_size=args.img_size, yolov5_repo=args.yolov5_repo)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,48 @@
+import logging
 import os
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel,
-                             QFileSystemModel, QTreeView, QMessageBox)
-from PyQt5.QtCore import Qt, QDir, pyqtSignal, QModelIndex, QFileInfo # Added QFileInfo
+import time
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QFileSystemModel, QTreeView, QMessageBox, QPushButton,
+                             QStackedWidget, QCheckBox, QLineEdit)
+from PyQt5.QtCore import Qt, QDir, pyqtSignal, QModelIndex, QFileInfo, QTimer # Added QFileInfo
+
+from image_loader import list_image_files
+from image_index import parse_query
+from perceptual_hash import DEFAULT_MAX_DISTANCE
+from thumbnail_grid_widget import ThumbnailGridWidget
+from video_source import VIDEO_FORMATS
+
+logger = logging.getLogger(__name__)
+
+class _KeyboardNavTreeView(QTreeView):
+    """QTreeView that reports items reached with the arrow keys, so they can be handled like clicks."""
+    keyboardNavigated = pyqtSignal(QModelIndex)
+
+    def keyPressEvent(self, event):
+        previous = self.currentIndex()
+        super().keyPressEvent(event)
+        current = self.currentIndex()
+        if current != previous:
+            self.keyboardNavigated.emit(current)
+
 
 class FileBrowserWidget(QWidget):
     fileSelected = pyqtSignal(str)
     itemSelected = pyqtSignal(str)
+    analyzeFolderRequested = pyqtSignal(str)
+    exportFolderRequested = pyqtSignal(str)
+    autoAnalyzeToggled = pyqtSignal(bool)
+
+    QUERY_DEBOUNCE_MS = 300
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, auto_analyze=False, image_index=None, default_conf=0.0,
+                 duplicate_max_distance=DEFAULT_MAX_DISTANCE):
         super().__init__(parent)
+        self.auto_analyze = auto_analyze
+        self.image_index = image_index
+        self.default_conf = default_conf  # Confidence used by class terms in a query without conf
+        self.duplicate_max_distance = duplicate_max_distance
+        self.thumbnail_mode = False
 
         self.target_images_path = self._find_images_directory() 
 
@@ -31,7 +65,7 @@ class FileBrowserWidget(QWidget):
         Tries to find the 'images' directory relative to this script file.
         Returns a normalized, case-normalized absolute path or None.
         """
-        print("Attempting to find 'images' directory...")
+        logger.debug("Attempting to find 'images' directory...")
         try:
             script_path = os.path.abspath(__file__)
             script_dir = os.path.dirname(script_path)
@@ -55,10 +89,10 @@ class FileBrowserWidget(QWidget):
                     if abs_path in checked_paths:
                         continue
                     checked_paths.add(abs_path)
-                    print(f"Checking path: {abs_path}")
+                    logger.debug("Checking path: %s", abs_path)
                     if os.path.isdir(abs_path):
                         normalized_path = os.path.normcase(os.path.normpath(abs_path))
-                        print(f"Found images directory. Storing normalized path: {normalized_path}")
+                        logger.info("Found images directory. Storing normalized path: %s", normalized_path)
                         return normalized_path
 
             for rel_path in ['images', os.path.join('image_viewer', 'images')]:
@@ -67,17 +101,17 @@ class FileBrowserWidget(QWidget):
                  if abs_path in checked_paths:
                      continue
                  checked_paths.add(abs_path)
-                 print(f"Checking path (relative to CWD): {abs_path}")
+                 logger.debug("Checking path (relative to CWD): %s", abs_path)
                  if os.path.isdir(abs_path):
                      normalized_path = os.path.normcase(os.path.normpath(abs_path))
-                     print(f"Found images directory relative to CWD. Storing normalized path: {normalized_path}")
+                     logger.info("Found images directory relative to CWD. Storing normalized path: %s", normalized_path)
                      return normalized_path
 
-            print("Warning: Could not automatically locate 'images' directory via common structures.")
+            logger.warning("Could not automatically locate 'images' directory via common structures.")
             return None 
 
         except Exception as e:
-            print(f"Error finding images directory: {e}")
+            logger.error("Error finding images directory: %s", e)
             return None
 
     def initUI(self):
@@ -89,26 +123,27 @@ class FileBrowserWidget(QWidget):
 
         self.file_model = QFileSystemModel()
 
-        print(f"Setting model root path to normalized path: {self.target_images_path}")
+        logger.debug("Setting model root path to normalized path: %s", self.target_images_path)
         self.file_model.setRootPath(self.target_images_path)
 
         self.allowed_extensions = ["jpg", "jpeg", "png", "gif", "bmp"]
-        name_filters = ["*." + ext for ext in self.allowed_extensions]
+        self.video_extensions = [ext.lstrip('.') for ext in VIDEO_FORMATS]
+        name_filters = ["*." + ext for ext in self.allowed_extensions + self.video_extensions]
         self.file_model.setNameFilters(name_filters)
         self.file_model.setNameFilterDisables(False) 
 
-        self.tree_view = QTreeView()
+        self.tree_view = _KeyboardNavTreeView()
         self.tree_view.setModel(self.file_model)
 
         root_index = self.file_model.index(self.target_images_path)
         if not root_index.isValid():
-             print(f"ERROR: Root index for path '{self.target_images_path}' is invalid! Model may not see this path.")
+             logger.error("Root index for path '%s' is invalid! Model may not see this path.", self.target_images_path)
              root_index = self.file_model.index(self.file_model.rootPath())
              if not root_index.isValid():
-                  print(f"ERROR: Fallback root index is also invalid!")
+                  logger.error("Fallback root index is also invalid!")
                   self.tree_view.setEnabled(False) 
 
-        print(f"Setting tree view root index.")
+        logger.debug("Setting tree view root index.")
         self.tree_view.setRootIndex(root_index)
 
         self.tree_view.setAnimated(False)
@@ -122,51 +157,235 @@ class FileBrowserWidget(QWidget):
         self.tree_view.setColumnHidden(3, True) 
 
         self.tree_view.clicked.connect(self._on_tree_clicked)
+        self.tree_view.keyboardNavigated.connect(self._on_tree_clicked)
+
+        self.thumbnail_grid = ThumbnailGridWidget()
+        self.thumbnail_grid.fileSelected.connect(self._on_thumbnail_selected)
+
+        # Library query over the image index; matches are shown in the thumbnail grid
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Filter, e.g. spatter>3 conf>0.6 mp>1")
+        self.query_edit.setToolTip(
+            "Space-separated terms, all of which must match:\n"
+            "  <class><op><count>   e.g. spatter>3, crack=0\n"
+            "  conf>0.6             confidence of the detections counted above\n"
+            "  mp, width, height, size, detections <op> <number>   e.g. mp>1, size>2MB\n"
+            "  format=PNG, mode=RGB, analyzed, unanalyzed\n"
+            "  sort:<path|size|mtime|mp|detections> (prefix - for descending), limit:<n>\n"
+            "Operators: > >= < <= = !="
+        )
+        self.query_edit.setClearButtonEnabled(True)
+        self.query_edit.setEnabled(self.image_index is not None)
+        self.query_edit.textChanged.connect(lambda _: self._query_timer.start(self.QUERY_DEBOUNCE_MS))
+        self.query_edit.returnPressed.connect(self.refreshQuery)
+        self._query_timer = QTimer(self)
+        self._query_timer.setSingleShot(True)
+        self._query_timer.timeout.connect(self.refreshQuery)
+        layout.addWidget(self.query_edit)
+        self.query_status_label = QLabel()
+        self.query_status_label.hide()
+        layout.addWidget(self.query_status_label)
+
+        self.view_stack = QStackedWidget()
+        self.view_stack.addWidget(self.tree_view)
+        self.view_stack.addWidget(self.thumbnail_grid)
+        layout.addWidget(self.view_stack)
+
+        button_row = QHBoxLayout()
+        self.view_mode_button = QPushButton("Thumbnails")
+        self.view_mode_button.clicked.connect(self.toggleViewMode)
+        button_row.addWidget(self.view_mode_button)
+
+        self.duplicates_button = QPushButton("Duplicates")
+        self.duplicates_button.setCheckable(True)
+        self.duplicates_button.setToolTip("Show only near-duplicate images of this folder, grouped")
+        self.duplicates_button.setEnabled(self.image_index is not None)
+        self.duplicates_button.toggled.connect(self._on_duplicates_toggled)
+        button_row.addWidget(self.duplicates_button)
+
+        self.analyze_folder_button = QPushButton("Analyze Folder")
+        self.analyze_folder_button.clicked.connect(
+            lambda: self.analyzeFolderRequested.emit(self.currentRootPath())
+        )
+        button_row.addWidget(self.analyze_folder_button)
+
+        self.export_button = QPushButton("Export...")
+        self.export_button.setToolTip("Write annotated images and a defect report for this folder")
+        self.export_button.clicked.connect(
+            lambda: self.exportFolderRequested.emit(self.currentRootPath())
+        )
+        button_row.addWidget(self.export_button)
+        layout.addLayout(button_row)
+
+        self.auto_analyze_checkbox = QCheckBox("Analyze new images automatically")
+        self.auto_analyze_checkbox.setChecked(self.auto_analyze)
+        self.auto_analyze_checkbox.toggled.connect(self.autoAnalyzeToggled)
+        layout.addWidget(self.auto_analyze_checkbox)
 
-        layout.addWidget(self.tree_view)
         self.setLayout(layout)
 
         if root_index.isValid():
              self.tree_view.expand(root_index)
 
 
+    def currentRootPath(self):
+        """Returns the directory shown at the root of the tree."""
+        root_index = self.tree_view.rootIndex()
+        if root_index.isValid():
+            return self.file_model.filePath(root_index)
+        return self.target_images_path
+
+    def neighbourFiles(self, file_path, count):
+        """
+        Returns up to count image files on each side of file_path in the tree's
+        current sort order, nearest first and alternating next/previous.
+        """
+        index = self.file_model.index(file_path)
+        if not index.isValid():
+            return []
+
+        def collect(step):
+            found = []
+            current = step(index)
+            while current.isValid() and len(found) < count:
+                info = self.file_model.fileInfo(current)
+                if info.isFile() and info.suffix().lower() in self.allowed_extensions:
+                    found.append(info.absoluteFilePath())
+                current = step(current)
+            return found
+
+        following = collect(self.tree_view.indexBelow)
+        preceding = collect(self.tree_view.indexAbove)
+        neighbours = []
+        for i in range(max(len(following), len(preceding))):
+            neighbours.extend(group[i] for group in (following, preceding) if i < len(group))
+        return neighbours
+
+    def queryActive(self):
+        return bool(self.query_edit.text().strip())
+
+    def duplicatesActive(self):
+        return self.duplicates_button.isChecked()
+
+    def refreshDuplicates(self):
+        """Shows the near-duplicate groups of the current folder in the thumbnail grid, one group after another."""
+        if self.image_index is None:
+            return
+        start = time.perf_counter()
+        groups = self.image_index.nearDuplicateGroups(self.currentRootPath(), self.duplicate_max_distance)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        paths = []
+        captions = {}
+        for number, group in enumerate(groups, start=1):
+            for path in group:
+                paths.append(path)
+                captions[path] = f"[{number}] {os.path.basename(path)}"
+        self.query_status_label.setText(
+            f"{len(groups)} near-duplicate groups, {len(paths)} images ({elapsed_ms:.0f} ms)"
+        )
+        self.query_status_label.show()
+        self.thumbnail_grid.setFiles(paths, captions)
+        self.view_stack.setCurrentWidget(self.thumbnail_grid)
+
+    def _on_duplicates_toggled(self, checked):
+        if checked:
+            self._clear_query()
+            self.refreshDuplicates()
+        else:
+            self.query_status_label.hide()
+            self._show_folder_view()
+
+    def _clear_query(self):
+        self.query_edit.blockSignals(True)
+        self.query_edit.clear()
+        self.query_edit.blockSignals(False)
+        self._query_timer.stop()
+
+    def refreshQuery(self):
+        """Runs the library query in the filter box, or restores the normal view when it is empty."""
+        self._query_timer.stop()
+        text = self.query_edit.text().strip()
+        if text and self.duplicates_button.isChecked():
+            # A query replaces the duplicate groups
+            self.duplicates_button.blockSignals(True)
+            self.duplicates_button.setChecked(False)
+            self.duplicates_button.blockSignals(False)
+        if self.duplicates_button.isChecked():
+            self.refreshDuplicates()
+            return
+        if not text or self.image_index is None:
+            self.query_status_label.hide()
+            self._show_folder_view()
+            return
+        try:
+            query = parse_query(text, default_conf=self.default_conf)
+            start = time.perf_counter()
+            entries = self.image_index.query(query)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            self.query_status_label.setText(f"Invalid filter: {e}")
+            self.query_status_label.show()
+            return
+        self.query_status_label.setText(f"{len(entries)} matching images ({elapsed_ms:.0f} ms)")
+        self.query_status_label.show()
+        self.thumbnail_grid.setFiles([entry['path'] for entry in entries])
+        self.view_stack.setCurrentWidget(self.thumbnail_grid)
+
+    def toggleViewMode(self):
+        """Switches between the file tree and the thumbnail grid of the current root."""
+        if self.queryActive() or self.duplicatesActive():
+            # Switching views leaves a filtered view for the plain folder contents
+            self._clear_query()
+            self.duplicates_button.blockSignals(True)
+            self.duplicates_button.setChecked(False)
+            self.duplicates_button.blockSignals(False)
+            self.query_status_label.hide()
+        self.thumbnail_mode = not self.thumbnail_mode
+        self.view_mode_button.setText("File List" if self.thumbnail_mode else "Thumbnails")
+        self._show_folder_view()
+
+    def _show_folder_view(self):
+        if self.thumbnail_mode:
+            self.thumbnail_grid.setFiles(list_image_files(self.currentRootPath(), self.allowed_extensions))
+            self.view_stack.setCurrentWidget(self.thumbnail_grid)
+        else:
+            self.view_stack.setCurrentWidget(self.tree_view)
+
+    def shutdown(self):
+        self.thumbnail_grid.shutdown()
+
+    def _on_thumbnail_selected(self, file_path):
+        # Keep the tree's current item in step so neighbour prefetching follows the grid
+        index = self.file_model.index(file_path)
+        if index.isValid():
+            self.tree_view.setCurrentIndex(index)
+            self._on_tree_clicked(index)
+        else:
+            self.fileSelected.emit(file_path)
+
+    def setBatchRunning(self, running):
+        self.analyze_folder_button.setText("Cancel Folder Analysis" if running else "Analyze Folder")
+
+    def setExportRunning(self, running, percent=None):
+        if not running:
+            self.export_button.setText("Export...")
+        else:
+            self.export_button.setText("Cancel Export" if percent is None else f"Cancel Export ({percent}%)")
+
     def _on_tree_clicked(self, index: QModelIndex):
         if not index.isValid():
-            print("Clicked invalid index.")
+            logger.debug("Clicked invalid index.")
             return
 
         file_info = self.file_model.fileInfo(index)
         original_file_path = file_info.absoluteFilePath()
-
-        print(f"\n--- Click Detected ---")
-        print(f"Index valid: {index.isValid()}")
-        print(f"Original File path: {original_file_path}")
-        print(f"Is Dir (model): {self.file_model.isDir(index)}")
-        print(f"Is Dir (file_info): {file_info.isDir()}")
-        print(f"Suffix: {file_info.suffix()}")
-        print(f"Target root path (stored, normalized): {self.target_images_path}")
-
         norm_clicked_path = os.path.normcase(os.path.normpath(original_file_path))
+        logger.debug("Selected %s (dir=%s, suffix=%r)", original_file_path, file_info.isDir(), file_info.suffix())
 
-        print(f"Normalized Clicked path: {norm_clicked_path}")
-        print(f"Normalized Target path: {self.target_images_path}")
+        if not norm_clicked_path.startswith(self.target_images_path):
+            logger.warning("Ignoring %s: outside the browsed root %s", norm_clicked_path, self.target_images_path)
+            return
+        self.itemSelected.emit(original_file_path)
 
-        if norm_clicked_path.startswith(self.target_images_path):
-             print("Path comparison successful (within target root).")
-             self.itemSelected.emit(original_file_path)
-        else:
-             print(f"WARNING: Normalized clicked path '{norm_clicked_path}' does not start with target root '{self.target_images_path}'. Ignoring.")
-             return 
-
-        if file_info.isFile(): 
-            print("Item is a file.")
-            suffix = file_info.suffix().lower() 
-            print(f"File suffix (lower): '{suffix}'")
-
-            if suffix in self.allowed_extensions:
-                 print(f"File extension is allowed. Emitting fileSelected: {original_file_path}")
-                 self.fileSelected.emit(original_file_path)
-            else:
-                 print("File extension is NOT in allowed list.")
-        else:
-            print("Item is a directory.")
\ No newline at end of file
+        if file_info.isFile() and file_info.suffix().lower() in self.allowed_extensions + self.video_extensions:
+            self.fileSelected.emit(original_file_path)
@@ -0,0 +1,73 @@
+# image_buffer.py
+"""
+Conversions between QImage, NumPy arrays and PIL images that go through the
+raw pixel buffers instead of encoding to an intermediate file format.
+"""
+import sys
+
+import numpy as np
+from PIL import Image
+from PyQt5.QtGui import QImage
+
+# QImage's 32-bit formats store pixels as native-endian 0xAARRGGBB words
+if sys.byteorder == 'little':
+    _PIL_RAW_MODES = {
+        QImage.Format_RGB32: ('RGB', 'BGRX'),
+        QImage.Format_ARGB32: ('RGBA', 'BGRA'),
+    }
+else:
+    _PIL_RAW_MODES = {
+        QImage.Format_RGB32: ('RGB', 'XRGB'),
+        QImage.Format_ARGB32: ('RGBA', 'ARGB'),
+    }
+_PIL_RAW_MODES.update({
+    QImage.Format_RGB888: ('RGB', 'RGB'),
+    QImage.Format_RGBA8888: ('RGBA', 'RGBA'),
+    QImage.Format_Grayscale8: ('L', 'L'),
+})
+
+_NUMPY_FORMATS = {
+    1: QImage.Format_Grayscale8,
+    3: QImage.Format_RGB888,
+    4: QImage.Format_RGBA8888,
+}
+
+
+def _bits(qimage):
+    ptr = qimage.constBits()
+    ptr.setsize(qimage.bytesPerLine() * qimage.height())
+    return ptr
+
+
+def qimage_to_pil(qimage, mode='RGB'):
+    """Returns a PIL image of qimage in the given mode, decoding the raw buffer with its stride."""
+    if qimage.format() == QImage.Format_ARGB32_Premultiplied:
+        qimage = qimage.convertToFormat(QImage.Format_ARGB32)
+    elif qimage.format() not in _PIL_RAW_MODES:
+        qimage = qimage.convertToFormat(QImage.Format_RGB888)
+    pil_mode, raw_mode = _PIL_RAW_MODES[qimage.format()]
+    size = (qimage.width(), qimage.height())
+    pil_img = Image.frombuffer(pil_mode, size, _bits(qimage), 'raw', raw_mode, qimage.bytesPerLine(), 1)
+    # frombuffer may share memory with the QImage for some modes; load a private copy
+    pil_img = pil_img.copy()
+    return pil_img if pil_img.mode == mode else pil_img.convert(mode)
+
+
+def numpy_to_qimage(array, copy=True):
+    """
+    Returns a QImage for an (H, W), (H, W, 3) or (H, W, 4) uint8 array.
+
+    With copy=False the QImage shares the array's memory and keeps a
+    reference to it for as long as the QImage lives.
+    """
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    if channels not in _NUMPY_FORMATS:
+        raise ValueError(f"Unsupported array shape for QImage: {array.shape}")
+    height, width = array.shape[:2]
+    qimage = QImage(array.data, width, height, array.strides[0], _NUMPY_FORMATS[channels])
+    if copy:
+        return qimage.copy()
+    qimage._array = array
+    return qimage
+
@@ -0,0 +1,155 @@
+# image_cache.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from image_loader import MAX_FULL_DECODE_BYTES, load_image_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_PREFETCH_COUNT = 3
+PREFETCH_WAIT_SECONDS = 0.25  # load() waits this long for a running prefetch before decoding itself
+
+
+def _file_signature(file_path):
+    st = os.stat(file_path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+class DecodedImageCache:
+    """
+    Thread-safe LRU cache of DecodedImage objects bounded by total pixel bytes.
+
+    Entries remember the file's size and mtime and are treated as misses once
+    the file on disk changes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # path -> (signature, DecodedImage)
+        self._lock = threading.Lock()
+
+    def get(self, file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            if _file_signature(file_path) != entry[0]:
+                self.discard(file_path)
+                return None
+        except OSError:
+            self.discard(file_path)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, image, signature=None):
+        if image.nbytes > self.max_bytes:
+            return
+        key = os.path.normcase(os.path.abspath(image.file_path))
+        try:
+            signature = signature or _file_signature(image.file_path)
+        except OSError:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1].nbytes
+            self._entries[key] = (signature, image)
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def discard(self, file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1].nbytes
+
+    def __contains__(self, file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class ImagePrefetcher:
+    """
+    Decodes files into a DecodedImageCache on background threads.
+
+    Each prefetch() call replaces the previous request: queued decodes that
+    have not started yet are cancelled, so fast browsing never builds up a
+    backlog of files the user has already moved past. Images larger than
+    max_decode_bytes decoded are loaded as previews (see load_image_file).
+    """
+
+    def __init__(self, cache, max_workers=2, max_decode_bytes=MAX_FULL_DECODE_BYTES):
+        self.cache = cache
+        self.max_decode_bytes = max_decode_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = []
+        self._in_flight = {}  # path -> threading.Event set when its decode finishes
+        self._lock = threading.Lock()
+
+    def prefetch(self, file_paths):
+        for future in self._pending:
+            future.cancel()
+        self._pending = [
+            self._executor.submit(self._decode, path)
+            for path in file_paths if path not in self.cache
+        ]
+
+    def load(self, file_path, wait_timeout=PREFETCH_WAIT_SECONDS):
+        """
+        Returns the DecodedImage for file_path from the cache, waiting briefly
+        for an in-flight prefetch of it if there is one, or decoding it on this
+        thread. The wait is kept short because load() runs on the GUI thread.
+        """
+        image = self.cache.get(file_path)
+        if image is not None:
+            return image
+        with self._lock:
+            done = self._in_flight.get(file_path)
+        if done is not None and done.wait(wait_timeout):
+            image = self.cache.get(file_path)
+            if image is not None:
+                return image
+        signature = _file_signature(file_path)
+        image = load_image_file(file_path, self.max_decode_bytes)
+        self.cache.put(image, signature)
+        return image
+
+    def shutdown(self):
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _decode(self, file_path):
+        with self._lock:
+            if file_path in self._in_flight:
+                return
+            done = self._in_flight[file_path] = threading.Event()
+        try:
+            if file_path not in self.cache:
+                signature = _file_signature(file_path)
+                self.cache.put(load_image_file(file_path, self.max_decode_bytes), signature)
+        except Exception as e:
+            logger.warning("Prefetch failed for %s: %s", os.path.basename(file_path), e)
+        finally:
+            with self._lock:
+                del self._in_flight[file_path]
+            done.set()
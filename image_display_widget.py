@@ -1,44 +1,164 @@
-import io
+import logging
 import os
-import torch
-import traceback
-
-from PIL import Image
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QFrame, QPushButton
-from PyQt5.QtCore import Qt, QSize, QBuffer, QIODevice
-from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QFont, QImage
+import time
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton,
+                             QStackedWidget, QSlider, QToolButton, QMenu)
+from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap, QImage
+
+from inference_worker import InferenceWorkerPool
+from cpu_scheduler import CpuInferenceScheduler, load_scheduled_backend
+from inference_backend import SerializedBackend
+from viewer_config import load_config
+from detection_cache import DetectionCache, file_sha1
+from detections import detections_from_results
+from overlay import draw_detections
+from image_buffer import numpy_to_qimage, qimage_to_pil
+from image_loader import MAX_FULL_DECODE_BYTES, DecodedImage, load_image_file
+from perf_trace import tracer
+from scaled_pixmap_cache import ScaledPixmapCache
+from tiled_image_view import TiledImageView
+from video_source import VideoAnalyzer, VideoReader
+
+logger = logging.getLogger(__name__)
+
+SMOOTH_RESCALE_DELAY_MS = 150
+SCRUB_DELAY_MS = 15  # Coalesces slider moves so dragging decodes only the frames that get shown
+FILTER_DELAY_MS = 30  # Coalesces confidence slider moves so dragging redraws the overlay once per pause
 
 class ImageDisplayWidget(QFrame):
-    def __init__(self, parent=None):
+    # Emitted once background model loading finishes: success, seconds spent loading
+    modelReady = pyqtSignal(bool, float)
+    # Emitted when Analyze finishes: file path, every detection above the config's conf_floor
+    analysisFinished = pyqtSignal(str, object)
+    # Emitted when a video's analysis finishes: file path, the VideoAnalyzer.run() summary
+    videoAnalysisFinished = pyqtSignal(str, object)
+
+    def __init__(self, parent=None, config=None):
         super().__init__(parent)
-        print("Initializing ImageDisplayWidget...")
+        logger.debug("Initializing ImageDisplayWidget...")
         self.original_pixmap = None # Store the original loaded pixmap
         self.current_pixmap = None  # Store the pixmap currently being displayed (original or analyzed)
         self.analyze_button = None  # Placeholder for the button
-
-        self.model_path = r'C:\Users\pbeac\Repos\image_viewer\AIModel\experiment1_gpu\weights\best.pt'
-        self.model = self._load_yolo_model()
+        self._analysis_job_id = None  # Id of the analysis job whose result we are waiting for
+        self.current_file_path = None
+        self.current_image = None  # DecodedImage shared with the statistics panel and inference
+        self._scaled_cache = None  # ScaledPixmapCache for current_pixmap
+        self.current_detections = None  # raw_detections after the confidence/class filter
+        self.raw_detections = None  # Everything the model returned above the config's conf_floor
+        self.hidden_class_ids = set()
+        self.video_reader = None  # VideoReader while a video is shown; frames are decoded on demand
+        self.video_detections = {}  # Sampled frame index -> Detections from the last video analysis
+        self.video_step = 1  # Frames between sampled frames in video_detections
+        self._video_frame_index = None
+        self._video_analyzer = None
+
+        self._scrub_timer = QTimer(self)
+        self._scrub_timer.setSingleShot(True)
+        self._scrub_timer.setInterval(SCRUB_DELAY_MS)
+        self._scrub_timer.timeout.connect(lambda: self._show_frame(self.frame_slider.value()))
+
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self._apply_detection_filter)
+
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(SMOOTH_RESCALE_DELAY_MS)
+        self._smooth_timer.timeout.connect(self._update_display)
+
+        self.config = config or load_config()
+        self.model_path = self.config["weights_path"]
+        self.confidence_threshold = self.config["conf_threshold"]
+        # Loaded in the background by loadModelAsync() once the window is up
+        self.model = None
+        self.weights_hash = None
+        self.detection_cache = None
+        self._model_job_id = None
+
+        # One worker runs Analyze and video jobs in order off the GUI thread; forward passes shared
+        # with the window's folder analysis are serialized by the model itself (SerializedBackend)
+        self.inference_pool = InferenceWorkerPool(max_concurrent_jobs=1, parent=self)
+        self.inference_pool.resultReady.connect(self._on_analysis_finished)
+        self.inference_pool.resultReady.connect(self._on_model_loaded)
+        self.inference_pool.jobFailed.connect(self._on_analysis_failed)
+        self.inference_pool.jobFailed.connect(self._on_model_load_failed)
 
         self.initUI()
 
+    def loadModelAsync(self):
+        """Starts loading the model on the inference worker; modelReady fires when done."""
+        if self.model or self._model_job_id is not None:
+            return
+        logger.info("Loading model in the background...")
+        self.analyze_button.setToolTip("Loading model...")
+        self._model_job_id = self.inference_pool.submit(self._load_model_job, key="model")
+
+    def _load_model_job(self):
+        """Worker-thread half of loadModelAsync. Must not touch any widgets."""
+        start = time.perf_counter()
+        model = self._load_yolo_model()
+        weights_hash = file_sha1(self.model_path) if model else None
+        return model, weights_hash, time.perf_counter() - start
+
+    def _on_model_loaded(self, job_id, result):
+        if job_id != self._model_job_id:
+            return
+        self._model_job_id = None
+        self.model, self.weights_hash, elapsed = result
+        self.detection_cache = self._open_detection_cache()
+        self.analyze_button.setToolTip("" if self.model else "Model not available")
+        self._reset_analyze_button()
+        self.modelReady.emit(bool(self.model), elapsed)
+
+    def _on_model_load_failed(self, job_id, message):
+        if job_id != self._model_job_id:
+            return
+        self._model_job_id = None
+        logger.error("Error loading model: %s", message)
+        self.analyze_button.setToolTip("Model not available")
+        self.modelReady.emit(False, 0.0)
+
     def _load_yolo_model(self):
-        print(f"Attempting to load YOLOv5 model from: {self.model_path}")
+        logger.debug("Attempting to load %s model from: %s", self.config['backend'], self.model_path)
         model = None
         if not os.path.exists(self.model_path):
-            print(f"Error: Model weights not found at {self.model_path}")
+            logger.error("Model weights not found at %s", self.model_path)
             return None
         try:
-            model = torch.hub.load('ultralytics/yolov5', 'custom', path=self.model_path, force_reload=False, trust_repo=True)
-            model.conf = 0.35
-            print("YOLOv5 model loaded successfully.")
+            model = load_scheduled_backend(self.config)
+            if not isinstance(model, CpuInferenceScheduler):
+                # Analyze, video analysis and the window's folder analysis run on different pools
+                model = SerializedBackend(model)
+            logger.info("%s model loaded successfully.", self.config['backend'])
         except Exception as e:
-            print(f"Error loading YOLOv5 model: {e}")
-            print("Ensure PyTorch, YOLOv5 dependencies are installed and the path is correct.")
-            traceback.print_exc()
+            logger.exception("Error loading model: %s. Ensure the backend's dependencies are installed "
+                             "and the path is correct.", e)
         return model
 
+    def _open_detection_cache(self):
+        if not self.model or not self.weights_hash:
+            return None
+        try:
+            cache = DetectionCache()
+            cache.purgeStaleModels(self.weights_hash)
+            logger.info("Detection cache opened at %s", cache.db_path)
+            return cache
+        except Exception as e:
+            logger.warning("Detection cache unavailable, results will not be cached: %s", e)
+            return None
+
+    def shutdown(self, wait_ms=5000):
+        """Cancels inference jobs and stops the worker processes of multi-process CPU inference."""
+        self.inference_pool.cancelAll()
+        self.inference_pool.waitForDone(wait_ms)
+        if isinstance(self.model, CpuInferenceScheduler):
+            self.model.close()
+
     def initUI(self):
-        print("Initializing UI components.")
+        logger.debug("Initializing UI components.")
         self.setFrameShape(QFrame.StyledPanel)
         self.setFrameShadow(QFrame.Sunken)
         self.setLineWidth(1)
@@ -53,182 +173,409 @@ class ImageDisplayWidget(QFrame):
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setText("No image selected")
         self.image_label.setMinimumSize(300, 300)
-        layout.addWidget(self.image_label, 1) # Give it stretch factor 1
+
+        # Pan/zoom viewer, shown instead of the label while Zoom is toggled on
+        self.tiled_view = TiledImageView()
+
+        self.view_stack = QStackedWidget()
+        self.view_stack.addWidget(self.image_label)
+        self.view_stack.addWidget(self.tiled_view)
+        layout.addWidget(self.view_stack, 1) # Give it stretch factor 1
+
+        # Frame scrubber, only shown while a video is loaded
+        self.video_controls = QWidget()
+        video_row = QHBoxLayout(self.video_controls)
+        video_row.setContentsMargins(0, 0, 0, 0)
+        video_row.addWidget(QLabel("Frame:"))
+        self.frame_slider = QSlider(Qt.Horizontal)
+        self.frame_slider.valueChanged.connect(lambda _: self._scrub_timer.start())
+        video_row.addWidget(self.frame_slider, 1)
+        self.frame_label = QLabel()
+        self.frame_label.setMinimumWidth(160)
+        video_row.addWidget(self.frame_label)
+        self.video_controls.setVisible(False)
+        layout.addWidget(self.video_controls, 0)
+
+        # Confidence threshold and class filter, applied to stored detections without re-running the model
+        filter_row = QHBoxLayout()
+        filter_row.addWidget(QLabel("Confidence:"))
+        self.confidence_slider = QSlider(Qt.Horizontal)
+        self.confidence_slider.setRange(0, 100)
+        self.confidence_slider.setValue(int(round(self.confidence_threshold * 100)))
+        self.confidence_slider.valueChanged.connect(self._on_confidence_changed)
+        filter_row.addWidget(self.confidence_slider, 1)
+        self.confidence_value_label = QLabel(f"{self.confidence_threshold:.2f}")
+        self.confidence_value_label.setMinimumWidth(32)
+        filter_row.addWidget(self.confidence_value_label)
+
+        self.class_filter_button = QToolButton()
+        self.class_filter_button.setText("Classes")
+        self.class_filter_button.setPopupMode(QToolButton.InstantPopup)
+        self.class_filter_menu = QMenu(self.class_filter_button)
+        self.class_filter_button.setMenu(self.class_filter_menu)
+        filter_row.addWidget(self.class_filter_button)
+        layout.addLayout(filter_row, 0)
+        self._set_filter_controls_enabled(False)
+
+        button_row = QHBoxLayout()
 
         # Analyze Button (Fixed height below image)
         self.analyze_button = QPushButton("Analyze")
         self.analyze_button.setFixedHeight(40)
         self.analyze_button.setEnabled(False) # Initially disabled
         self.analyze_button.clicked.connect(self.analyze_image) # Connect signal
-        layout.addWidget(self.analyze_button, 0) # Give it stretch factor 0
+        button_row.addWidget(self.analyze_button, 1)
+
+        self.zoom_button = QPushButton("Zoom")
+        self.zoom_button.setFixedHeight(40)
+        self.zoom_button.setCheckable(True)
+        self.zoom_button.toggled.connect(self._sync_view_mode)
+        button_row.addWidget(self.zoom_button, 0)
+
+        layout.addLayout(button_row, 0) # Give it stretch factor 0
 
         self.setLayout(layout)
-        print("UI Initialized with Image Label and Analyze Button.")
+        logger.debug("UI Initialized with Image Label and Analyze Button.")
 
-    def loadImage(self, file_path):
-        print(f"Attempting to load image: {file_path}")
+    def loadImage(self, image):
+        """Displays image, a DecodedImage from image_loader or a file path to decode."""
+        file_path = image.file_path if isinstance(image, DecodedImage) else image
+        logger.debug("Attempting to load image: %s", file_path)
         self.clearImage() # Clear previous state first
 
         if not file_path or not os.path.exists(file_path):
-            print(f"loadImage: Invalid or non-existent file path: {file_path}")
+            logger.warning("loadImage: Invalid or non-existent file path: %s", file_path)
             return False
 
         try:
-            print("Loading QPixmap from file.")
-            loaded_pixmap = QPixmap(file_path)
+            if not isinstance(image, DecodedImage):
+                logger.debug("Decoding image file.")
+                image = load_image_file(file_path, MAX_FULL_DECODE_BYTES)
+
+            with tracer.span("display.pixmap"):
+                loaded_pixmap = QPixmap.fromImage(image.qimage)
             if loaded_pixmap.isNull():
-                print(f"Error: Failed to load image file: {os.path.basename(file_path)}")
+                logger.error("Failed to load image file: %s", os.path.basename(file_path))
                 self.image_label.setText(f"Error loading:\n{os.path.basename(file_path)}")
                 return False
 
-            print("QPixmap loaded successfully.")
+            logger.debug("QPixmap created successfully.")
+            self.current_image = image
             self.original_pixmap = loaded_pixmap
-            self.current_pixmap = self.original_pixmap.copy()
+            self.current_file_path = file_path
+            self.current_pixmap = self.original_pixmap  # Implicitly shared; analysis draws on its own copy
 
-            print("Updating display with original image.")
+            logger.debug("Updating display with original image.")
             self._update_display()
+            self._sync_view_mode()
 
             if self.model:
-                print("Model available, enabling Analyze button.")
+                logger.debug("Model available, enabling Analyze button.")
                 self.analyze_button.setEnabled(True)
             else:
-                print("Model not available, Analyze button remains disabled.")
+                logger.debug("Model not available, Analyze button remains disabled.")
                 self.analyze_button.setEnabled(False)
 
-            print(f"Successfully loaded image: {os.path.basename(file_path)}")
+            logger.debug("Successfully loaded image: %s", os.path.basename(file_path))
             return True
 
         except Exception as e:
-            print(f"Error loading image {os.path.basename(file_path)}: {e}")
-            traceback.print_exc()
+            logger.exception("Error loading image %s: %s", os.path.basename(file_path), e)
+            self.clearImage()
+            self.image_label.setText(f"Error loading:\n{os.path.basename(file_path)}")
+            return False
+
+    def loadVideo(self, file_path):
+        """Shows the first frame of the video at file_path with a frame scrubber. Frames are decoded one at a time as they are shown."""
+        logger.debug("Attempting to load video: %s", file_path)
+        self.clearImage()
+        try:
+            self.video_reader = VideoReader(file_path)
+        except Exception as e:
+            logger.error("Error opening video %s: %s", os.path.basename(file_path), e)
+            self.image_label.setText(f"Error loading:\n{os.path.basename(file_path)}")
+            return False
+
+        self.current_file_path = file_path
+        self.frame_slider.blockSignals(True)
+        self.frame_slider.setRange(0, max(0, self.video_reader.frame_count - 1))
+        self.frame_slider.setValue(0)
+        self.frame_slider.blockSignals(False)
+        self.video_controls.setVisible(True)
+        self.zoom_button.setEnabled(False)
+        if not self._show_frame(0):
             self.clearImage()
             self.image_label.setText(f"Error loading:\n{os.path.basename(file_path)}")
             return False
+        self.analyze_button.setEnabled(bool(self.model))
+        return True
+
+    def _show_frame(self, index):
+        """Decodes and displays frame index of the loaded video, with the detections of its sampled frame if analyzed."""
+        if self.video_reader is None:
+            return False
+        rgb = self.video_reader.readFrame(index)
+        if rgb is None:
+            logger.warning("Could not read frame %s of %s", index, os.path.basename(self.current_file_path))
+            return False
+        with tracer.span("display.pixmap"):
+            self.original_pixmap = QPixmap.fromImage(numpy_to_qimage(rgb, copy=False))
+        self._video_frame_index = index
+
+        sampled_index = index - index % self.video_step
+        self.raw_detections = self.video_detections.get(sampled_index)
+        text = f"{index + 1}/{self.video_reader.frame_count}  {self.video_reader.timestamp(index):.2f}s"
+        if self.raw_detections is not None and sampled_index != index:
+            text += f"  (boxes from {sampled_index + 1})"
+        self.frame_label.setText(text)
+
+        if self.raw_detections is not None:
+            self._populate_class_filter(self.raw_detections.names)
+            self._set_filter_controls_enabled(True)
+            self._apply_detection_filter()
+        else:
+            self.current_pixmap = self.original_pixmap
+            self.current_detections = None
+            self._update_display()
+        return True
 
     def analyze_image(self):
-        """Runs AI inference on the loaded original image and updates display."""
-        print("Analyze button clicked.")
-        if not self.original_pixmap or self.original_pixmap.isNull():
-            print("Analysis skipped: No original image loaded.")
+        """Queues AI inference on the loaded original image; the display updates when it finishes."""
+        logger.debug("Analyze button clicked.")
+        if self.video_reader is not None and self.model:
+            self._analyze_video()
+            return
+        if self.current_image is None:
+            logger.debug("Analysis skipped: No original image loaded.")
             return
         if not self.model:
-            print("Analysis skipped: Model not available.")
+            logger.debug("Analysis skipped: Model not available.")
             return
 
-        print("Starting AI analysis...")
-        try:
-            print("Converting QPixmap to PIL Image for model.")
-            pil_image = self._qpixmap_to_pil(self.original_pixmap)
-
-            if pil_image:
-                print("Running AI model inference...")
-                results = self.model(pil_image)
-                print(f"AI Model analysis complete.")
-
-                print("Drawing bounding boxes (if any) on pixmap.")
-                pixmap_with_boxes = self._draw_boxes_on_pixmap(self.original_pixmap.copy(), results)
-                self.current_pixmap = pixmap_with_boxes
-
-                print("Updating display with analyzed image.")
-                self._update_display()
-            else:
-                print("Error: Could not convert QPixmap to PIL format for analysis.")
+        logger.debug("Queueing AI analysis...")
+        # The decoded pixels are read-only, so the worker can use them without copying
+        self._analysis_job_id = self.inference_pool.submit(
+            self._run_inference, self.current_image, key="analyze"
+        )
+        self.analyze_button.setEnabled(False)
+        self.analyze_button.setText("Analyzing...")
+
+    def _analyze_video(self):
+        """Queues analysis of the loaded video's sampled frames; scrubbing keeps working meanwhile."""
+        self._video_analyzer = VideoAnalyzer(
+            self.model, sample_fps=self.config["video_sample_fps"], batch_size=self.config["batch_size"],
+            duplicate_threshold=self.config["video_duplicate_threshold"],
+        )
+        self._video_analyzer.progress.connect(self._on_video_progress)
+        self._analysis_job_id = self.inference_pool.submit(
+            self._video_analyzer.run, self.current_file_path, key="analyze", with_cancel_event=True
+        )
+        self.analyze_button.setEnabled(False)
+        self.analyze_button.setText("Analyzing...")
+
+    def _on_video_progress(self, done, total, frames_per_sec):
+        if self._analysis_job_id is not None and total:
+            self.analyze_button.setText(f"Analyzing... {min(100, done * 100 // total)}%")
+
+    def _run_inference(self, image):
+        """Worker-thread half of analyze_image. Must not touch any widgets."""
+        cache = self.detection_cache
+        if cache:
+            detections = cache.get(image.file_path, self.weights_hash, self.model.conf, image.content_hash)
+            if detections is not None:
+                logger.debug("Using cached detections.")
+                return detections
+
+        logger.debug("Running AI model inference...")
+        with tracer.span("inference", images=1):
+            results = self.model(image.rgb_array())
+        logger.debug("AI Model analysis complete.")
+        detections = detections_from_results(results)[0]
+        if image.level:
+            # The model saw a preview; boxes are kept in the file's coordinates
+            scale_x, scale_y = image.pixel_scale
+            detections = detections.scaled(1 / scale_x, 1 / scale_y)
+        if cache:
+            cache.put(image.file_path, self.weights_hash, self.model.conf, detections, image.content_hash)
+        return detections
+
+    def _on_analysis_finished(self, job_id, detections):
+        if job_id != self._analysis_job_id:
+            return
+        self._analysis_job_id = None
+        self._reset_analyze_button()
+        if self.video_reader is not None:
+            self._on_video_analysis_finished(detections)
+            return
+        if not self.original_pixmap or self.original_pixmap.isNull():
+            return
 
+        try:
+            self.raw_detections = detections
+            self._populate_class_filter(detections.names)
+            self._set_filter_controls_enabled(True)
+            self._apply_detection_filter()
+            self.analysisFinished.emit(self.current_file_path, detections)
         except Exception as e:
-            print(f"Error during image analysis: {e}")
-            traceback.print_exc()
+            logger.exception("Error during image analysis: %s", e)
             self.image_label.setText(f"Analysis Error:\n{str(e)}")
 
+    def _on_video_analysis_finished(self, summary):
+        self.video_detections = summary['detections']
+        self.video_step = summary['step']
+        if self._video_frame_index is not None:
+            self._show_frame(self._video_frame_index)
+        self.videoAnalysisFinished.emit(self.current_file_path, summary)
+
+    def _apply_detection_filter(self):
+        """Redraws the overlay from raw_detections using the current threshold and class filter."""
+        if self.raw_detections is None or not self.original_pixmap:
+            return
+        visible_ids = [i for i in self.raw_detections.names if i not in self.hidden_class_ids]
+        detections = self.raw_detections.filtered(self.confidence_threshold, visible_ids)
+
+        logger.debug("Drawing bounding boxes (if any) on pixmap.")
+        drawn = detections
+        if self.current_image is not None and self.current_image.level:
+            drawn = detections.scaled(*self.current_image.pixel_scale)  # The pixmap is a preview
+        self.current_pixmap = self._draw_boxes_on_pixmap(self.original_pixmap.copy(), drawn)
+        self.current_detections = detections
+        if self.tiled_view.source is not None:
+            self.tiled_view.setDetections(detections)
+
+        logger.debug("Updating display with analyzed image.")
+        self._update_display()
+
+    def _on_confidence_changed(self, value):
+        self.confidence_threshold = value / 100.0
+        self.confidence_value_label.setText(f"{self.confidence_threshold:.2f}")
+        self._filter_timer.start()
+
+    def _on_class_filter_toggled(self, class_id, visible):
+        if visible:
+            self.hidden_class_ids.discard(class_id)
+        else:
+            self.hidden_class_ids.add(class_id)
+        self._apply_detection_filter()
+
+    def _populate_class_filter(self, names):
+        if [action.data() for action in self.class_filter_menu.actions()] == list(names):
+            return
+        self.class_filter_menu.clear()
+        for class_id, name in names.items():
+            action = self.class_filter_menu.addAction(name)
+            action.setData(class_id)
+            action.setCheckable(True)
+            action.setChecked(class_id not in self.hidden_class_ids)
+            action.toggled.connect(lambda checked, cid=class_id: self._on_class_filter_toggled(cid, checked))
+
+    def _set_filter_controls_enabled(self, enabled):
+        self.confidence_slider.setEnabled(enabled)
+        self.class_filter_button.setEnabled(enabled)
+
+    def _on_analysis_failed(self, job_id, message):
+        if job_id != self._analysis_job_id:
+            return
+        self._analysis_job_id = None
+        self._reset_analyze_button()
+        logger.error("Error during image analysis: %s", message)
+        self.image_label.setText(f"Analysis Error:\n{message}")
+
+    def _cancel_analysis(self):
+        if self._analysis_job_id is not None:
+            logger.debug("Cancelling pending analysis.")
+            self.inference_pool.cancel("analyze")
+            self._analysis_job_id = None
+        self._reset_analyze_button()
+
+    def _reset_analyze_button(self):
+        if self.analyze_button:
+            self.analyze_button.setText("Analyze")
+            self.analyze_button.setEnabled(bool(self.model) and (self.current_image is not None
+                                                                 or self.video_reader is not None))
 
     def _qpixmap_to_pil(self, qpixmap):
-        print("Attempting QPixmap to PIL conversion.")
+        logger.debug("Attempting QPixmap to PIL conversion.")
+        return self._qimage_to_pil(qpixmap.toImage())
+
+    def _qimage_to_pil(self, qimage):
         try:
-            qimage = qpixmap.toImage()
-            buffer = QBuffer()
-            buffer.open(QIODevice.ReadWrite)
-            qimage.save(buffer, "PNG")
-            buffer.seek(0)
-            image_data = buffer.data()
-            image_stream = io.BytesIO(image_data)
-            pil_img = Image.open(image_stream).convert('RGB')
-            buffer.close()
-            print("QPixmap to PIL conversion successful.")
+            with tracer.span("convert.pil"):
+                pil_img = qimage_to_pil(qimage, 'RGB')
+            logger.debug("QImage to PIL conversion successful.")
             return pil_img
         except Exception as e:
-            print(f"Error converting QPixmap to PIL: {e}")
-            traceback.print_exc()
+            logger.exception("Error converting QImage to PIL: %s", e)
             return None
 
-    def _draw_boxes_on_pixmap(self, pixmap_to_draw_on, yolo_results):
-        painter = QPainter(pixmap_to_draw_on)
-        painter.setRenderHint(QPainter.Antialiasing)
-
-        detections = yolo_results.pandas().xyxy[0]
-        num_detections = len(detections)
-        print(f"Detected {num_detections} objects.")
-
-        if num_detections > 0:
-            print("Drawing bounding boxes...")
-            for index, row in detections.iterrows():
-                xmin, ymin, xmax, ymax = int(row['xmin']), int(row['ymin']), int(row['xmax']), int(row['ymax'])
-                confidence = row['confidence']
-                name = row['name']
-                label = f"{name} {confidence:.2f}"
-
-                pen = QPen(QColor(0, 255, 0, 200), 2)
-                painter.setPen(pen)
-                painter.setBrush(Qt.NoBrush)
-                painter.drawRect(xmin, ymin, xmax - xmin, ymax - ymin)
-
-                font = QFont()
-                font_size = max(8, int(pixmap_to_draw_on.width() / 80))
-                font.setPointSize(font_size)
-                painter.setFont(font)
-                metrics = painter.fontMetrics()
-                text_width = metrics.horizontalAdvance(label) + 4
-                text_height = metrics.height()
-
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(QColor(0, 255, 0, 180))
-                bg_y = ymin - text_height if ymin - text_height > 0 else ymin
-                painter.drawRect(xmin, bg_y, text_width, text_height)
-
-                painter.setPen(QColor(0, 0, 0))
-                painter.drawText(xmin + 2, bg_y + metrics.ascent(), label)
-
-        painter.end()
-        print("Finished drawing bounding boxes (if any).")
+    def _draw_boxes_on_pixmap(self, pixmap_to_draw_on, detections):
+        logger.debug("Detected %s objects.", len(detections))
+        with tracer.span("draw.boxes", boxes=len(detections)):
+            draw_detections(pixmap_to_draw_on, detections)
+        logger.debug("Finished drawing bounding boxes (if any).")
         return pixmap_to_draw_on
 
     def clearImage(self):
-        print("Clearing image display.")
+        logger.debug("Clearing image display.")
+        self._cancel_analysis()
         self.original_pixmap = None
         self.current_pixmap = None
+        self.current_file_path = None
+        self.current_image = None
+        self._scaled_cache = None
+        self._smooth_timer.stop()
+        self.current_detections = None
+        self.raw_detections = None
+        self._set_filter_controls_enabled(False)
+        if self.video_reader is not None:
+            self.video_reader.close()
+            self.video_reader = None
+        self.video_detections = {}
+        self.video_step = 1
+        self._video_frame_index = None
+        self._scrub_timer.stop()
+        self._filter_timer.stop()
+        self.video_controls.setVisible(False)
+        self.zoom_button.setEnabled(True)
+        self.tiled_view.clear()
+        self.view_stack.setCurrentWidget(self.image_label)
         self.image_label.clear()
         self.image_label.setText("No image selected")
         if self.analyze_button:
              self.analyze_button.setEnabled(False)
 
-    def _update_display(self):
-        """Scales and sets the current pixmap on the label."""
+    def _sync_view_mode(self):
+        """Shows the tiled pan/zoom view when Zoom is on and an image is loaded, the fit-to-window label otherwise."""
+        if self.zoom_button.isChecked() and self.current_image is not None:
+            if self.tiled_view.source is None or self.tiled_view.source.file_path != self.current_image.file_path:
+                self.tiled_view.setImage(self.current_image.file_path, self.current_image.pixels,
+                                         self.current_image.level)
+                if self.current_detections:
+                    self.tiled_view.setDetections(self.current_detections)
+            self.view_stack.setCurrentWidget(self.tiled_view)
+            self.tiled_view.fitToWindow()
+        else:
+            self.view_stack.setCurrentWidget(self.image_label)
+            self._update_display()
+
+    def _update_display(self, smooth=True):
+        """Scales and sets the current pixmap on the label. smooth=False is for interactive resizing."""
         if not self.current_pixmap or self.current_pixmap.isNull():
-            print("Update display skipped: current pixmap is invalid.")
+            logger.debug("Update display skipped: current pixmap is invalid.")
             if self.image_label.text() != "No image selected" and "Error" not in self.image_label.text():
                  self.image_label.clear()
                  self.image_label.setText("No image selected")
             return
 
         try:
+             if self._scaled_cache is None or self._scaled_cache.source.cacheKey() != self.current_pixmap.cacheKey():
+                 self._scaled_cache = ScaledPixmapCache(self.current_pixmap)
              target_size = self.image_label.size()
-             scaled_pixmap = self.current_pixmap.scaled(
-                 target_size,
-                 Qt.KeepAspectRatio,
-                 Qt.SmoothTransformation
-             )
+             with tracer.span("display.scale", smooth=smooth):
+                 scaled_pixmap = self._scaled_cache.scaled(target_size, smooth=smooth)
              self.image_label.setPixmap(scaled_pixmap)
         except Exception as e:
-             print(f"Error during _update_display: {e}")
-             traceback.print_exc()
+             logger.exception("Error during _update_display: %s", e)
              self.image_label.setText("Error updating display")
 
 
@@ -236,4 +583,6 @@ class ImageDisplayWidget(QFrame):
         """Handles widget resize events to rescale the displayed image."""
         super().resizeEvent(event)
         if self.current_pixmap:
-             self._update_display()
\ No newline at end of file
+             # Cheap scale while the size is changing; the smooth pass runs once resizing pauses
+             self._update_display(smooth=False)
+             self._smooth_timer.start()
\ No newline at end of file
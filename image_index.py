@@ -0,0 +1,508 @@
+# image_index.py
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from app_paths import user_cache_dir
+from detection_cache import file_sha1
+from image_metadata import read_image_metadata
+from perceptual_hash import (DEFAULT_MAX_DISTANCE, file_dhash, group_near_duplicates, hamming_distances,
+                             hash_array, to_signed)
+
+logger = logging.getLogger(__name__)
+
+RESCAN_DEBOUNCE_MS = 500
+# Files modified more recently than this may still be being written by a capture rig
+SETTLE_SECONDS = 1.0
+# Files still unreadable this long after their last write are indexed as corrupt instead of retried
+UNREADABLE_GRACE_SECONDS = 30.0
+
+_COLUMNS = ('path', 'folder', 'size', 'mtime_ns', 'width', 'height', 'format', 'mode',
+            'content_hash', 'phash', 'detection_summary', 'num_detections', 'indexed_at')
+
+# Query fields that compare a number, mapped to their SQL expression; mp is megapixels
+_NUMERIC_FIELDS = {
+    'mp': 'pixels / 1000000.0',
+    'width': 'width',
+    'height': 'height',
+    'size': 'size',
+    'detections': 'num_detections',
+}
+_TEXT_FIELDS = {'format': 'format', 'mode': 'mode'}
+SORT_FIELDS = {
+    'path': 'path',
+    'name': 'path',
+    'size': 'size',
+    'mtime': 'mtime_ns',
+    'mp': 'pixels',
+    'detections': 'num_detections',
+}
+_TERM_PATTERN = re.compile(r'^([A-Za-z_][\w\-]*)\s*(>=|<=|!=|>|<|=)\s*(\S+)$')
+_SIZE_SUFFIXES = {'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+_SQL_OPERATORS = {'>': '>', '>=': '>=', '<': '<', '<=': '<=', '=': '=', '!=': '!='}
+
+
+class IndexQuery:
+    """
+    A parsed library query. Build one with parse_query() or directly:
+    class_counts holds (class_name, operator, count) conditions evaluated on
+    detections with confidence `conf_op conf`; conditions holds
+    (field, operator, value) comparisons on image metadata.
+    """
+
+    def __init__(self, class_counts=(), conf=0.0, conf_op='>=', conditions=(), analyzed=None,
+                 sort='path', descending=False, limit=None):
+        self.class_counts = list(class_counts)
+        self.conf = conf
+        self.conf_op = conf_op
+        self.conditions = list(conditions)
+        self.analyzed = analyzed
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+
+
+def _parse_number(field, text):
+    if field == 'size' and text[-2:].lower() in _SIZE_SUFFIXES:
+        return float(text[:-2]) * _SIZE_SUFFIXES[text[-2:].lower()]
+    return float(text)
+
+
+def parse_query(text, default_conf=0.0):
+    """
+    Parses a space-separated library query into an IndexQuery, e.g.
+
+        spatter>3 conf>0.6 mp>1 sort:-detections
+
+    Terms: <class><op><count> (per-class detection counts), conf<op><value>
+    (which detections the class counts include, default_conf otherwise),
+    mp/width/height/size/detections<op><number> (size accepts KB/MB/GB),
+    format=<PNG|JPEG|...>, mode=<RGB|L|...>, analyzed, unanalyzed,
+    sort:<field> or sort:-<field> and limit:<n>. Operators are > >= < <= = !=.
+    Raises ValueError on a term it does not understand.
+    """
+    query = IndexQuery(conf=default_conf)
+    for term in text.split():
+        lowered = term.lower()
+        if lowered in ('analyzed', 'unanalyzed'):
+            query.analyzed = lowered == 'analyzed'
+            continue
+        if lowered.startswith('sort:'):
+            field = lowered[5:]
+            query.descending = field.startswith('-')
+            field = field.lstrip('-')
+            if field not in SORT_FIELDS:
+                raise ValueError(f"Cannot sort by {field!r}; expected one of {', '.join(sorted(SORT_FIELDS))}")
+            query.sort = field
+            continue
+        if lowered.startswith('limit:'):
+            query.limit = int(lowered[6:])
+            continue
+        match = _TERM_PATTERN.match(term)
+        if not match:
+            raise ValueError(f"Cannot parse query term {term!r}")
+        field, op, value = match.groups()
+        field_key = field.lower()
+        if field_key == 'conf':
+            if op not in ('>', '>='):
+                raise ValueError("conf only supports > and >=")
+            query.conf, query.conf_op = float(value), op
+        elif field_key in _NUMERIC_FIELDS:
+            query.conditions.append((field_key, op, _parse_number(field_key, value)))
+        elif field_key in _TEXT_FIELDS:
+            if op not in ('=', '!='):
+                raise ValueError(f"{field_key} only supports = and !=")
+            query.conditions.append((field_key, op, value.upper()))
+        else:
+            # Anything else names a detection class
+            if not value.isdigit():
+                raise ValueError(f"Expected a number of {field} detections in {term!r}")
+            query.class_counts.append((field, op, int(value)))
+    return query
+
+
+def default_index_path():
+    return os.path.join(user_cache_dir(), "image_index.sqlite")
+
+
+def _read_header_and_hash(file_path):
+    """Returns (ImageMetadata, content hash, perceptual hash) for file_path, or None if it cannot be read (yet)."""
+    try:
+        return read_image_metadata(file_path), file_sha1(file_path), to_signed(file_dhash(file_path))
+    except Exception:
+        return None
+
+
+class ImageIndex:
+    """
+    Persistent SQLite index of the images in watched folders: path, size, mtime,
+    dimensions, format, mode, content hash, perceptual hash and the summary of
+    the last analysis.
+
+    scanFolder() only reads headers and hashes files whose size or mtime
+    changed since the last scan, so rescanning a large, mostly unchanged folder
+    costs one stat per file. Safe to use from worker threads.
+    """
+
+    def __init__(self, db_path=None, read_threads=4):
+        self.db_path = db_path or default_index_path()
+        self.read_threads = read_threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " path TEXT PRIMARY KEY,"
+            " folder TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " width INTEGER,"
+            " height INTEGER,"
+            " pixels INTEGER,"
+            " format TEXT,"
+            " mode TEXT,"
+            " content_hash TEXT,"
+            " phash INTEGER,"
+            " detection_summary TEXT,"
+            " num_detections INTEGER,"
+            " indexed_at REAL NOT NULL)"
+        )
+        # One row per stored detection. rank is its position among the image's detections
+        # of the same class by descending confidence, so "at least n above c" is a single
+        # index range lookup (rank = n AND conf > c) instead of counting rows per image.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_detections ("
+            " path TEXT NOT NULL,"
+            " class_name TEXT NOT NULL,"
+            " rank INTEGER NOT NULL,"
+            " conf REAL NOT NULL)"
+        )
+        for name, columns in (
+            ("idx_images_folder", "images(folder)"),
+            ("idx_images_pixels", "images(pixels)"),
+            ("idx_images_size", "images(size)"),
+            ("idx_images_mtime", "images(mtime_ns)"),
+            ("idx_images_detections", "images(num_detections)"),
+            # Covers the class-count subqueries without touching the table
+            ("idx_image_detections_rank", "image_detections(class_name, rank, conf, path)"),
+            ("idx_image_detections_path", "image_detections(path)"),
+        ):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_entry(row):
+        entry = dict(zip(_COLUMNS, row))
+        entry['detection_summary'] = json.loads(entry['detection_summary']) if entry['detection_summary'] else None
+        return entry
+
+    def scanFolder(self, folder, extensions, cancel_event=None):
+        """
+        Brings the index of folder up to date with the files on disk.
+
+        Returns a dict of path lists: 'added' and 'changed' files that were
+        (re)indexed, 'removed' files dropped from the index, and 'unsettled'
+        files skipped because they are still being written or unreadable;
+        those are picked up by a later scan.
+        """
+        folder = os.path.abspath(folder)
+        extensions = {ext.lower().lstrip('.') for ext in extensions}
+        changes = {'added': [], 'changed': [], 'removed': [], 'unsettled': []}
+
+        with self._lock:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in self._conn.execute(
+                "SELECT path, size, mtime_ns FROM images WHERE folder = ?", (folder,))}
+
+        on_disk = set()
+        candidates = []
+        now = time.time()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError as e:
+            logger.warning("Image index: cannot list %s: %s", folder, e)
+            return changes
+
+        for entry in entries:
+            if cancel_event is not None and cancel_event.is_set():
+                return changes
+            if os.path.splitext(entry.name)[1].lower().lstrip('.') not in extensions:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            path = os.path.abspath(entry.path)
+            on_disk.add(path)
+            if known.get(path) == (st.st_size, st.st_mtime_ns):
+                continue
+            if now - st.st_mtime < SETTLE_SECONDS:
+                changes['unsettled'].append(path)
+                continue
+            candidates.append((path, st))
+
+        # Header reads and hashing are I/O bound, so changed files are read in parallel
+        with ThreadPoolExecutor(max_workers=self.read_threads, thread_name_prefix="image-index-read") as pool:
+            read_results = pool.map(_read_header_and_hash, [path for path, _ in candidates])
+            updates = []
+            for (path, st), result in zip(candidates, read_results):
+                if result is not None:
+                    metadata, content_hash, phash = result
+                    header = (metadata.width, metadata.height, metadata.format, metadata.mode)
+                elif now - st.st_mtime < UNREADABLE_GRACE_SECONDS:
+                    # Most likely a partially written file; retried on the next scan
+                    changes['unsettled'].append(path)
+                    continue
+                else:
+                    header, content_hash, phash = (None, None, None, None), None, None
+                updates.append((path, folder, st.st_size, st.st_mtime_ns) + header + (content_hash, phash, now))
+                changes['changed' if path in known else 'added'].append(path)
+        if cancel_event is not None and cancel_event.is_set():
+            return changes
+
+        changes['removed'] = sorted(set(known) - on_disk - set(changes['unsettled']))
+        with self._lock:
+            # A changed file keeps its path but its old detection summary no longer applies
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO images (path, folder, size, mtime_ns, width, height, pixels, format, mode,"
+                " content_hash, phash, detection_summary, num_detections, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, ?)",
+                [row[:6] + (row[4] * row[5] if row[4] is not None else None,) + row[6:] for row in updates]
+            )
+            stale = [(p,) for p in changes['removed'] + [row[0] for row in updates]]
+            self._conn.executemany("DELETE FROM image_detections WHERE path = ?", stale)
+            self._conn.executemany("DELETE FROM images WHERE path = ?", [(p,) for p in changes['removed']])
+            self._conn.commit()
+        for key in ('added', 'changed'):
+            changes[key].sort()
+        return changes
+
+    def updateDetections(self, detections_by_path, summary_conf=0.0):
+        """
+        Stores every detection of each {file_path: Detections} for queries, and
+        the per-class counts at summary_conf as that file's last detection summary.
+        """
+        summaries = []
+        rows = []
+        for path, dets in detections_by_path.items():
+            path = os.path.abspath(path)
+            shown = dets.filtered(summary_conf)
+            summaries.append((json.dumps(shown.counts(), sort_keys=True), len(shown), path))
+            # Sort by class, then by descending confidence, to number each class's detections
+            order = np.lexsort((-dets.confidences, dets.class_ids))
+            rank = 0
+            previous = None
+            for conf, cls in dets.array[order, 4:6].tolist():
+                rank = rank + 1 if cls == previous else 1
+                previous = cls
+                rows.append((path, dets.names.get(int(cls), str(int(cls))), rank, conf))
+        with self._lock:
+            self._conn.executemany("UPDATE images SET detection_summary = ?, num_detections = ? WHERE path = ?",
+                                   summaries)
+            self._conn.executemany("DELETE FROM image_detections WHERE path = ?", [(s[2],) for s in summaries])
+            # Only files that are indexed get detection rows
+            self._conn.executemany(
+                "INSERT INTO image_detections (path, class_name, rank, conf)"
+                " SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM images WHERE path = ?)",
+                [row + (row[0],) for row in rows]
+            )
+            self._conn.commit()
+
+    def nearDuplicateGroups(self, folder=None, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Returns lists of paths whose perceptual hashes are within max_distance
+        bits of each other (transitively), optionally only within folder.
+        Groups are sorted by path and only groups of two or more are returned.
+        """
+        sql = "SELECT path, phash FROM images WHERE phash IS NOT NULL"
+        params = ()
+        if folder is not None:
+            sql += " AND folder = ?"
+            params = (os.path.abspath(folder),)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY path", params).fetchall()
+        if not rows:
+            return []
+        paths = [row[0] for row in rows]
+        groups = group_near_duplicates(hash_array(row[1] for row in rows), max_distance)
+        return [[paths[i] for i in members] for members in groups]
+
+    def duplicateRepresentatives(self, file_paths, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Maps each of file_paths that is a near-duplicate of an earlier one in
+        file_paths (in sorted order) to the first earlier representative within
+        max_distance bits of it. Groups are linked transitively, so members
+        further than that from every representative become representatives
+        themselves and are analyzed. Paths that are not indexed, or that are
+        representatives, are left out.
+        """
+        wanted = sorted({os.path.abspath(p): p for p in file_paths}.items())
+        with self._lock:
+            known = dict(self._conn.execute(
+                "SELECT path, phash FROM images WHERE phash IS NOT NULL AND path IN (SELECT value FROM json_each(?))",
+                (json.dumps([path for path, _ in wanted]),)
+            ).fetchall())
+        indexed = [(path, original) for path, original in wanted if path in known]
+        representatives = {}
+        hashes = hash_array(known[path] for path, _ in indexed)
+        for members in group_near_duplicates(hashes, max_distance):
+            chosen = []  # Indices of the group's representatives so far
+            for i in members.tolist():
+                if chosen:
+                    distances = hamming_distances(hashes[chosen], hashes[i])
+                    nearest = int(np.argmax(distances <= max_distance))
+                    if distances[nearest] <= max_distance:
+                        representatives[indexed[i][1]] = indexed[chosen[nearest]][1]
+                        continue
+                chosen.append(i)
+        return representatives
+
+    def query(self, query, folder=None):
+        """Returns the entries matching an IndexQuery (or query string), optionally only those in folder."""
+        if isinstance(query, str):
+            query = parse_query(query)
+        where, params = [], []
+        if folder is not None:
+            where.append("folder = ?")
+            params.append(os.path.abspath(folder))
+        if query.analyzed is not None:
+            where.append("num_detections IS NOT NULL" if query.analyzed else "num_detections IS NULL")
+        for field, op, value in query.conditions:
+            column = _NUMERIC_FIELDS.get(field) or _TEXT_FIELDS[field]
+            where.append(f"{column} {_SQL_OPERATORS[op]} ?")
+            params.append(value)
+
+        conf_op = '>' if query.conf_op == '>' else '>='
+        for class_name, op, count in query.class_counts:
+            clause, clause_params = self._class_count_clause(class_name, op, count, conf_op, query.conf)
+            where.append(clause)
+            params.extend(clause_params)
+
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM images"
+        if where:
+            sql += " WHERE " + " AND ".join(f"({clause})" for clause in where)
+        sql += f" ORDER BY {SORT_FIELDS.get(query.sort, 'path')} {'DESC' if query.descending else 'ASC'}, path"
+        if query.limit:
+            sql += " LIMIT ?"
+            params.append(int(query.limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    @staticmethod
+    def _class_count_clause(class_name, op, count, conf_op, conf):
+        """Returns (sql, params) for "number of class_name detections with conf `conf_op` conf is `op` count"."""
+        def at_least(n):
+            if n <= 0:
+                return "1", []
+            return (f"path IN (SELECT path FROM image_detections WHERE class_name = ? AND rank = ? AND conf {conf_op} ?)",
+                    [class_name, n, conf])
+
+        def negated(n):
+            sql, params = at_least(n)
+            return f"num_detections IS NOT NULL AND NOT ({sql})", params
+
+        if op == '>':
+            return at_least(count + 1)
+        if op == '>=':
+            return at_least(count)
+        if op == '<':
+            return negated(count)
+        if op == '<=':
+            return negated(count + 1)
+        low, low_params = at_least(count)
+        high, high_params = negated(count + 1)
+        if op == '=':
+            return f"({low}) AND ({high})", low_params + high_params
+        return f"num_detections IS NOT NULL AND NOT (({low}) AND ({high}))", low_params + high_params
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FolderIndexer(QObject):
+    """
+    Keeps an ImageIndex current for one watched folder.
+
+    A QFileSystemWatcher triggers a debounced incremental rescan on a
+    background thread whenever the folder's entries change. indexUpdated is
+    emitted after every scan; newFilesDetected only for files that appeared
+    after watching started, which is what auto-analysis queues.
+    """
+    indexUpdated = pyqtSignal(str, object)
+    newFilesDetected = pyqtSignal(list)
+    _scanned = pyqtSignal(str, object, bool)
+
+    def __init__(self, index, extensions, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.extensions = extensions
+        self.folder = None
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._schedule_rescan)
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.timeout.connect(lambda: self._start_scan(initial=False))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-index")
+        self._cancel_event = threading.Event()
+        self._scanning = False
+        self._rescan_pending = False
+        self._scanned.connect(self._on_scanned)
+
+    def watch(self, folder):
+        """Starts watching folder instead of the previous one and indexes what is already there."""
+        folder = os.path.abspath(folder)
+        if self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+        self.folder = folder
+        self._watcher.addPath(folder)
+        self._start_scan(initial=True)
+
+    def shutdown(self):
+        self._rescan_timer.stop()
+        self._cancel_event.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _schedule_rescan(self, _path=None):
+        self._rescan_timer.start(RESCAN_DEBOUNCE_MS)
+
+    def _start_scan(self, initial):
+        if self._scanning:
+            # Rescan once the running scan finishes instead of running two at once
+            self._rescan_pending = True
+            return
+        self._scanning = True
+        self._executor.submit(self._scan, self.folder, initial)
+
+    def _scan(self, folder, initial):
+        try:
+            changes = self.index.scanFolder(folder, self.extensions, self._cancel_event)
+        except Exception as e:
+            logger.warning("Image index: scan of %s failed: %s", folder, e)
+            changes = {'added': [], 'changed': [], 'removed': [], 'unsettled': []}
+        self._scanned.emit(folder, changes, initial)
+
+    def _on_scanned(self, folder, changes, initial):
+        self._scanning = False
+        if folder != self.folder:
+            self._rescan_pending = False
+            self._start_scan(initial=True)
+            return
+        if self._rescan_pending:
+            self._rescan_pending = False
+            self._start_scan(initial=False)
+        elif changes['unsettled']:
+            self._rescan_timer.start(int(SETTLE_SECONDS * 1000))
+        self.indexUpdated.emit(folder, changes)
+        if not initial and changes['added']:
+            self.newFilesDetected.emit(changes['added'])
@@ -0,0 +1,164 @@
+# image_loader.py
+import hashlib
+import io
+import logging
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from image_buffer import numpy_to_qimage
+from perf_trace import tracer
+
+logger = logging.getLogger(__name__)
+
+# Images whose decoded pixels would exceed this are loaded for the viewer as a reduced preview
+MAX_FULL_DECODE_BYTES = 256 * 1024 * 1024
+PREVIEW_MAX_SIDE = 4096
+
+
+class DecodedImage:
+    """
+    An image decoded once from disk and shared by display, statistics and inference.
+
+    pixels is a read-only (H, W, 3) RGB or (H, W, 4) RGBA uint8 array; qimage
+    shares that memory, so neither the display nor the model needs to decode
+    or convert the file again. format, mode, width and height describe the
+    file as stored, mirroring the attributes of a PIL image.
+
+    level > 0 marks a preview of an image too large to decode whole: pixels
+    then hold the image at 1/2**level scale, while width and height are still
+    the file's.
+    """
+
+    def __init__(self, file_path, pixels, format, mode, file_size, content_hash, info=None, size=None, level=0):
+        self.file_path = file_path
+        self.pixels = pixels
+        self.format = format
+        self.mode = mode
+        self.file_size = file_size
+        self.content_hash = content_hash
+        self.info = info or {}
+        self.width, self.height = size or (pixels.shape[1], pixels.shape[0])
+        self.level = level
+        self._qimage = None
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @property
+    def pixel_scale(self):
+        """(x, y) factors from file coordinates to pixel coordinates; (1.0, 1.0) unless this is a preview."""
+        return self.pixels.shape[1] / self.width, self.pixels.shape[0] / self.height
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
+
+    @property
+    def qimage(self):
+        if self._qimage is None:
+            self._qimage = numpy_to_qimage(self.pixels, copy=False)
+        return self._qimage
+
+    def rgb_array(self):
+        """Returns the pixels as (H, W, 3) RGB, dropping alpha without copying."""
+        return self.pixels[:, :, :3]
+
+    def to_pil(self):
+        return Image.fromarray(self.rgb_array(), 'RGB')
+
+
+def level_size(size, level):
+    """Size of the 1/2**level resolution level of an image of the given (width, height)."""
+    factor = 1 << level
+    return (max(1, -(-size[0] // factor)), max(1, -(-size[1] // factor)))
+
+
+def preview_level(size, max_side=PREVIEW_MAX_SIDE):
+    """The finest level whose longer side is at most max_side."""
+    level = 0
+    while max(level_size(size, level)) > max_side:
+        level += 1
+    return level
+
+
+def draft_level(img, level):
+    """
+    Lets the JPEG decoder of an opened, not yet loaded img scale it toward
+    1/2**level while decoding. Returns the factor the loaded image still has
+    to be reduced by to reach that level (1 << level for other formats).
+    """
+    factor = 1 << level
+    if img.format != 'JPEG' or factor == 1:
+        return factor
+    width = img.width
+    # draft() picks the largest DCT scale (1/1..1/8) that is still >= size
+    img.draft('RGB', level_size(img.size, level))
+    return factor >> round(math.log2(width / img.width))
+
+
+def load_image_file(file_path, max_bytes=None):
+    """
+    Reads and decodes file_path once and returns a DecodedImage.
+
+    With max_bytes, an image whose decoded pixels would be larger is returned
+    as a preview at preview_level() (coarser if that would still not fit) instead, decoded at reduced scale where the
+    format allows it (JPEG), so its full resolution is never held in memory.
+
+    Raises FileNotFoundError, PIL.UnidentifiedImageError or OSError like
+    Image.open/load would for missing, unrecognised or corrupt files.
+    """
+    with tracer.span("load.read"):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    with tracer.span("load.hash"):
+        content_hash = hashlib.sha1(data).hexdigest()
+
+    with tracer.span("load.decode"), Image.open(io.BytesIO(data)) as img:
+        source_format = img.format
+        source_mode = img.mode
+        source_size = img.size
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        channels = 4 if has_alpha else 3
+        level = 0
+        if max_bytes is not None and source_size[0] * source_size[1] * channels > max_bytes:
+            level = max(1, preview_level(source_size))
+            while math.prod(level_size(source_size, level)) * channels > max_bytes:
+                level += 1
+            reduce_by = draft_level(img, level)
+        img.load()  # Raises on truncated or corrupt data, which is what verify() was for
+        info = dict(img.info)
+        target_mode = 'RGBA' if has_alpha else 'RGB'
+        converted = img if img.mode == target_mode else img.convert(target_mode)
+        if level and reduce_by > 1:
+            converted = converted.reduce(reduce_by)
+        pixels = np.asarray(converted)
+
+    pixels.setflags(write=False)
+    return DecodedImage(
+        file_path=file_path,
+        pixels=pixels,
+        format=source_format,
+        mode=source_mode,
+        file_size=len(data),
+        content_hash=content_hash,
+        info=info,
+        size=source_size,
+        level=level,
+    )
+
+
+def list_image_files(root_path, extensions):
+    """Returns the sorted image files directly inside root_path whose suffix is in extensions."""
+    extensions = {ext.lower().lstrip('.') for ext in extensions}
+    files = []
+    try:
+        for entry in os.scandir(root_path):
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower().lstrip('.') in extensions:
+                files.append(entry.path)
+    except OSError as e:
+        logger.error("Error listing images in %s: %s", root_path, e)
+    return sorted(files)
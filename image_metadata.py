@@ -0,0 +1,180 @@
+# image_metadata.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ExifTags
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METADATA_ENTRIES = 10000
+DEFAULT_HISTOGRAM_ENTRIES = 256
+_EXIF_IFD = 0x8769
+
+# EXIF tags shown in the statistics panel, in display order
+EXIF_FIELDS = (
+    'Make', 'Model', 'DateTimeOriginal', 'ExposureTime', 'FNumber',
+    'ISOSpeedRatings', 'FocalLength', 'Orientation', 'Software',
+)
+_EXIF_TAG_IDS = {name: tag for tag, name in ExifTags.TAGS.items() if name in EXIF_FIELDS}
+_DATETIME_TAG = 0x0132
+
+
+class ImageMetadata:
+    """
+    What the file header says about an image, read without decoding pixels.
+    Has the same width/height/format/mode/file_size attributes as DecodedImage.
+    """
+
+    def __init__(self, file_path, width, height, format, mode, file_size, mtime_ns, exif=None):
+        self.file_path = file_path
+        self.width = width
+        self.height = height
+        self.format = format
+        self.mode = mode
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.exif = exif or {}
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+def _exif_value(value):
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'replace')
+    if isinstance(value, str):
+        return value.strip('\x00 ').strip()
+    if isinstance(value, tuple):
+        return value[0] if len(value) == 1 else value
+    return value
+
+
+def read_image_metadata(file_path):
+    """
+    Reads dimensions, format, mode, file size and the EXIF fields in
+    EXIF_FIELDS from file_path's header. Image.open only parses the header;
+    the pixel data is never decoded. Raises like Image.open for unreadable files.
+    """
+    st = os.stat(file_path)
+    with Image.open(file_path) as img:
+        return ImageMetadata(file_path, img.width, img.height, img.format, img.mode,
+                             st.st_size, st.st_mtime_ns, _exif_fields(img))
+
+
+def read_exif(file_path):
+    """Reads only the EXIF fields in EXIF_FIELDS from file_path's header, as a dict."""
+    with Image.open(file_path) as img:
+        return _exif_fields(img)
+
+
+def _exif_fields(img):
+    exif = {}
+    raw = img.getexif()
+    if raw:
+        tags = dict(raw)
+        tags.update(raw.get_ifd(_EXIF_IFD))
+        for name in EXIF_FIELDS:
+            value = tags.get(_EXIF_TAG_IDS.get(name))
+            if value is not None and value != '':
+                exif[name] = _exif_value(value)
+    if 'DateTimeOriginal' not in exif and raw.get(_DATETIME_TAG):
+        exif['DateTimeOriginal'] = _exif_value(raw.get(_DATETIME_TAG))
+    return exif
+
+
+def _read_or_none(file_path):
+    try:
+        return read_image_metadata(file_path)
+    except Exception as e:
+        logger.warning("Could not read metadata of %s: %s", os.path.basename(file_path), e)
+        return None
+
+
+class MetadataCache:
+    """
+    Thread-safe LRU of ImageMetadata, validated against each file's size and mtime.
+
+    prefetch() reads a whole directory's headers in the background so that
+    selecting any image in it fills the statistics panel without touching the file.
+    """
+
+    def __init__(self, max_entries=DEFAULT_METADATA_ENTRIES, max_workers=4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # normalized path -> ImageMetadata
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metadata")
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def exif(self, file_path):
+        """Returns the EXIF fields of file_path from a cached header, or reads just those on a miss."""
+        key = self._key(file_path)
+        st = os.stat(file_path)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached.file_size, cached.mtime_ns) == (st.st_size, st.st_mtime_ns):
+                self._entries.move_to_end(key)
+                return cached.exif
+        return read_exif(file_path)
+
+    def _store(self, metadata):
+        with self._lock:
+            self._entries[self._key(metadata.file_path)] = metadata
+            self._entries.move_to_end(self._key(metadata.file_path))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prefetch(self, file_paths):
+        """Reads the headers of the uncached file_paths on the background pool."""
+        with self._lock:
+            missing = [p for p in file_paths if self._key(p) not in self._entries]
+        for file_path in missing:
+            self._executor.submit(self._prefetch_one, file_path)
+
+    def _prefetch_one(self, file_path):
+        metadata = _read_or_none(file_path)
+        if metadata is not None:
+            self._store(metadata)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def compute_histogram(pixels):
+    """
+    Returns a (channels, 256) int64 array of per-channel value counts for a
+    uint8 (H, W) or (H, W, C) array; alpha is ignored.
+    """
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    channels = min(pixels.shape[2], 3)
+    return np.stack([np.bincount(pixels[:, :, c].ravel(), minlength=256) for c in range(channels)])
+
+
+class HistogramCache:
+    """Thread-safe LRU of histograms keyed by content hash, so each image's histogram is computed once."""
+
+    def __init__(self, max_entries=DEFAULT_HISTOGRAM_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, content_hash, pixels):
+        with self._lock:
+            histogram = self._entries.get(content_hash)
+            if histogram is not None:
+                self._entries.move_to_end(content_hash)
+                return histogram
+        histogram = compute_histogram(pixels)
+        with self._lock:
+            self._entries[content_hash] = histogram
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return histogram
@@ -0,0 +1,273 @@
+# inference_backend.py
+"""
+Interchangeable YOLOv5 inference backends.
+
+Every backend is called like the torch.hub AutoShape model: with one image
+(H x W x 3 RGB array or PIL image) or a list of them, returning an object
+with .names and .xyxy (one (N, 6) array of xmin, ymin, xmax, ymax, conf, class
+per image), so detections_from_results works the same for all of them.
+"""
+import abc
+import ast
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from viewer_config import load_config
+
+logger = logging.getLogger(__name__)
+
+LETTERBOX_FILL = 114
+MAX_DETECTIONS = 300
+_CLASS_OFFSET = 4096  # Shifts boxes per class so one NMS pass never suppresses across classes
+
+
+class DetectionResults:
+    def __init__(self, names, xyxy):
+        self.names = names
+        self.xyxy = xyxy
+
+
+def letterbox(rgb, size):
+    """Resizes rgb to fit a size x size square, padding with grey. Returns (canvas, scale, (pad_x, pad_y))."""
+    h, w = rgb.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    if (new_w, new_h) != (w, h):
+        rgb = np.asarray(Image.fromarray(rgb).resize((new_w, new_h), Image.BILINEAR))
+    canvas = np.full((size, size, 3), LETTERBOX_FILL, dtype=np.uint8)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = rgb
+    return canvas, scale, (pad_x, pad_y)
+
+
+def box_iou_one_to_many(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def non_max_suppression(prediction, conf_threshold, iou_threshold, max_det=MAX_DETECTIONS):
+    """
+    Class-aware NMS for one image of raw YOLOv5 output rows
+    (cx, cy, w, h, objectness, class scores...). Returns an (N, 6) float32 array.
+    """
+    prediction = prediction[prediction[:, 4] > conf_threshold]
+    if not len(prediction):
+        return np.zeros((0, 6), dtype=np.float32)
+    scores = prediction[:, 5:] * prediction[:, 4:5]
+    classes = scores.argmax(1)
+    confidences = scores[np.arange(len(scores)), classes]
+    keep = confidences > conf_threshold
+    xywh, confidences, classes = prediction[keep, :4], confidences[keep], classes[keep]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    shifted = boxes + classes[:, None] * _CLASS_OFFSET
+
+    order = confidences.argsort()[::-1]
+    kept = []
+    while order.size and len(kept) < max_det:
+        best, rest = order[0], order[1:]
+        kept.append(best)
+        order = rest[box_iou_one_to_many(shifted[best], shifted[rest]) <= iou_threshold]
+    kept = np.array(kept, dtype=np.int64)
+    return np.concatenate(
+        [boxes[kept], confidences[kept, None], classes[kept, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+def _as_rgb_array(image):
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('RGB'))
+    return np.asarray(image)[:, :, :3]
+
+
+def _parse_names(raw):
+    if not raw:
+        return None
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    return {int(k): v for k, v in names.items()}
+
+
+class InferenceBackend(abc.ABC):
+    """
+    Base for backends that run a raw exported YOLOv5 network and do pre/post-processing in NumPy.
+    Subclasses implement _forward().
+    """
+    name = ""
+
+    def __init__(self, weights_path, conf=0.35, iou=0.45, img_size=640, cpu_threads=0, **options):
+        if not os.path.exists(weights_path):
+            raise FileNotFoundError(f"Model weights not found at {weights_path}")
+        self.weights_path = weights_path
+        self.conf = conf
+        self.iou = iou
+        self.img_size = img_size
+        self.cpu_threads = cpu_threads
+        self.names = {}
+
+    def __call__(self, images):
+        single = not isinstance(images, (list, tuple))
+        images = [images] if single else images
+        prepared = [letterbox(_as_rgb_array(img), self.img_size) for img in images]
+        batch = np.stack([canvas for canvas, _, _ in prepared]).transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+        raw = self._forward(batch)
+        if not self.names:
+            self.names = {i: f"class{i}" for i in range(raw.shape[-1] - 5)}
+
+        xyxy = []
+        for prediction, (_, scale, (pad_x, pad_y)), img in zip(raw, prepared, images):
+            detections = non_max_suppression(prediction, self.conf, self.iou)
+            h, w = _as_rgb_array(img).shape[:2]
+            detections[:, [0, 2]] = np.clip((detections[:, [0, 2]] - pad_x) / scale, 0, w)
+            detections[:, [1, 3]] = np.clip((detections[:, [1, 3]] - pad_y) / scale, 0, h)
+            xyxy.append(detections)
+        return DetectionResults(self.names, xyxy)
+
+    @abc.abstractmethod
+    def _forward(self, batch):
+        """Runs the network on an (N, 3, S, S) float32 batch and returns (N, rows, 5 + classes)."""
+
+
+class TorchHubBackend:
+    """The YOLOv5 AutoShape model from torch.hub, loaded from a local clone when one is available."""
+    name = "torch"
+
+    def __init__(self, weights_path, conf=0.35, iou=0.45, img_size=640, cpu_threads=0, yolov5_repo="", **options):
+        import torch  # Deferred: importing torch alone takes seconds
+        if not os.path.exists(weights_path):
+            raise FileNotFoundError(f"Model weights not found at {weights_path}")
+        if cpu_threads:
+            torch.set_num_threads(cpu_threads)
+        self.weights_path = weights_path
+        self.img_size = img_size
+        local_repo = yolov5_repo or os.path.join(torch.hub.get_dir(), "ultralytics_yolov5_master")
+        if os.path.isdir(local_repo):
+            logger.info("Loading YOLOv5 code from local repository %s", local_repo)
+            self.model = torch.hub.load(local_repo, 'custom', path=weights_path, source='local')
+        else:
+            logger.info("No local YOLOv5 repository found; fetching ultralytics/yolov5 through torch.hub.")
+            self.model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights_path,
+                                        force_reload=False, trust_repo=True)
+        self.model.conf = conf
+        self.model.iou = iou
+        self.names = self.model.names
+
+    @property
+    def conf(self):
+        return self.model.conf
+
+    @conf.setter
+    def conf(self, value):
+        self.model.conf = value
+
+    def __call__(self, images):
+        return self.model(images, size=self.img_size)
+
+
+class TorchScriptBackend(InferenceBackend):
+    """A YOLOv5 network exported to TorchScript (see export_model.py); needs torch but not the YOLOv5 code."""
+    name = "torchscript"
+
+    def __init__(self, weights_path, **options):
+        super().__init__(weights_path, **options)
+        import torch  # Deferred: importing torch alone takes seconds
+        self._torch = torch
+        if self.cpu_threads:
+            torch.set_num_threads(self.cpu_threads)
+        extra_files = {'config.txt': ''}
+        self.module = torch.jit.load(weights_path, map_location='cpu', _extra_files=extra_files)
+        self.module.eval()
+        if extra_files['config.txt']:
+            self.names = _parse_names(json.loads(extra_files['config.txt']).get('names')) or {}
+
+    def _forward(self, batch):
+        with self._torch.no_grad():
+            output = self.module(self._torch.from_numpy(batch))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return output.numpy()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """A YOLOv5 network exported to ONNX, run on ONNX Runtime's CPU provider. Needs neither torch nor network access."""
+    name = "onnx"
+
+    def __init__(self, weights_path, **options):
+        super().__init__(weights_path, **options)
+        import onnxruntime as ort
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.cpu_threads:
+            session_options.intra_op_num_threads = self.cpu_threads
+        self.session = ort.InferenceSession(weights_path, session_options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Static-batch exports only accept one image per run
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        if isinstance(model_input.shape[2], int):
+            self.img_size = model_input.shape[2]
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = _parse_names(metadata.get('names')) or {}
+
+    def _forward(self, batch):
+        if self.fixed_batch == 1 and len(batch) > 1:
+            return np.concatenate([self._forward(batch[i:i + 1]) for i in range(len(batch))])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class SerializedBackend:
+    """
+    Shares one in-process backend between threads by running one forward pass
+    at a time; each pass already uses all the runtime's intra-op threads.
+    Attributes such as .conf and .names are read from the wrapped backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+
+    def __call__(self, images):
+        with self._lock:
+            return self.backend(images)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+BACKENDS = {
+    TorchHubBackend.name: TorchHubBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+
+def load_backend(config=None):
+    """Creates the backend selected by config (viewer_config.load_config() when omitted)."""
+    config = config or load_config()
+    backend_class = BACKENDS.get(config["backend"])
+    if backend_class is None:
+        raise ValueError(f"Unknown inference backend {config['backend']!r}; expected one of {sorted(BACKENDS)}")
+    return backend_class(
+        config["weights_path"],
+        conf=min(config["conf_floor"], config["conf_threshold"]),
+        iou=config["iou_threshold"],
+        img_size=config["img_size"],
+        cpu_threads=config["cpu_threads"],
+        yolov5_repo=config["yolov5_repo"],
+    )
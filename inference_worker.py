@@ -0,0 +1,134 @@
+# inference_worker.py
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class _JobSignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+
+class InferenceJob(QRunnable):
+    """Runs a single callable on the worker pool and reports back via signals."""
+
+    def __init__(self, job_id, key, fn, args, kwargs, with_cancel_event=False):
+        super().__init__()
+        self.setAutoDelete(False)  # The pool keeps a reference until the job reports back
+        self.job_id = job_id
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_event = threading.Event()
+        if with_cancel_event:
+            # Long-running jobs poll this to stop early when cancelled
+            self.kwargs = dict(kwargs, cancel_event=self.cancel_event)
+        self.signals = _JobSignals()
+
+    def run(self):
+        if self.cancel_event.is_set():
+            # Cancelled after the pool could no longer take it back from the queue
+            self.signals.cancelled.emit(self.job_id)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.exception("Inference job %s failed: %s", self.job_id, e)
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, result)
+
+
+class InferenceWorkerPool(QObject):
+    """
+    Runs inference jobs off the GUI thread.
+
+    Jobs are submitted under a key; submitting a new job for a key supersedes
+    the previous one, which is dropped from the queue if it has not started yet
+    and has its result discarded if it is already running. Results are
+    delivered on the GUI thread through the resultReady signal.
+    """
+    resultReady = pyqtSignal(int, object)
+    jobFailed = pyqtSignal(int, str)
+    jobCancelled = pyqtSignal(int)
+
+    def __init__(self, max_concurrent_jobs=1, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(1, int(max_concurrent_jobs)))
+        self._next_job_id = 1
+        self._jobs = {}        # job_id -> InferenceJob (queued or running)
+        self._latest_by_key = {}  # key -> most recent job_id
+
+    def submit(self, fn, *args, key="default", with_cancel_event=False, **kwargs):
+        """
+        Queues fn(*args, **kwargs) and returns the job id, cancelling any older job for key.
+        With with_cancel_event=True, fn also receives the job's threading.Event as cancel_event.
+        """
+        self.cancel(key)
+
+        job_id = self._next_job_id
+        self._next_job_id += 1
+
+        job = InferenceJob(job_id, key, fn, args, kwargs, with_cancel_event)
+        job.signals.finished.connect(self._on_job_finished)
+        job.signals.failed.connect(self._on_job_failed)
+        job.signals.cancelled.connect(self._on_job_cancelled)
+        self._jobs[job_id] = job
+        self._latest_by_key[key] = job_id
+        self.thread_pool.start(job)
+        return job_id
+
+    def cancel(self, key="default"):
+        """Cancels the current job for key, if any."""
+        job_id = self._latest_by_key.pop(key, None)
+        if job_id is None:
+            return
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.cancel_event.set()
+        if self.thread_pool.tryTake(job):
+            # Never started, so it will never report back
+            self._jobs.pop(job_id, None)
+        self.jobCancelled.emit(job_id)
+
+    def cancelAll(self):
+        for key in list(self._latest_by_key):
+            self.cancel(key)
+
+    def isCurrent(self, job_id):
+        job = self._jobs.get(job_id)
+        return job is not None and self._latest_by_key.get(job.key) == job_id
+
+    def activeJobCount(self):
+        return len(self._jobs)
+
+    def waitForDone(self, msecs=-1):
+        return self.thread_pool.waitForDone(msecs)
+
+    def _on_job_finished(self, job_id, result):
+        current = self.isCurrent(job_id)
+        job = self._jobs.pop(job_id, None)
+        if job is None or not current or job.cancel_event.is_set():
+            logger.debug("Discarding result of superseded inference job %s.", job_id)
+            return
+        self._latest_by_key.pop(job.key, None)
+        self.resultReady.emit(job_id, result)
+
+    def _on_job_cancelled(self, job_id):
+        # cancel() already emitted jobCancelled; the job only has to stop counting as active
+        self._jobs.pop(job_id, None)
+
+    def _on_job_failed(self, job_id, message):
+        current = self.isCurrent(job_id)
+        job = self._jobs.pop(job_id, None)
+        if job is None or not current:
+            return
+        self._latest_by_key.pop(job.key, None)
+        self.jobFailed.emit(job_id, message)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# inspect_cli.py
+"""
+Headless batch inspection: runs the viewer's detection pipeline over image
+files without Qt widgets or a display, e.g. on build machines.
+
+Images come from directories and files on the command line, or one path per
+line on stdin ("-" or no arguments). Each worker process loads the model once
+and scores its share of the images in batches; one record per image is
+streamed to stdout (or --output) as JSON Lines or CSV as soon as its batch
+finishes, with per-image decode, inference and total latency in milliseconds.
+
+    python inspect_cli.py images/ --format csv --output nightly.csv
+    find /data/welds -name '*.jpg' | python inspect_cli.py --workers 4 > nightly.jsonl
+
+Exits with 1 if the model could not be loaded and 2 if any image could not be read.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from app_logging import configure_logging
+from cpu_scheduler import choose_split
+from detections import detections_from_results
+from image_loader import load_image_file, list_image_files
+from viewer_config import load_config, default_weights_path
+
+SUPPORTED_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'gif')
+CSV_FIELDS = ('path', 'status', 'width', 'height', 'num_detections', 'counts',
+              'decode_ms', 'inference_ms', 'latency_ms', 'error')
+
+_worker_model = None
+_worker_conf = None
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _init_worker(config):
+    """Loads the model once per worker process."""
+    global _worker_model, _worker_conf
+    from inference_backend import load_backend  # Imported here so only workers pay for the runtime
+    _worker_model = load_backend(config)
+    _worker_conf = config["conf_threshold"]
+
+
+def _failure_record(path, error, decode_ms=0.0):
+    return {'path': path, 'status': 'error', 'error': error, 'decode_ms': round(decode_ms, 2),
+            'inference_ms': 0.0, 'latency_ms': round(decode_ms, 2)}
+
+
+def inspect_batch(file_paths, raw_detections=False):
+    """
+    Decodes and scores file_paths in one model call inside a worker process.
+    Returns one record per path; the batch's inference time is split evenly
+    across the images in it. The record's 'detections' are rounded for output;
+    with raw_detections=True it also carries the unrounded Detections as
+    'raw_detections', for callers that score them.
+    """
+    records = {}
+    decoded = []
+    for path in file_paths:
+        start = time.perf_counter()
+        try:
+            image = load_image_file(path)
+        except Exception as e:
+            records[path] = _failure_record(path, str(e), (time.perf_counter() - start) * 1000)
+            continue
+        decoded.append((path, image, (time.perf_counter() - start) * 1000))
+
+    if decoded:
+        start = time.perf_counter()
+        results = _worker_model([image.rgb_array() for _, image, _ in decoded])
+        inference_ms = (time.perf_counter() - start) * 1000 / len(decoded)
+        for (path, image, decode_ms), detections in zip(decoded, detections_from_results(results)):
+            detections = detections.filtered(_worker_conf)
+            records[path] = {
+                'path': path,
+                'status': 'ok',
+                'width': image.width,
+                'height': image.height,
+                'num_detections': len(detections),
+                'counts': detections.counts(),
+                'detections': [{'class': name, 'class_id': class_id, 'conf': round(conf, 4),
+                                'box': [round(v, 1) for v in box]}
+                               for (name, conf, box), class_id in zip(detections, detections.class_ids.tolist())],
+                'decode_ms': round(decode_ms, 2),
+                'inference_ms': round(inference_ms, 2),
+                'latency_ms': round(decode_ms + inference_ms, 2),
+            }
+            if raw_detections:
+                records[path]['raw_detections'] = detections
+    return [records[path] for path in file_paths]
+
+
+def iter_input_paths(inputs, stdin=None, recursive=False):
+    """Yields image paths from files and directories in inputs, or from stdin lines for "-"."""
+    for item in inputs or ['-']:
+        if item == '-':
+            for line in stdin or sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        elif os.path.isdir(item):
+            if recursive:
+                for root, dirs, _ in os.walk(item):
+                    dirs.sort()
+                    yield from list_image_files(root, SUPPORTED_EXTENSIONS)
+            else:
+                yield from list_image_files(item, SUPPORTED_EXTENSIONS)
+        else:
+            yield item
+
+
+def _batched(paths, batch_size):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RecordWriter:
+    """Writes inspection records as JSON Lines or CSV, flushing after every batch."""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self._csv is not None:
+                row = dict(record)
+                row['counts'] = json.dumps(record.get('counts', {}), sort_keys=True)
+                self._csv.writerow(row)
+            else:
+                self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+
+
+def run_inspection(paths, config, writer, workers=1, batch_size=1, raw_detections=False):
+    """
+    Streams records for paths through writer and returns a summary dict.
+    Keeps at most two batches per worker in flight, so stdin input is
+    consumed as it arrives and memory stays bounded for any number of files.
+    raw_detections is passed on to inspect_batch().
+    """
+    summary = {'processed': 0, 'failed': 0, 'detections': 0}
+    start = time.perf_counter()
+    batches = _batched(paths, batch_size)
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    pending.add(pool.submit(inspect_batch, batch, raw_detections))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                records = future.result()
+                writer.write(records)
+                for record in records:
+                    summary['processed'] += 1
+                    if record['status'] == 'ok':
+                        summary['detections'] += record['num_detections']
+                    else:
+                        summary['failed'] += 1
+
+    summary['elapsed'] = time.perf_counter() - start
+    summary['images_per_sec'] = summary['processed'] / summary['elapsed'] if summary['elapsed'] > 0 else 0.0
+    return summary
+
+
+def parse_args(argv, config):
+    parser = argparse.ArgumentParser(description="Score images with the weld defect model without a display.")
+    parser.add_argument("inputs", nargs="*", help="Image files or directories; '-' or nothing reads paths from stdin.")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", "-o", help="Write records here instead of stdout.")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Descend into subdirectories.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Worker processes, each with its own copy of the model; 0 measures the fastest split.")
+    parser.add_argument("--batch-size", type=int, default=config["batch_size"])
+    parser.add_argument("--backend", default=config["backend"])
+    parser.add_argument("--weights", help="Weights file; defaults to the configured one for the backend.")
+    parser.add_argument("--conf", type=float, default=config["conf_threshold"])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    config = load_config()
+    configure_logging(config["log_level"])
+    args = parse_args(sys.argv[1:] if argv is None else argv, config)
+
+    workers = max(0, args.workers)
+    if args.backend != config["backend"] and not args.weights:
+        config["weights_path"] = default_weights_path(args.backend)
+    config.update(backend=args.backend, conf_threshold=args.conf, batch_size=max(1, args.batch_size))
+    if args.weights:
+        config["weights_path"] = args.weights
+    if not workers:
+        try:
+            workers, config["cpu_threads"] = choose_split(config)
+        except Exception as e:
+            _log(f"Inspection failed: {e}")
+            return 1
+        _log(f"Using {workers} workers with {config['cpu_threads']} threads each")
+    if not config["cpu_threads"]:
+        # Split the cores between workers instead of letting every runtime claim all of them
+        config["cpu_threads"] = max(1, (os.cpu_count() or 1) // workers)
+
+    stream = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        summary = run_inspection(iter_input_paths(args.inputs, recursive=args.recursive), config,
+                                 RecordWriter(stream, args.format), workers=workers,
+                                 batch_size=max(1, args.batch_size))
+    except Exception as e:
+        # The pool re-raises worker initialisation errors (e.g. missing weights) here
+        _log(f"Inspection failed: {e}")
+        return 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    _log(f"Inspected {summary['processed']} images ({summary['failed']} unreadable), "
+         f"{summary['detections']} detections in {summary['elapsed']:.1f}s "
+         f"({summary['images_per_sec']:.1f} images/sec)")
+    return 2 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,77 @@
 #!/usr/bin/env python3
 # main.py
+import time
+_PROCESS_START = time.perf_counter()
+
+import argparse
+import json
+import logging
+import os
 import sys
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 import qdarkstyle
-import PIL
 
+from app_logging import configure_logging
+from viewer_config import load_config
+from perf_trace import tracer
 # Import the main window class
 from main_window import ImageViewer
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Weld image viewer")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="Print startup timings as JSON once the model is ready, then exit.")
+    parser.add_argument("--benchmark-timeout", type=float, default=120.0,
+                        help="Seconds to wait for the model in --startup-benchmark mode.")
+    parser.add_argument("--trace-out", metavar="PATH",
+                        help="Write the recorded timing spans as Chrome trace JSON to PATH on exit.")
+    return parser.parse_known_args(argv[1:])[0]
+
+def run_startup_benchmark(app, viewer, timeout):
+    """Records time-to-first-window and time-to-model-ready, measured from process start."""
+    timings = {}
+
+    def first_window():
+        timings['time_to_first_window'] = time.perf_counter() - _PROCESS_START
+
+    def model_ready(success, load_seconds):
+        timings['time_to_model_ready'] = time.perf_counter() - _PROCESS_START
+        timings['model_load_seconds'] = load_seconds
+        timings['model_loaded'] = success
+        finish()
+
+    def finish():
+        print(json.dumps(timings), flush=True)
+        app.quit()
+
+    # A zero-delay timer fires once the event loop has processed the first show/paint
+    QTimer.singleShot(0, first_window)
+    viewer.image_display.modelReady.connect(model_ready)
+    QTimer.singleShot(int(timeout * 1000), finish)
+
 def main():
+    args = parse_args(sys.argv)
+    configure_logging(load_config()["log_level"])
     app = QApplication(sys.argv)
     
     # Apply dark style (optional)
     try:
         app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
     except Exception as e:
-        print(f"Could not load dark style: {e}. Using default.")
+        logging.warning("Could not load dark style: %s. Using default.", e)
 
+    if args.trace_out:
+        # Through the usual override, so spans are recorded from the window's construction on
+        os.environ["IMAGE_VIEWER_PERF_TRACING"] = "1"
     viewer = ImageViewer()
     viewer.show()
-    sys.exit(app.exec_())
+    if args.startup_benchmark:
+        run_startup_benchmark(app, viewer, args.benchmark_timeout)
+    exit_code = app.exec_()
+    if args.trace_out:
+        tracer.exportChromeTrace(args.trace_out)
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,28 @@
+import logging
 import os
+import time
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
-                             QSplitter)
-from PyQt5.QtCore import Qt
+                             QSplitter, QFileDialog)
+from PyQt5.QtCore import Qt, QTimer
 from PIL import Image
 
 from file_browser_widget import FileBrowserWidget
 from image_display_widget import ImageDisplayWidget
 from statistics_panel_widget import StatisticsPanelWidget
+from performance_panel_widget import PerformancePanelWidget
+from image_cache import DecodedImageCache, ImagePrefetcher, DEFAULT_PREFETCH_COUNT
 from console_widget import ConsoleWidget
+from inference_worker import InferenceWorkerPool
+from batch_analyzer import BatchAnalyzer
+from annotated_export import AnnotatedExporter
+from viewer_config import load_config
+from image_loader import list_image_files
+from image_index import ImageIndex, FolderIndexer
+from image_metadata import MetadataCache
+from perf_trace import tracer
+from video_source import VIDEO_FORMATS
+
+logger = logging.getLogger(__name__)
 
 class ImageViewer(QMainWindow):
     SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
@@ -18,8 +33,40 @@ class ImageViewer(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
         
         self.current_image_path = None
+        self.started_at = time.perf_counter()
+        self.model_ready_at = None
+        self.config = load_config()
+        tracer.enabled = self.config["perf_tracing"] or self.config["performance_panel"]
+        self.batch_size = self.config["batch_size"]
+        self.batch_job_id = None
+        self.batch_results = {}
+        self.batch_analyzer = None
+        self.image_cache = DecodedImageCache()
+        self.prefetcher = ImagePrefetcher(self.image_cache)
+        self.prefetch_count = DEFAULT_PREFETCH_COUNT
+        self.metadata_cache = MetadataCache()
+        self.metadata_folder = None
+        self.batch_pool = InferenceWorkerPool(max_concurrent_jobs=1, parent=self)
+        self.batch_pool.resultReady.connect(self.handle_batch_finished)
+        self.batch_pool.jobFailed.connect(self.handle_batch_failed)
+        self.export_job_id = None
+        self.exporter = None
+        self.export_pool = InferenceWorkerPool(max_concurrent_jobs=1, parent=self)
+        self.export_pool.resultReady.connect(self.handle_export_finished)
+        self.export_pool.jobFailed.connect(self.handle_export_failed)
+        self.auto_analyze = self.config["auto_analyze_new_files"]
+        self.auto_analyze_queue = []
+        self.image_index = self._open_image_index()
+        self.folder_indexer = None
         self.initUI()
 
+    def _open_image_index(self):
+        try:
+            return ImageIndex()
+        except Exception as e:
+            logger.warning("Image index unavailable, folder watching disabled: %s", e)
+            return None
+
     def initUI(self):
         try:
             self.central_widget = QWidget()
@@ -28,10 +75,13 @@ class ImageViewer(QMainWindow):
             
             self.h_splitter = QSplitter(Qt.Horizontal)
             
-            self.file_browser = FileBrowserWidget()
+            self.file_browser = FileBrowserWidget(auto_analyze=self.auto_analyze, image_index=self.image_index,
+                                                  default_conf=self.config["conf_threshold"],
+                                                  duplicate_max_distance=self.config["duplicate_max_distance"])
             self.console = ConsoleWidget()
-            self.image_display = ImageDisplayWidget()
+            self.image_display = ImageDisplayWidget(config=self.config)
             self.statistics_panel = StatisticsPanelWidget()
+            self.performance_panel = PerformancePanelWidget() if self.config["performance_panel"] else None
             
             self.middle_splitter = QSplitter(Qt.Vertical)
             self.middle_splitter.addWidget(self.image_display)
@@ -40,7 +90,13 @@ class ImageViewer(QMainWindow):
 
             self.h_splitter.addWidget(self.file_browser)
             self.h_splitter.addWidget(self.middle_splitter)
-            self.h_splitter.addWidget(self.statistics_panel)
+            if self.performance_panel is not None:
+                self.right_splitter = QSplitter(Qt.Vertical)
+                self.right_splitter.addWidget(self.statistics_panel)
+                self.right_splitter.addWidget(self.performance_panel)
+                self.h_splitter.addWidget(self.right_splitter)
+            else:
+                self.h_splitter.addWidget(self.statistics_panel)
             
             self.main_layout.addWidget(self.h_splitter)
             
@@ -48,38 +104,324 @@ class ImageViewer(QMainWindow):
             
             self.file_browser.fileSelected.connect(self.handle_file_selected)
             self.file_browser.itemSelected.connect(self.handle_item_selected)
+            self.file_browser.analyzeFolderRequested.connect(self.handle_analyze_folder)
+            self.file_browser.exportFolderRequested.connect(self.handle_export_folder)
+            self.image_display.modelReady.connect(self.handle_model_ready)
+            self.image_display.analysisFinished.connect(self.handle_analysis_finished)
+            self.image_display.videoAnalysisFinished.connect(self.handle_video_analysis_finished)
+            self.file_browser.autoAnalyzeToggled.connect(self.handle_auto_analyze_toggled)
+
+            if self.image_index is not None:
+                self.folder_indexer = FolderIndexer(self.image_index, self.SUPPORTED_FORMATS, parent=self)
+                self.folder_indexer.indexUpdated.connect(self.handle_index_updated)
+                self.folder_indexer.newFilesDetected.connect(self.handle_new_files)
+                self.folder_indexer.watch(self.file_browser.currentRootPath())
 
             self.console.logMessage("Image Viewer started. Select an image from the file browser.")
         except Exception as e:
-            print(f"Error in initUI: {e}")
+            logger.error("Error in initUI: %s", e)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.image_display.model:
+            # Let the window paint first; the model loads on a worker thread
+            QTimer.singleShot(0, self.image_display.loadModelAsync)
+
+    def handle_model_ready(self, success, load_seconds):
+        self.model_ready_at = time.perf_counter()
+        if success:
+            self.console.logMessage(
+                f"Model ready ({load_seconds:.1f}s to load, "
+                f"{self.model_ready_at - self.started_at:.1f}s after startup)."
+            )
+        else:
+            self.console.logMessage("Model could not be loaded; analysis is unavailable.")
+        if success:
+            self._start_queued_analysis()
+
+    def closeEvent(self, event):
+        # A running batch shares the model's worker processes, so it stops before they do
+        self.batch_pool.cancelAll()
+        self.batch_pool.waitForDone(5000)
+        self.export_pool.cancelAll()
+        self.export_pool.waitForDone(5000)
+        self.image_display.shutdown()
+        self.prefetcher.shutdown()
+        self.metadata_cache.shutdown()
+        self.statistics_panel.shutdown()
+        self.file_browser.shutdown()
+        if self.folder_indexer is not None:
+            self.folder_indexer.shutdown()
+        if self.image_index is not None:
+            self.image_index.close()
+        super().closeEvent(event)
 
     def handle_item_selected(self, path):
         try:
-            if not os.path.isdir(path) and not path.lower().endswith(self.SUPPORTED_FORMATS):
+            if not os.path.isdir(path) and not path.lower().endswith(self.SUPPORTED_FORMATS + VIDEO_FORMATS):
                  self.console.logMessage(f"Selected non-image file: {os.path.basename(path)}")
             elif os.path.isdir(path):
                  self.console.logMessage(f"Selected directory: {os.path.basename(path)}")
         except Exception as e:
-            print(f"Error in handle_item_selected: {e}")
+            logger.error("Error in handle_item_selected: %s", e)
+
+
+    def handle_analyze_folder(self, folder_path):
+        try:
+            if self.batch_job_id is not None:
+                self.batch_pool.cancel("batch")
+                self.batch_job_id = None
+                self.auto_analyze_queue = []
+                self.file_browser.setBatchRunning(False)
+                self.console.logMessage("Folder analysis cancelled.")
+                return
+
+            if not self.image_display.model:
+                self.console.logMessage("Folder analysis unavailable: model not loaded.")
+                return
+
+            file_paths = list_image_files(folder_path, self.SUPPORTED_FORMATS)
+            if not file_paths:
+                self.console.logMessage(f"No images to analyze in {folder_path}")
+                return
+
+            self._start_batch(file_paths)
+            self.console.logMessage(
+                f"Analyzing {len(file_paths)} images in {os.path.basename(folder_path) or folder_path} "
+                f"(batch size {self.batch_size})..."
+            )
+        except Exception as e:
+            logger.error("Error in handle_analyze_folder: %s", e)
+
+    def handle_export_folder(self, folder_path):
+        try:
+            if self.export_job_id is not None:
+                self.export_pool.cancel("export")
+                self.export_job_id = None
+                self.file_browser.setExportRunning(False)
+                self.console.logMessage("Export cancelled.")
+                return
+
+            file_paths = list_image_files(folder_path, self.SUPPORTED_FORMATS)
+            if not file_paths:
+                self.console.logMessage(f"No images to export in {folder_path}")
+                return
+            output_dir = QFileDialog.getExistingDirectory(self, "Export Annotated Images To",
+                                                          os.path.dirname(folder_path.rstrip(os.sep)))
+            if not output_dir:
+                return
+
+            self.exporter = AnnotatedExporter(self._stored_detections_lookup(),
+                                              min_conf=self.image_display.confidence_threshold,
+                                              workers=self.config["export_workers"])
+            self.exporter.progress.connect(self.handle_export_progress)
+            self.export_job_id = self.export_pool.submit(
+                self.exporter.run, file_paths, output_dir, key="export", with_cancel_event=True
+            )
+            self.file_browser.setExportRunning(True)
+            self.console.logMessage(f"Exporting {len(file_paths)} images to {output_dir}...")
+        except Exception as e:
+            logger.error("Error in handle_export_folder: %s", e)
+
+    def _stored_detections_lookup(self):
+        """
+        Returns a thread-safe lookup of each file's stored detections: the last
+        folder analysis first, then the detection cache for the loaded weights.
+        """
+        batch_results = dict(self.batch_results)  # The export threads must not see later updates mid-run
+        cache = self.image_display.detection_cache
+        weights_hash = self.image_display.weights_hash
+        conf = self.image_display.model.conf if self.image_display.model else None
+
+        def lookup(file_path):
+            detections = batch_results.get(file_path)
+            if detections is None and cache is not None and weights_hash:
+                detections = cache.get(file_path, weights_hash, conf)
+            return detections
+        return lookup
 
+    def handle_export_progress(self, done, total, images_per_sec):
+        if self.export_job_id is not None and total:
+            self.file_browser.setExportRunning(True, done * 100 // total)
+
+    def handle_export_finished(self, job_id, summary):
+        if job_id != self.export_job_id:
+            return
+        self.export_job_id = None
+        self.file_browser.setExportRunning(False)
+        self.console.logMessage(
+            f"Exported {summary['exported']} annotated images ({summary['detections']} detections) "
+            f"in {summary['elapsed']:.1f}s; report: {summary['report']}"
+        )
+        if summary['not_analyzed']:
+            self.console.logMessage(f"{summary['not_analyzed']} images have no stored detections; "
+                                    f"analyze the folder to include them.")
+        for file_path in summary['failed']:
+            self.console.logMessage(f"Could not export image: {os.path.basename(file_path)}")
+
+    def handle_export_failed(self, job_id, message):
+        if job_id != self.export_job_id:
+            return
+        self.export_job_id = None
+        self.file_browser.setExportRunning(False)
+        self.console.logMessage(f"Export failed: {message}")
+
+    def _start_batch(self, file_paths):
+        duplicates = {}
+        if self.image_index is not None and self.config["batch_duplicates"] in ("reuse", "skip"):
+            try:
+                duplicates = self.image_index.duplicateRepresentatives(file_paths, self.config["duplicate_max_distance"])
+            except Exception as e:
+                logger.warning("Near-duplicate lookup failed, analyzing every image: %s", e)
+        self.batch_analyzer = BatchAnalyzer(
+            self.image_display.model, batch_size=self.batch_size,
+            cache=self.image_display.detection_cache,
+            weights_hash=self.image_display.weights_hash,
+            duplicates=duplicates, reuse_duplicates=self.config["batch_duplicates"] == "reuse",
+        )
+        self.batch_analyzer.progress.connect(self.handle_batch_progress)
+        self.batch_job_id = self.batch_pool.submit(
+            self.batch_analyzer.run, file_paths, key="batch", with_cancel_event=True
+        )
+        self.file_browser.setBatchRunning(True)
+
+    def _start_queued_analysis(self):
+        """Analyzes the new files queued by the folder watcher once the model is free."""
+        if not self.auto_analyze_queue or self.batch_job_id is not None or not self.image_display.model:
+            return
+        file_paths, self.auto_analyze_queue = self.auto_analyze_queue, []
+        self._start_batch(file_paths)
+        self.console.logMessage(f"Auto-analyzing {len(file_paths)} new images...")
+
+    def handle_auto_analyze_toggled(self, enabled):
+        self.auto_analyze = enabled
+        if not enabled:
+            self.auto_analyze_queue = []
+
+    def _refresh_library_query(self):
+        if self.file_browser.queryActive():
+            self.file_browser.refreshQuery()
+        elif self.file_browser.duplicatesActive():
+            self.file_browser.refreshDuplicates()
+
+    def handle_index_updated(self, folder, changes):
+        if changes['added'] or changes['changed'] or changes['removed']:
+            self._refresh_library_query()
+        if changes['changed']:
+            self.console.logMessage(f"Re-indexed {len(changes['changed'])} modified images in {os.path.basename(folder)}")
+        if changes['removed']:
+            self.console.logMessage(f"{len(changes['removed'])} images removed from {os.path.basename(folder)}")
+
+    def handle_new_files(self, file_paths):
+        self.console.logMessage(f"{len(file_paths)} new images: {', '.join(os.path.basename(p) for p in file_paths[:5])}"
+                                f"{'...' if len(file_paths) > 5 else ''}")
+        if self.auto_analyze:
+            queued = set(self.auto_analyze_queue)
+            self.auto_analyze_queue.extend(p for p in file_paths if p not in queued)
+            self._start_queued_analysis()
+
+    def handle_analysis_finished(self, file_path, detections):
+        if self.image_index is not None and file_path:
+            self.image_index.updateDetections({file_path: detections}, self.config["conf_threshold"])
+            self._refresh_library_query()
+
+    def handle_video_analysis_finished(self, file_path, summary):
+        threshold = self.image_display.confidence_threshold
+        analyzed_frames = {k: v for k, v in summary['detections'].items() if k not in summary['duplicates']}
+        num_defects = sum(len(dets.filtered(threshold)) for dets in analyzed_frames.values())
+        self.console.logMessage(
+            f"Video analysis finished: {os.path.basename(file_path)}, {summary['analyzed']} frames analyzed "
+            f"(every {summary['step']} of {summary['frame_count']}), {len(summary['duplicates'])} near-duplicates "
+            f"skipped, {num_defects} detections in {summary['elapsed']:.1f}s"
+        )
+
+    def handle_batch_progress(self, done, total, images_per_sec):
+        self.console.logMessage(f"Analyzed {done}/{total} images ({images_per_sec:.1f} images/sec)")
+
+    def handle_batch_finished(self, job_id, summary):
+        if job_id != self.batch_job_id:
+            return
+        self.batch_job_id = None
+        self.file_browser.setBatchRunning(False)
+        self.batch_results.update(summary['detections'])
+        threshold = self.image_display.confidence_threshold
+        num_defects = sum(len(dets.filtered(threshold)) for dets in summary['detections'].values())
+        if self.image_index is not None:
+            self.image_index.updateDetections(summary['detections'], self.config["conf_threshold"])
+            self._refresh_library_query()
+        self.console.logMessage(
+            f"Folder analysis finished: {summary['processed']}/{summary['total']} images, "
+            f"{num_defects} detections in {summary['elapsed']:.1f}s "
+            f"({summary['images_per_sec']:.1f} images/sec)"
+        )
+        if summary['duplicates']:
+            action = "Reused detections for" if self.batch_analyzer.reuse_duplicates else "Skipped"
+            self.console.logMessage(f"{action} {len(summary['duplicates'])} near-duplicate images.")
+        for file_path in summary['failed']:
+            self.console.logMessage(f"Could not read image: {os.path.basename(file_path)}")
+        self._start_queued_analysis()
+
+    def handle_batch_failed(self, job_id, message):
+        if job_id != self.batch_job_id:
+            return
+        self.batch_job_id = None
+        self.file_browser.setBatchRunning(False)
+        self.console.logMessage(f"Folder analysis failed: {message}")
+        self._start_queued_analysis()
 
     def handle_file_selected(self, file_path):
         try:
             if file_path.lower().endswith(self.SUPPORTED_FORMATS):
                 self.load_image(file_path)
+            elif file_path.lower().endswith(VIDEO_FORMATS):
+                self.load_video(file_path)
+        except Exception as e:
+            logger.error("Error in handle_file_selected: %s", e)
+
+    def _update_statistics(self, file_path, decoded_image):
+        folder = os.path.dirname(file_path)
+        if folder != self.metadata_folder:
+            # Read the rest of the folder's headers in the background for the next selections
+            self.metadata_folder = folder
+            self.metadata_cache.prefetch(list_image_files(folder, self.SUPPORTED_FORMATS))
+        # The decode already gave size, format and mode; only the EXIF fields come from the header
+        try:
+            exif = self.metadata_cache.exif(file_path)
         except Exception as e:
-            print(f"Error in handle_file_selected: {e}")
+            logger.warning("EXIF unavailable for %s: %s", os.path.basename(file_path), e)
+            exif = {}
+        self.statistics_panel.updateStats(file_path, decoded_image, exif)
+        self.statistics_panel.updateHistogram(decoded_image.content_hash, decoded_image.pixels)
+
+    def load_video(self, file_path):
+        if self.image_display.loadVideo(file_path):
+            reader = self.image_display.video_reader
+            self.current_image_path = file_path
+            self.statistics_panel.clearStats()
+            self.statistics_panel.updateStats(file_path, reader)
+            self.console.logMessage(f"Loaded video: {os.path.basename(file_path)} "
+                                    f"({reader.frame_count} frames at {reader.fps:.1f} fps)")
+        else:
+            self.console.logMessage(f"Failed to open video: {os.path.basename(file_path)}")
+            self.current_image_path = None
+            self.statistics_panel.clearStats()
 
     def load_image(self, file_path):
+        with tracer.span("load_image"):
+            self._load_image(file_path)
+
+    def _load_image(self, file_path):
         try:
-            pil_image = Image.open(file_path)
-            pil_image.verify()
-            pil_image = Image.open(file_path) 
-            
-            if self.image_display.loadImage(file_path):
+            # Decode once (or reuse a prefetched decode); display, statistics and inference all share the result
+            with tracer.span("load.fetch"):
+                decoded_image = self.prefetcher.load(file_path)
+
+            if self.image_display.loadImage(decoded_image):
                 self.current_image_path = file_path
-                self.statistics_panel.updateStats(file_path, pil_image)
+                with tracer.span("statistics"):
+                    self._update_statistics(file_path, decoded_image)
                 self.console.logMessage(f"Loaded image: {os.path.basename(file_path)}")
+                self.prefetcher.prefetch(self.file_browser.neighbourFiles(file_path, self.prefetch_count))
             else:
                 self.console.logMessage(f"Failed to display image: {os.path.basename(file_path)}")
                 self.current_image_path = None
@@ -0,0 +1,56 @@
+# overlay.py
+import numpy as np
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QPainter, QColor, QPen, QFont
+
+BOX_COLOR = QColor(0, 255, 0, 200)
+LABEL_BACKGROUND = QColor(0, 255, 0, 180)
+LABEL_TEXT_COLOR = QColor(0, 0, 0)
+
+
+def draw_detections(device, detections):
+    """
+    Draws boxes and "name confidence" labels for a Detections object onto a
+    QPixmap or QImage in one pass: all boxes, then all label backgrounds, then
+    the texts, with the pen, font and metrics set up once. Painting onto a
+    QImage is safe off the GUI thread.
+    """
+    if not len(detections):
+        return device
+
+    painter = QPainter(device)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    font = QFont()
+    font.setPointSize(max(8, int(device.width() / 80)))
+    painter.setFont(font)
+    metrics = painter.fontMetrics()
+    text_height = metrics.height()
+
+    boxes = detections.boxes.astype(np.int32)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    widths, heights = boxes[:, 2] - x1, boxes[:, 3] - y1
+    label_y = np.where(y1 - text_height > 0, y1 - text_height, y1)
+
+    labels = detections.labels()
+    advance = {}  # Labels repeat a lot (same class, rounded confidence), so measure each once
+    for label in labels:
+        if label not in advance:
+            advance[label] = metrics.horizontalAdvance(label) + 4
+    label_widths = [advance[label] for label in labels]
+
+    painter.setPen(QPen(BOX_COLOR, 2))
+    painter.setBrush(Qt.NoBrush)
+    painter.drawRects([QRect(*map(int, r)) for r in zip(x1, y1, widths, heights)])
+
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(LABEL_BACKGROUND)
+    painter.drawRects([QRect(int(x), int(y), w, text_height) for x, y, w in zip(x1, label_y, label_widths)])
+
+    painter.setPen(LABEL_TEXT_COLOR)
+    ascent = metrics.ascent()
+    for x, y, label in zip(x1.tolist(), label_y.tolist(), labels):
+        painter.drawText(x + 2, y + ascent, label)
+
+    painter.end()
+    return device
@@ -0,0 +1,112 @@
+# perceptual_hash.py
+"""
+Perceptual hashes for finding near-duplicate images.
+
+file_dhash() computes a 64-bit difference hash: the image is reduced to a
+9x8 grayscale grid and each bit records whether a cell is brighter than its
+left neighbour. Re-encodes, resizes and small brightness changes of the same
+picture land within a few bits of each other. JPEGs are decoded at reduced
+scale (PIL's draft mode), so hashing costs about a millisecond per file.
+
+group_near_duplicates() clusters a whole library without comparing every
+pair: by the pigeonhole principle two hashes within max_distance bits agree
+exactly on at least one of max_distance + 1 disjoint bit chunks, so only
+hashes that share a chunk value are compared, with vectorized popcounts.
+"""
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 comparisons -> 64-bit hashes
+DEFAULT_MAX_DISTANCE = 6  # Differing bits (out of 64) still counted as the same picture
+_HASH_BITS = HASH_SIZE * HASH_SIZE
+_BLOCK_ROWS = 1024  # Rows per pairwise distance block, bounding its memory
+
+# Fallback popcount for NumPy < 2.0, one table lookup per byte
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Returns the difference hash of a PIL image as an int."""
+    grid = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def file_dhash(file_path, hash_size=HASH_SIZE):
+    """Returns the difference hash of the image at file_path. Raises like Image.open for unreadable files."""
+    with Image.open(file_path) as img:
+        img.draft('L', (hash_size * 8, hash_size * 8))  # JPEG only: decode at 1/2..1/8 scale
+        return dhash(img, hash_size)
+
+
+def to_signed(value):
+    """Maps a 64-bit hash to the signed range SQLite integers can hold."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hash_array(values):
+    """Returns hashes stored with to_signed() (or plain non-negative ints) as a uint64 array."""
+    return np.array([to_signed(int(v)) for v in values], dtype=np.int64).view(np.uint64)
+
+
+def popcount(values):
+    """Number of set bits of each element of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    as_bytes = np.ascontiguousarray(values).view(np.uint8).reshape(values.shape + (8,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def hamming_distances(hashes, value):
+    """Bit differences between every hash in a uint64 array and one hash."""
+    return popcount(hashes ^ np.uint64(value))
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def group_near_duplicates(hashes, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Clusters a uint64 array of hashes into groups linked by pairs at most
+    max_distance bits apart (single linkage). Returns a list of sorted index
+    arrays, one per group of two or more, ordered by their first index.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    if len(hashes) < 2:
+        return []
+    # Identical hashes (re-encodes, blank frames) are merged up front so they never reach the pairwise step
+    unique, inverse = np.unique(hashes, return_inverse=True)
+    count = len(unique)
+    parents = list(range(count))
+
+    chunks = min(max_distance + 1, _HASH_BITS)
+    bounds = np.linspace(0, _HASH_BITS, chunks + 1).astype(int)
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        keys = (unique >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], count]
+        shared = ends - starts > 1
+        for start, end in zip(starts[shared], ends[shared]):
+            members = order[start:end]
+            for block in range(0, len(members), _BLOCK_ROWS):
+                rows_members = members[block:block + _BLOCK_ROWS]
+                close = popcount(unique[rows_members, None] ^ unique[None, members]) <= max_distance
+                close &= rows_members[:, None] < members[None, :]  # Each pair once, no self-pairs
+                rows, cols = np.nonzero(close)
+                for a, b in zip(rows_members[rows].tolist(), members[cols].tolist()):
+                    root_a, root_b = _find(parents, a), _find(parents, b)
+                    if root_a != root_b:
+                        parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([_find(parents, i) for i in range(count)])[inverse]
+    groups = {}
+    for i, root in enumerate(roots.tolist()):
+        groups.setdefault(root, []).append(i)
+    groups = [np.array(members) for members in groups.values() if len(members) > 1]
+    return sorted(groups, key=lambda members: members[0])
@@ -0,0 +1,101 @@
+# perf_trace.py
+"""
+Lightweight timing spans for the viewer's hot paths.
+
+    with tracer.span("decode"):
+        ...
+
+Each finished span feeds a rolling window of durations per stage (for the
+p50/p95/p99 in the performance panel) and a bounded event buffer that
+exportChromeTrace() writes in the Chrome trace event format, which
+chrome://tracing and https://ui.perfetto.dev open directly. Spans may be
+recorded from any thread and nest naturally. Tracing is off until something
+sets tracer.enabled; the viewer does so from its perf_tracing and
+performance_panel settings.
+"""
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_WINDOW = 500
+DEFAULT_MAX_EVENTS = 100000
+
+
+class Tracer:
+    def __init__(self, window=DEFAULT_WINDOW, max_events=DEFAULT_MAX_EVENTS, enabled=False):
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._durations = {}  # stage name -> deque of milliseconds
+        self._counts = collections.Counter()
+        self._events = collections.deque(maxlen=max_events)
+        self._origin_ns = time.perf_counter_ns()
+
+    @contextmanager
+    def span(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter_ns() - start, args)
+
+    def record(self, name, start_ns, duration_ns, args=None):
+        """Adds a finished span; start_ns is a time.perf_counter_ns() value."""
+        event = (name, start_ns, duration_ns, threading.get_ident(), args or None)
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = collections.deque(maxlen=self.window)
+            durations.append(duration_ns / 1e6)
+            self._counts[name] += 1
+            self._events.append(event)
+
+    def stats(self):
+        """Returns {stage: {count, last, mean, p50, p95, p99}} in milliseconds over each stage's rolling window."""
+        with self._lock:
+            snapshot = {name: (self._counts[name], np.fromiter(durations, dtype=np.float64))
+                        for name, durations in self._durations.items()}
+        stats = {}
+        for name, (count, values) in snapshot.items():
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            stats[name] = {'count': count, 'last': float(values[-1]), 'mean': float(values.mean()),
+                           'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+            self._events.clear()
+
+    def exportChromeTrace(self, path):
+        """Writes the buffered spans as Chrome trace JSON ("X" complete events, microseconds). Returns the event count."""
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        trace_events = []
+        for name, start_ns, duration_ns, tid, args in events:
+            event = {'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': (start_ns - self._origin_ns) / 1000.0, 'dur': duration_ns / 1000.0}
+            if args:
+                event['args'] = {k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in args.items()}
+            trace_events.append(event)
+        for tid in {event[3] for event in events}:
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                                 'args': {'name': thread_names.get(tid, str(tid))}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+# Process-wide tracer used by all instrumented modules; disabled until the viewer turns it on
+tracer = Tracer()
@@ -0,0 +1,97 @@
+# performance_panel_widget.py
+import logging
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QFileDialog, QAbstractItemView)
+from PyQt5.QtCore import Qt, QTimer
+
+from perf_trace import tracer
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_MS = 1000
+COLUMNS = ("Stage", "Count", "Last", "p50", "p95", "p99")
+
+
+class PerformancePanelWidget(QWidget):
+    """
+    Rolling per-stage timings (milliseconds) from perf_trace's tracer.
+
+    The table refreshes once a second while the panel is visible; Export
+    writes the buffered spans as a Chrome trace for chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self._refresh_timer.timeout.connect(self.refresh)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        label = QLabel("Performance (ms)")
+        label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        for column in range(1, len(COLUMNS)):
+            self.table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        layout.addWidget(self.table)
+
+        button_row = QHBoxLayout()
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.reset)
+        self.export_button = QPushButton("Export Trace...")
+        self.export_button.clicked.connect(lambda: self.exportTrace())
+        button_row.addWidget(self.reset_button)
+        button_row.addWidget(self.export_button)
+        layout.addLayout(button_row)
+
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._refresh_timer.stop()
+
+    def refresh(self):
+        stats = tracer.stats()
+        self.table.setRowCount(len(stats))
+        for row, name in enumerate(sorted(stats)):
+            stage = stats[name]
+            values = (name, str(stage['count']), f"{stage['last']:.1f}",
+                      f"{stage['p50']:.1f}", f"{stage['p95']:.1f}", f"{stage['p99']:.1f}")
+            for column, text in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                item.setText(text)
+
+    def reset(self):
+        tracer.reset()
+        self.refresh()
+
+    def exportTrace(self, path=None):
+        if not path:
+            path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Chrome trace (*.json)")
+            if not path:
+                return
+        try:
+            count = tracer.exportChromeTrace(path)
+            logger.info("Exported %s trace events to %s", count, path)
+        except OSError as e:
+            logger.error("Could not export trace to %s: %s", path, e)
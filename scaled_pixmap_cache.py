@@ -0,0 +1,62 @@
+# scaled_pixmap_cache.py
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QSize
+
+MAX_SCALED_ENTRIES = 8
+MIN_MIPMAP_SIZE = 64
+
+
+class ScaledPixmapCache:
+    """
+    Serves aspect-preserving scaled copies of one source pixmap.
+
+    Keeps a mipmap chain (each level half the size of the previous one, built
+    lazily with smooth filtering) so a scale always starts from the smallest
+    level that is still at least as large as the target, and remembers the
+    most recent smooth results so returning to a size costs nothing.
+    """
+
+    def __init__(self, pixmap, max_entries=MAX_SCALED_ENTRIES):
+        self.source = pixmap
+        self.max_entries = max_entries
+        self._levels = [pixmap]
+        self._scaled = OrderedDict()  # (width, height) -> smooth-scaled pixmap
+
+    def _level_for(self, target_size):
+        """Returns the smallest mipmap level that is still at least as large as the fitted target."""
+        fitted = self.source.size().scaled(target_size, Qt.KeepAspectRatio)
+        index = 0
+        while True:
+            level = self._levels[index]
+            if index + 1 == len(self._levels):
+                half = QSize(level.width() // 2, level.height() // 2)
+                if (min(half.width(), half.height()) < MIN_MIPMAP_SIZE
+                        or half.width() < fitted.width() or half.height() < fitted.height()):
+                    return level
+                self._levels.append(level.scaled(half, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+            smaller = self._levels[index + 1]
+            if smaller.width() < fitted.width() or smaller.height() < fitted.height():
+                return level
+            index += 1
+
+    def scaled(self, target_size, smooth=True):
+        """
+        Returns the source scaled to fit target_size. smooth=False trades quality
+        for speed (for use while the user is dragging a splitter or resizing).
+        """
+        key = (target_size.width(), target_size.height())
+        cached = self._scaled.get(key)
+        if cached is not None:
+            self._scaled.move_to_end(key)
+            return cached
+
+        level = self._level_for(target_size)
+        if not smooth:
+            return level.scaled(target_size, Qt.KeepAspectRatio, Qt.FastTransformation)
+
+        result = level.scaled(target_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._scaled[key] = result
+        while len(self._scaled) > self.max_entries:
+            self._scaled.popitem(last=False)
+        return result
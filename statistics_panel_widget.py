@@ -1,12 +1,83 @@
 # statistics_panel_widget.py
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QGridLayout
-from PyQt5.QtCore import Qt
-from PIL import Image 
+from PyQt5.QtCore import Qt, QPointF, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPolygonF, QPen
+
+from image_metadata import EXIF_FIELDS, HistogramCache
+
+logger = logging.getLogger(__name__)
+
+# Row labels for the EXIF fields, in EXIF_FIELDS order
+EXIF_LABELS = {
+    'Make': "Camera Make:",
+    'Model': "Camera Model:",
+    'DateTimeOriginal': "Taken:",
+    'ExposureTime': "Exposure:",
+    'FNumber': "Aperture:",
+    'ISOSpeedRatings': "ISO:",
+    'FocalLength': "Focal Length:",
+    'Orientation': "Orientation:",
+    'Software': "Software:",
+}
+
+
+def _format_exif(name, value):
+    try:
+        if name == 'ExposureTime':
+            value = float(value)
+            return f"1/{round(1 / value)} s" if 0 < value < 1 else f"{value:g} s"
+        if name == 'FNumber':
+            return f"f/{float(value):.1f}"
+        if name == 'FocalLength':
+            return f"{float(value):g} mm"
+    except (TypeError, ValueError, ZeroDivisionError):
+        pass
+    return str(value)
+
+
+class HistogramWidget(QWidget):
+    """Draws per-channel intensity histograms as overlaid outlines."""
+    CHANNEL_COLORS = (QColor(230, 60, 60), QColor(60, 200, 60), QColor(70, 110, 240))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.histogram = None
+        self.setMinimumHeight(100)
+
+    def setHistogram(self, histogram):
+        self.histogram = histogram
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(30, 30, 30))
+        if self.histogram is None:
+            return
+        painter.setRenderHint(QPainter.Antialiasing)
+        w, h = self.width(), self.height()
+        # Scale to the tallest bin of any channel, ignoring the extremes so clipped pixels don't flatten the rest
+        peak = max(1, int(self.histogram[:, 1:255].max()))
+        colors = self.CHANNEL_COLORS if len(self.histogram) == 3 else (QColor(200, 200, 200),)
+        for counts, color in zip(self.histogram, colors):
+            heights = (counts / peak).clip(0, 1) * (h - 2)
+            points = QPolygonF([QPointF(i * (w - 1) / 255.0, h - 1 - heights[i]) for i in range(256)])
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(points)
+
 
 class StatisticsPanelWidget(QWidget):
+    _histogram_computed = pyqtSignal(str, object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.histogram_cache = HistogramCache()
+        self._histogram_key = None
+        self._histogram_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="histogram")
+        self._histogram_computed.connect(self._on_histogram_computed)
         self.initUI()
 
     def initUI(self):
@@ -43,15 +114,39 @@ class StatisticsPanelWidget(QWidget):
         grid.addWidget(self.mode_label, 4, 0)
         grid.addWidget(self.mode_value, 4, 1)
         
+        # EXIF rows are only shown for images that carry the field
+        self.exif_labels = {}
+        self.exif_values = {}
+        for row, name in enumerate(EXIF_FIELDS, start=5):
+            self.exif_labels[name] = QLabel(EXIF_LABELS[name])
+            self.exif_values[name] = QLabel("-")
+            self.exif_values[name].setTextInteractionFlags(Qt.TextSelectableByMouse)
+            grid.addWidget(self.exif_labels[name], row, 0)
+            grid.addWidget(self.exif_values[name], row, 1)
+        self._show_exif({})
+
         layout.addLayout(grid)
+
+        histogram_label = QLabel("Histogram")
+        histogram_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(histogram_label)
+        self.histogram_widget = HistogramWidget()
+        layout.addWidget(self.histogram_widget)
+
         layout.addStretch() # Add spacer
         self.setLayout(layout)
 
-    def updateStats(self, file_path, pil_image):
+    def updateStats(self, file_path, pil_image, exif=None):
+        """
+        pil_image may be a PIL image, a DecodedImage or an ImageMetadata read
+        from the header alone; the latter two already know their file size, and
+        ImageMetadata also carries the EXIF fields. exif, if given, is shown instead.
+        """
         try:
             # Get file info
-            file_info = os.stat(file_path)
-            file_size = file_info.st_size
+            file_size = getattr(pil_image, 'file_size', None)
+            if file_size is None:
+                file_size = os.stat(file_path).st_size
             
             # Format file size
             if file_size < 1024:
@@ -67,14 +162,46 @@ class StatisticsPanelWidget(QWidget):
             self.format_value.setText(pil_image.format or "N/A")
             self.size_value.setText(size_str)
             self.mode_value.setText(pil_image.mode or "N/A")
+            self._show_exif((exif if exif is not None else getattr(pil_image, 'exif', None)) or {})
         except Exception as e:
-            print(f"Error updating stats: {e}") # Or log to console
+            logger.error("Error updating stats: %s", e)
             self.clearStats()
             self.filename_value.setText(f"Error reading stats")
 
+    def updateHistogram(self, content_hash, pixels):
+        """Shows the histogram of pixels, computing it on a background thread the first time content_hash is seen."""
+        self._histogram_key = content_hash
+        self._histogram_executor.submit(self._compute_histogram, content_hash, pixels)
+
+    def _compute_histogram(self, content_hash, pixels):
+        if content_hash != self._histogram_key:
+            return  # Superseded by a newer image before this job started
+        try:
+            self._histogram_computed.emit(content_hash, self.histogram_cache.get(content_hash, pixels))
+        except Exception as e:
+            logger.error("Error computing histogram: %s", e)
+
+    def _on_histogram_computed(self, content_hash, histogram):
+        if content_hash == self._histogram_key:
+            self.histogram_widget.setHistogram(histogram)
+
+    def _show_exif(self, exif):
+        for name in EXIF_FIELDS:
+            value = exif.get(name)
+            visible = value is not None
+            self.exif_values[name].setText(_format_exif(name, value) if visible else "-")
+            self.exif_labels[name].setVisible(visible)
+            self.exif_values[name].setVisible(visible)
+
+    def shutdown(self):
+        self._histogram_executor.shutdown(wait=False, cancel_futures=True)
+
     def clearStats(self):
         self.filename_value.setText("-")
         self.dimensions_value.setText("-")
         self.format_value.setText("-")
         self.size_value.setText("-")
-        self.mode_value.setText("-")
\ No newline at end of file
+        self.mode_value.setText("-")
+        self._show_exif({})
+        self._histogram_key = None
+        self.histogram_widget.setHistogram(None)
@@ -0,0 +1,108 @@
+# tests/test_evaluation.py
+"""Checks evaluation.py against hand-computed YOLOv5 val.py numbers; NumPy only."""
+import numpy as np
+import pytest
+
+from evaluation import EvaluationStats, box_iou, load_yolo_labels, match_predictions
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 50 / 150, 0.0]], atol=1e-6)
+
+
+def test_load_yolo_labels_converts_to_pixels(tmp_path):
+    label_file = tmp_path / "x.txt"
+    label_file.write_text("1 0.5 0.25 0.2 0.1\n\n")
+    np.testing.assert_allclose(load_yolo_labels(str(label_file), 200, 100), [[1, 80, 20, 120, 30]])
+    assert load_yolo_labels(str(tmp_path / "missing.txt"), 200, 100).shape == (0, 5)
+
+
+def test_matching_is_gated_by_class():
+    labels = np.array([[0, 0, 0, 10, 10]], dtype=float)
+    correct = match_predictions(np.array([[0, 0, 10, 10]], dtype=float), np.array([1.0]), labels)
+    assert not correct.any()
+
+
+def test_matching_is_one_to_one():
+    labels = np.array([[0, 0, 0, 10, 10]], dtype=float)
+    boxes = np.array([[0, 0, 10, 9.5], [0, 0, 10, 10]], dtype=float)  # Both overlap the one label
+    correct = match_predictions(boxes, np.array([0.0, 0.0]), labels)
+    # Only one true positive; as in YOLOv5 the label goes to the first (most confident) prediction
+    assert correct[:, 0].tolist() == [True, False]
+    # One prediction cannot match two labels either
+    labels = np.array([[0, 0, 0, 10, 10], [0, 0, 0, 10, 10]], dtype=float)
+    assert match_predictions(boxes[1:], np.array([0.0]), labels)[:, 0].tolist() == [True]
+
+
+def test_prediction_takes_its_highest_iou_label():
+    labels = np.array([[0, 0, 0, 10, 10], [0, 0, 0, 10, 12]], dtype=float)
+    boxes = np.array([[0, 0, 10, 12], [0, 0, 10, 6]], dtype=float)
+    # The first prediction overlaps both labels (IoU 0.83 and 1.0) but takes the exact one,
+    # leaving the first label for the second prediction, which only overlaps that one (IoU 0.6)
+    assert match_predictions(boxes, np.array([0.0, 0.0]), labels)[:, 0].tolist() == [True, True]
+
+
+def test_matching_per_iou_threshold():
+    labels = np.array([[0, 0, 0, 10, 10]], dtype=float)
+    correct = match_predictions(np.array([[0, 0, 10, 9.2]], dtype=float), np.array([0.0]), labels)
+    # IoU 0.92: a true positive at 0.50..0.90, not at 0.95
+    assert correct[0].tolist() == [True] * 9 + [False]
+
+
+def test_perfect_predictions():
+    stats = EvaluationStats()
+    labels = np.array([[0, 0, 0, 10, 10], [1, 20, 20, 40, 40]], dtype=float)
+    stats.add(np.array([[0, 0, 10, 10, 0.9, 0], [20, 20, 40, 40, 0.8, 1]]), labels)
+    summary = stats.summary()
+    assert summary['precision'] == pytest.approx(1.0)
+    assert summary['recall'] == pytest.approx(1.0)
+    # 101-point interpolation with the (1, 0) sentinel tops out at 0.995, as in YOLOv5
+    assert summary['map50'] == pytest.approx(0.995)
+    assert summary['map'] == pytest.approx(0.995)
+
+
+def test_ap_hand_computed():
+    # Two labels, a true positive at conf 0.9 and a false positive at 0.8:
+    # recall/precision (0.5, 1.0) then (0.5, 0.5). The precision envelope is 1 up to
+    # recall 0.5 and falls linearly to 0 at recall 1. Integrating it on the 101-point
+    # grid gives 0.5 - 0.0025 (the step at recall 0.5 lands on a grid point) + 0.125.
+    stats = EvaluationStats()
+    labels = np.array([[0, 0, 0, 10, 10], [0, 100, 100, 110, 110]], dtype=float)
+    stats.add(np.array([[0, 0, 10, 10, 0.9, 0], [50, 50, 60, 60, 0.8, 0]]), labels)
+    summary = stats.summary()
+    assert summary['map50'] == pytest.approx(0.6225)
+    assert summary['map'] == pytest.approx(0.6225)
+    assert summary['recall'] == pytest.approx(0.5)
+    assert summary['per_class'][0]['labels'] == 2
+
+
+def test_no_labels():
+    stats = EvaluationStats()
+    stats.add(np.array([[0, 0, 10, 10, 0.9, 0]]), np.zeros((0, 5)))
+    summary = stats.summary()
+    assert summary['images'] == 1
+    assert summary['labels'] == 0
+    assert (summary['precision'], summary['recall'], summary['map50'], summary['map']) == (0.0, 0.0, 0.0, 0.0)
+    assert summary['per_class'] == []
+
+
+def test_predictions_on_unlabelled_images_count_as_false_positives():
+    stats = EvaluationStats()
+    stats.add(np.array([[0, 0, 10, 10, 0.9, 0]]), np.array([[0, 0, 0, 10, 10]], dtype=float), key='a')
+    stats.add(np.array([[0, 0, 10, 10, 0.95, 0]]), np.zeros((0, 5)), key='b')
+    # The false positive ranks first: precision 0 then 0.5 at recall 1
+    assert stats.summary()['map50'] < 0.995
+
+
+def test_summary_does_not_depend_on_arrival_order():
+    labels = np.array([[0, 0, 0, 10, 10]], dtype=float)
+    hit = np.array([[0, 0, 10, 10, 0.5, 0]])
+    miss = np.array([[50, 50, 60, 60, 0.5, 0]])
+    forward, backward = EvaluationStats(), EvaluationStats()
+    forward.add(hit, labels, key='a')
+    forward.add(miss, labels, key='b')
+    backward.add(miss, labels, key='b')
+    backward.add(hit, labels, key='a')
+    assert forward.summary() == backward.summary()
@@ -0,0 +1,107 @@
+# tests/test_inference_backend.py
+"""Pre/post-processing of the NumPy backends and config loading; no runtime or weights needed."""
+import numpy as np
+import pytest
+
+from inference_backend import InferenceBackend, LETTERBOX_FILL, letterbox, non_max_suppression
+from viewer_config import DEFAULTS, _coerce, load_config
+
+
+def test_letterbox_scales_and_centers():
+    rgb = np.full((100, 200, 3), 7, dtype=np.uint8)
+    canvas, scale, (pad_x, pad_y) = letterbox(rgb, 64)
+    assert canvas.shape == (64, 64, 3)
+    assert scale == pytest.approx(0.32)
+    assert (pad_x, pad_y) == (0, 16)
+    assert (canvas[:16] == LETTERBOX_FILL).all() and (canvas[48:] == LETTERBOX_FILL).all()
+    assert (canvas[16:48] == 7).all()
+
+
+def test_letterbox_keeps_an_exact_fit():
+    rgb = np.arange(32 * 32 * 3, dtype=np.uint8).reshape(32, 32, 3)
+    canvas, scale, padding = letterbox(rgb, 32)
+    assert scale == 1 and padding == (0, 0)
+    assert np.array_equal(canvas, rgb)
+
+
+def _row(cx, cy, w, h, objectness, class_scores):
+    return [cx, cy, w, h, objectness, *class_scores]
+
+
+def test_nms_suppresses_overlaps_within_a_class_only():
+    prediction = np.array([
+        _row(50, 50, 20, 20, 0.9, [1.0, 0.0]),
+        _row(51, 50, 20, 20, 0.8, [1.0, 0.0]),  # Overlaps the first, same class: suppressed
+        _row(51, 50, 20, 20, 0.7, [0.0, 1.0]),  # Same place, other class: kept
+        _row(10, 10, 4, 4, 0.6, [1.0, 0.0]),    # Same class elsewhere: kept
+    ], dtype=np.float32)
+    result = non_max_suppression(prediction, conf_threshold=0.25, iou_threshold=0.45)
+    assert result.dtype == np.float32 and result.shape == (3, 6)
+    np.testing.assert_allclose(result[:, 4], [0.9, 0.7, 0.6], rtol=1e-6)
+    assert result[:, 5].tolist() == [0, 1, 0]
+    np.testing.assert_allclose(result[0, :4], [40, 40, 60, 60])
+
+
+def test_nms_confidence_is_objectness_times_class_score():
+    prediction = np.array([
+        _row(50, 50, 20, 20, 0.9, [0.2, 0.1]),  # 0.18: below the threshold despite the objectness
+        _row(10, 10, 4, 4, 0.5, [0.9, 0.1]),    # 0.45
+    ], dtype=np.float32)
+    result = non_max_suppression(prediction, conf_threshold=0.25, iou_threshold=0.45)
+    assert len(result) == 1
+    assert result[0, 4] == pytest.approx(0.45)
+
+
+def test_nms_empty_and_max_det():
+    assert non_max_suppression(np.zeros((0, 7), dtype=np.float32), 0.25, 0.45).shape == (0, 6)
+    rows = np.array([_row(i * 10, 0, 4, 4, 0.9, [1.0]) for i in range(5)], dtype=np.float32)
+    assert len(non_max_suppression(rows, 0.25, 0.45, max_det=3)) == 3
+
+
+def test_inference_backend_requires_forward():
+    assert '_forward' in InferenceBackend.__abstractmethods__
+
+
+def test_numpy_backend_maps_boxes_back_to_the_image(tmp_path):
+    weights = tmp_path / "w.onnx"
+    weights.write_bytes(b"")
+
+    class Fixed(InferenceBackend):
+        def _forward(self, batch):
+            # One box covering the middle half of the 64x64 letterboxed input
+            return np.array([[_row(32, 32, 32, 32, 0.9, [1.0])]], dtype=np.float32)
+
+    backend = Fixed(str(weights), img_size=64)
+    result = backend(np.zeros((100, 200, 3), dtype=np.uint8))
+    # Scale 0.32 with 16 rows of padding on top: input 16..48 -> image x 50..150, y 0..100
+    np.testing.assert_allclose(result.xyxy[0][0, :4], [50, 0, 150, 100], atol=1e-3)
+
+
+def test_coerce_follows_the_default_type():
+    assert _coerce("yes", False) is True
+    assert _coerce("0", True) is False
+    assert _coerce("4", 0) == 4
+    assert _coerce("0.5", 0.35) == pytest.approx(0.5)
+    assert _coerce(3, "torch") == "3"
+    with pytest.raises(ValueError):
+        _coerce("many", 0)
+
+
+def test_load_config_applies_file_then_environment(tmp_path):
+    config_file = tmp_path / "viewer_config.json"
+    config_file.write_text('{"batch_size": "16", "conf_threshold": 0.5, "unknown": 1}')
+    config = load_config(str(config_file), environ={"IMAGE_VIEWER_BATCH_SIZE": "4",
+                                                    "IMAGE_VIEWER_PERF_TRACING": "off",
+                                                    "IMAGE_VIEWER_IMG_SIZE": "large"})
+    assert config["batch_size"] == 4
+    assert config["conf_threshold"] == 0.5
+    assert config["perf_tracing"] is False
+    assert config["img_size"] == DEFAULTS["img_size"]  # Invalid override ignored
+    assert "unknown" not in config
+    assert config["weights_path"].endswith("best.pt")
+
+
+def test_load_config_ignores_an_unreadable_file(tmp_path):
+    config_file = tmp_path / "viewer_config.json"
+    config_file.write_text("{not json")
+    assert load_config(str(config_file), environ={})["batch_size"] == DEFAULTS["batch_size"]
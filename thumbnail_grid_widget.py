@@ -0,0 +1,227 @@
+# thumbnail_grid_widget.py
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyQt5.QtWidgets import QListView, QAbstractItemView
+from PyQt5.QtCore import (Qt, QAbstractListModel, QModelIndex, QObject, QSize, QTimer,
+                          pyqtSignal)
+from PyQt5.QtGui import QPixmap, QColor, QImage
+
+from thumbnail_store import ThumbnailStore, generate_thumbnail, DEFAULT_THUMBNAIL_SIZE
+
+logger = logging.getLogger(__name__)
+
+PIXMAP_CACHE_ENTRIES = 2000
+VISIBLE_MARGIN_ROWS = 2  # Rows above/below the viewport whose thumbnails are kept queued
+
+
+class ThumbnailLoader(QObject):
+    """
+    Supplies thumbnails from a ThumbnailStore, generating missing ones in a
+    process pool. thumbnailReady is emitted on the GUI thread.
+    """
+    thumbnailReady = pyqtSignal(str)
+    _generated = pyqtSignal(object)
+
+    def __init__(self, store=None, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.store = store or ThumbnailStore()
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._executor = None  # Started on first use so the worker processes cost nothing until needed
+        self._pending = {}  # path -> Future
+        self._pixmaps = OrderedDict()
+        self._generated.connect(self._on_generated)
+
+    def pixmap(self, file_path):
+        """Returns the thumbnail pixmap if available now, otherwise queues it and returns None."""
+        pixmap = self._pixmaps.get(file_path)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(file_path)
+            return pixmap
+        data = self.store.get(file_path)
+        if data is not None:
+            return self._remember(file_path, data)
+        self.request(file_path)
+        return None
+
+    def request(self, file_path):
+        if file_path in self._pending:
+            return
+        if self._executor is None:
+            # Workers start from a fresh interpreter: forking would copy the GUI's Qt state and threads
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        future = self._executor.submit(generate_thumbnail, file_path, self.store.size)
+        self._pending[file_path] = future
+        # Called from an executor thread; the signal hops back to the GUI thread
+        future.add_done_callback(self._generated.emit)
+
+    def cancelExcept(self, wanted_paths):
+        """Cancels queued generation for every path not in wanted_paths."""
+        for path, future in list(self._pending.items()):
+            if path not in wanted_paths and future.cancel():
+                del self._pending[path]
+
+    def shutdown(self):
+        if self._executor is not None:
+            # Thumbnails are quick to finish; waiting avoids tearing down workers mid-write
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+    def _remember(self, file_path, data):
+        pixmap = QPixmap.fromImage(QImage.fromData(data, "JPEG"))
+        self._pixmaps[file_path] = pixmap
+        while len(self._pixmaps) > PIXMAP_CACHE_ENTRIES:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def _on_generated(self, future):
+        if future.cancelled():
+            return
+        try:
+            file_path, file_size, mtime_ns, data, error = future.result()
+        except Exception as e:
+            # Raising here would abort the application from inside a slot
+            self._on_generation_error(future, e)
+            return
+        if self._pending.get(file_path) is future:
+            del self._pending[file_path]
+        if error:
+            logger.warning("Thumbnail generation failed for %s: %s", os.path.basename(file_path), error)
+            return
+        self.store.put(file_path, file_size, mtime_ns, data)
+        self._remember(file_path, data)
+        self.thumbnailReady.emit(file_path)
+
+    def _on_generation_error(self, future, error):
+        file_path = next((path for path, pending in self._pending.items() if pending is future), None)
+        if file_path is None:
+            return  # A request from a pool that has already been replaced
+        if not isinstance(error, BrokenProcessPool):
+            del self._pending[file_path]
+            logger.warning("Thumbnail generation failed for %s: %s", os.path.basename(file_path), error)
+            return
+        # A worker died (e.g. killed for memory); every queued request went down with the pool.
+        # The next request() starts a new one; cells still on screen ask again when they are repainted.
+        logger.error("Thumbnail worker process exited unexpectedly, restarting the pool: %s", error)
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+class ThumbnailModel(QAbstractListModel):
+    """List model over image files whose decorations are loaded lazily, only when a view asks for them."""
+
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.file_paths = []
+        self.captions = {}
+        self._rows = {}
+        self._placeholder = QPixmap(loader.store.size, loader.store.size)
+        self._placeholder.fill(QColor(60, 60, 60))
+        self.loader.thumbnailReady.connect(self._on_thumbnail_ready)
+
+    def setFiles(self, file_paths, captions=None):
+        self.beginResetModel()
+        self.file_paths = list(file_paths)
+        self.captions = captions or {}
+        self._rows = {path: row for row, path in enumerate(self.file_paths)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.file_paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        file_path = self.file_paths[index.row()]
+        if role == Qt.DisplayRole:
+            return self.captions.get(file_path) or os.path.basename(file_path)
+        if role == Qt.ToolTipRole:
+            return file_path
+        if role == Qt.DecorationRole:
+            return self.loader.pixmap(file_path) or self._placeholder
+        if role == Qt.UserRole:
+            return file_path
+        return None
+
+    def _on_thumbnail_ready(self, file_path):
+        row = self._rows.get(file_path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailGridWidget(QListView):
+    """
+    Virtualized grid of thumbnails. With uniform item sizes QListView only
+    queries data for cells in the viewport, so thumbnails are read or
+    generated for visible files only.
+    """
+    fileSelected = pyqtSignal(str)
+
+    def __init__(self, parent=None, thumbnail_size=DEFAULT_THUMBNAIL_SIZE):
+        super().__init__(parent)
+        self.loader = ThumbnailLoader(ThumbnailStore(size=thumbnail_size), parent=self)
+        self.thumbnail_model = ThumbnailModel(self.loader, self)
+        self.setModel(self.thumbnail_model)
+
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.setGridSize(QSize(thumbnail_size + 16, thumbnail_size + 32))
+        self.setTextElideMode(Qt.ElideMiddle)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        self.clicked.connect(self._on_item_chosen)
+
+        # Drop queued work for cells that scrolled away, once scrolling settles
+        self._scroll_timer = QTimer(self)
+        self._scroll_timer.setSingleShot(True)
+        self._scroll_timer.setInterval(100)
+        self._scroll_timer.timeout.connect(self._cancel_offscreen)
+        self.verticalScrollBar().valueChanged.connect(lambda _: self._scroll_timer.start())
+
+    def setFiles(self, file_paths, captions=None):
+        """Shows file_paths; captions optionally maps paths to the text shown instead of the file name."""
+        self.loader.cancelExcept(set())
+        self.thumbnail_model.setFiles(file_paths, captions)
+
+    def shutdown(self):
+        self.loader.shutdown()
+
+    def _visible_paths(self):
+        viewport = self.viewport().rect()
+        first = self.indexAt(viewport.topLeft())
+        last = self.indexAt(viewport.bottomRight())
+        if not first.isValid():
+            return set()
+        per_row = max(1, viewport.width() // max(1, self.gridSize().width()))
+        start = max(0, first.row() - VISIBLE_MARGIN_ROWS * per_row)
+        end = last.row() if last.isValid() else self.thumbnail_model.rowCount() - 1
+        end = min(self.thumbnail_model.rowCount() - 1, end + VISIBLE_MARGIN_ROWS * per_row)
+        return set(self.thumbnail_model.file_paths[start:end + 1])
+
+    def _cancel_offscreen(self):
+        self.loader.cancelExcept(self._visible_paths())
+
+    def keyPressEvent(self, event):
+        previous = self.currentIndex()
+        super().keyPressEvent(event)
+        if self.currentIndex() != previous:
+            self._on_item_chosen(self.currentIndex())
+
+    def _on_item_chosen(self, index):
+        if index.isValid():
+            self.fileSelected.emit(index.data(Qt.UserRole))
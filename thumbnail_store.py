@@ -0,0 +1,84 @@
+# thumbnail_store.py
+import io
+import os
+import sqlite3
+import threading
+
+from PIL import Image
+
+from app_paths import user_cache_dir
+
+DEFAULT_THUMBNAIL_SIZE = 128
+
+
+def generate_thumbnail(file_path, size=DEFAULT_THUMBNAIL_SIZE):
+    """
+    Builds a JPEG thumbnail no larger than size x size.
+
+    Runs in worker processes, so it only takes and returns picklable values:
+    (file_path, file_size, mtime_ns, jpeg_bytes or None, error message or None).
+    """
+    try:
+        st = os.stat(file_path)
+        with Image.open(file_path) as img:
+            # Lets the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+            img.draft('RGB', (size, size))
+            img = img.convert('RGB')
+            img.thumbnail((size, size), Image.BILINEAR)
+            out = io.BytesIO()
+            img.save(out, 'JPEG', quality=85)
+        return file_path, st.st_size, st.st_mtime_ns, out.getvalue(), None
+    except Exception as e:
+        return file_path, None, None, None, str(e)
+
+
+class ThumbnailStore:
+    """
+    On-disk thumbnail cache in SQLite, keyed by path and validated against
+    the source file's size and mtime.
+    """
+
+    def __init__(self, db_path=None, size=DEFAULT_THUMBNAIL_SIZE):
+        self.size = size
+        self.db_path = db_path or os.path.join(user_cache_dir(), f"thumbnails_{size}.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS thumbnails ("
+            " path TEXT PRIMARY KEY,"
+            " file_size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " data BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def get(self, file_path):
+        """Returns the stored JPEG bytes for file_path, or None if missing or stale."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_size, mtime_ns, data FROM thumbnails WHERE path=?", (self._key(file_path),)
+            ).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            return None
+        return row[2]
+
+    def put(self, file_path, file_size, mtime_ns, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)",
+                (self._key(file_path), file_size, mtime_ns, data),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
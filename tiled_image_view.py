@@ -0,0 +1,389 @@
+# tiled_image_view.py
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from PyQt5.QtWidgets import (QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsRectItem,
+                             QGraphicsSimpleTextItem)
+from PyQt5.QtCore import Qt, QObject, QRectF, pyqtSignal
+from PyQt5.QtGui import QPainter, QPen, QColor, QBrush
+
+from image_buffer import numpy_to_qimage
+from image_loader import MAX_FULL_DECODE_BYTES, draft_level, level_size
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+DEFAULT_LEVEL_BUDGET_BYTES = MAX_FULL_DECODE_BYTES
+MAX_CACHED_TILES = 256
+MIN_ZOOM = 0.01
+MAX_ZOOM = 32.0
+
+
+def _decode_level(file_path, level, size):
+    """Decodes file_path at 1/2**level resolution, letting the JPEG decoder downscale where it can."""
+    with Image.open(file_path) as img:
+        reduce_by = draft_level(img, level)
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        if reduce_by > 1:
+            img = img.reduce(reduce_by)
+        if img.size != size:
+            img = img.resize(size, Image.BILINEAR)
+        return np.asarray(img)
+
+
+def _limit_rows(img, rows):
+    """
+    Makes the next load() of an opened img decode only its first `rows` rows,
+    for single-stream top-down formats (baseline JPEG, non-interlaced PNG).
+    Returns False, leaving img untouched, for anything else.
+    """
+    if len(img.tile) != 1 or img.tile[0][0] not in ('jpeg', 'zip') or img.info.get('interlace'):
+        return False
+    tile = img.tile[0]
+    extents = (0, 0, img.width, rows)
+    img.tile = [tile._replace(extents=extents) if hasattr(tile, '_replace') else (tile[0], extents) + tuple(tile[2:])]
+    img._size = (img.width, rows)
+    return True
+
+
+def _decode_rows(file_path, level, top, bottom, channels):
+    """
+    Decodes rows [top, bottom) of file_path's 1/2**level resolution level.
+    Decoding stops after the last row needed; the rows above it are decoded
+    and dropped (no format PIL reads can seek to a row), but nothing below it is.
+    """
+    with Image.open(file_path) as img:
+        reduce_by = draft_level(img, level)
+        src_top, src_bottom = top * reduce_by, min(img.height, bottom * reduce_by)
+        limited = _limit_rows(img, src_bottom)
+        try:
+            img.load()
+        except OSError:
+            # libjpeg reports the rest of the stream, left unread once the rows are filled, as broken
+            if not limited:
+                raise
+        band = img.crop((0, src_top, img.width, src_bottom))
+    band = band.convert('RGBA' if channels == 4 else 'RGB')
+    if reduce_by > 1:
+        band = band.reduce(reduce_by)
+    return np.asarray(band)
+
+
+class TiledImageSource(QObject):
+    """
+    Multi-resolution tile provider for one image.
+
+    Level k is the image at 1/2**k scale. Levels are decoded on a background
+    thread only when a view asks for them, derived from an already decoded
+    finer level when possible. A level that alone would exceed budget_bytes,
+    such as full resolution of a very large photo, is never decoded whole:
+    its tiles come from bands of TILE_SIZE rows decoded on demand for the
+    rows in view. Whole levels and bands share one LRU bounded by
+    budget_bytes, and tiles are cut lazily into a bounded LRU as well, so
+    memory stays bounded whatever the source size. levelReady is emitted on
+    the GUI thread when a requested level or band is available.
+    """
+    levelReady = pyqtSignal(int)
+    _decoded = pyqtSignal(object, object)
+
+    def __init__(self, file_path, base_pixels=None, base_level=0, budget_bytes=DEFAULT_LEVEL_BUDGET_BYTES,
+                 parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.budget_bytes = budget_bytes
+        if base_pixels is not None and base_level == 0:
+            self.height, self.width = base_pixels.shape[:2]
+            self.channels = base_pixels.shape[2]
+        else:
+            with Image.open(file_path) as img:
+                self.width, self.height = img.size
+                self.channels = 4 if 'A' in img.getbands() else 3
+            if base_pixels is not None:
+                self.channels = base_pixels.shape[2]
+        self.level_count = 1
+        while max(self.width, self.height) >> self.level_count >= TILE_SIZE:
+            self.level_count += 1
+
+        self._pixels = OrderedDict()  # level -> whole level, or (level, band) -> TILE_SIZE rows of a banded level
+        self._pixels_lock = threading.Lock()
+        self._requested = set()
+        self._wanted_bands = set()  # (level, band) waiting for the decode thread
+        self._tiles = OrderedDict()  # (level, col, row) -> QImage
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiles")
+        self._decoded.connect(self._on_decoded)
+        if base_pixels is not None and base_level < self.level_count and not self.isBanded(base_level):
+            self._pixels[base_level] = base_pixels
+
+    def levelSize(self, level):
+        return level_size((self.width, self.height), level)
+
+    def _level_bytes(self, level):
+        w, h = self.levelSize(level)
+        return w * h * self.channels
+
+    def isBanded(self, level):
+        """True if level is too large to decode whole and is served in bands (see bandPixels)."""
+        return self._level_bytes(level) > self.budget_bytes
+
+    def affordableLevel(self, level):
+        """Returns the finest level at or above `level` that can be decoded whole within the memory budget."""
+        level = min(max(0, level), self.level_count - 1)
+        while level < self.level_count - 1 and self.isBanded(level):
+            level += 1
+        return level
+
+    def levelPixels(self, level):
+        """Returns the pixels of level if decoded, otherwise schedules its decode and returns None."""
+        with self._pixels_lock:
+            pixels = self._pixels.get(level)
+            if pixels is not None:
+                self._pixels.move_to_end(level)
+                return pixels
+            finer = [(lvl, px) for lvl, px in self._pixels.items() if isinstance(lvl, int) and lvl < level]
+        if level not in self._requested:
+            self._requested.add(level)
+            source = max(finer, key=lambda item: item[0]) if finer else None
+            self._executor.submit(self._build_level, level, source)
+        return None
+
+    def bandPixels(self, level, band):
+        """
+        Returns rows [band * TILE_SIZE, (band + 1) * TILE_SIZE) of a banded
+        level if decoded, otherwise schedules their decode and returns None.
+        """
+        key = (level, band)
+        with self._pixels_lock:
+            pixels = self._pixels.get(key)
+            if pixels is not None:
+                self._pixels.move_to_end(key)
+                return pixels
+            if key in self._requested:
+                return None
+            self._requested.add(key)
+            self._wanted_bands.add(key)
+        self._executor.submit(self._build_bands)
+        return None
+
+    def bestLoadedLevel(self, level):
+        """Returns (level, pixels) for the whole level loaded closest to `level`, preferring finer ones, or (None, None)."""
+        with self._pixels_lock:
+            loaded = [lvl for lvl in self._pixels if isinstance(lvl, int)]
+            if not loaded:
+                return None, None
+            best = min(loaded, key=lambda lvl: (abs(lvl - level), lvl))
+            return best, self._pixels[best]
+
+    def tile(self, level, pixels, col, row, band=False):
+        """The QImage of tile (col, row) of level, cut from the level's pixels or, with band=True, from row's band."""
+        key = (level, col, row)
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+            return image
+        y0, x0 = 0 if band else row * TILE_SIZE, col * TILE_SIZE
+        image = numpy_to_qimage(pixels[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE])
+        self._tiles[key] = image
+        while len(self._tiles) > MAX_CACHED_TILES:
+            self._tiles.popitem(last=False)
+        return image
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _build_level(self, level, source):
+        try:
+            size = self.levelSize(level)
+            if source is not None:
+                source_level, source_pixels = source
+                img = Image.fromarray(source_pixels).reduce(1 << (level - source_level))
+                if img.size != size:
+                    img = img.resize(size, Image.BILINEAR)
+                pixels = np.asarray(img)
+            else:
+                pixels = _decode_level(self.file_path, level, size)
+            self._decoded.emit(level, pixels)
+        except Exception as e:
+            logger.warning("Tile level %s decode failed for %s: %s", level, os.path.basename(self.file_path), e)
+
+    def _build_bands(self):
+        with self._pixels_lock:
+            wanted = sorted(self._wanted_bands)
+            self._wanted_bands.clear()
+        # One decode per level covers every band asked for since the last one
+        for level in sorted({level for level, _ in wanted}):
+            bands = [band for lvl, band in wanted if lvl == level]
+            first = min(bands)
+            try:
+                rows = _decode_rows(self.file_path, level, first * TILE_SIZE, (max(bands) + 1) * TILE_SIZE,
+                                    self.channels)
+            except Exception as e:
+                logger.warning("Tile band decode at level %s failed for %s: %s", level,
+                               os.path.basename(self.file_path), e)
+                continue
+            for band in bands:
+                start = (band - first) * TILE_SIZE
+                # A copy, so the decoded range is freed once every band is cut from it
+                self._decoded.emit((level, band), rows[start:start + TILE_SIZE].copy())
+
+    def _on_decoded(self, key, pixels):
+        self._requested.discard(key)
+        with self._pixels_lock:
+            self._pixels[key] = pixels
+            total = sum(px.nbytes for px in self._pixels.values())
+            while total > self.budget_bytes and len(self._pixels) > 1:
+                evicted_key, evicted = self._pixels.popitem(last=False)
+                total -= evicted.nbytes
+                if isinstance(evicted_key, int):
+                    self._tiles = OrderedDict((k, v) for k, v in self._tiles.items() if k[0] != evicted_key)
+                else:
+                    self._tiles = OrderedDict((k, v) for k, v in self._tiles.items()
+                                              if (k[0], k[2]) != evicted_key)
+        self.levelReady.emit(key if isinstance(key, int) else key[0])
+
+
+class _TileLayerItem(QGraphicsItem):
+    """Scene item that paints only the tiles intersecting the exposed area, at the level matching the zoom."""
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.source.width, self.source.height)
+
+    def paint(self, painter, option, widget=None):
+        scale = painter.worldTransform().m11()
+        ideal = int(math.floor(math.log2(1.0 / scale))) if 0 < scale < 1 else 0
+        wanted = min(ideal, self.source.level_count - 1)
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        whole = self.source.affordableLevel(wanted)
+        pixels = self.source.levelPixels(whole)
+        level = whole
+        if pixels is None:
+            level, pixels = self.source.bestLoadedLevel(whole)
+        if pixels is not None:
+            # Under a banded level this is the stand-in for bands that are still being decoded
+            self._paint_tiles(painter, scale, exposed, level, pixels)
+        if whole != wanted:
+            self._paint_bands(painter, scale, exposed, wanted)
+
+    def _tile_range(self, exposed, span):
+        cols = range(int(exposed.left() // span), int(exposed.right() // span) + 1)
+        rows = range(int(exposed.top() // span), int(exposed.bottom() // span) + 1)
+        return cols, rows
+
+    def _paint_tiles(self, painter, scale, exposed, level, pixels):
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, scale < (1.0 / (1 << level)))
+        factor = 1 << level
+        span = TILE_SIZE * factor
+        level_h, level_w = pixels.shape[:2]
+        cols, rows = self._tile_range(exposed, span)
+        for row in rows:
+            for col in cols:
+                if col * TILE_SIZE >= level_w or row * TILE_SIZE >= level_h:
+                    continue
+                image = self.source.tile(level, pixels, col, row)
+                target = QRectF(col * span, row * span, image.width() * factor, image.height() * factor)
+                painter.drawImage(target, image)
+
+    def _paint_bands(self, painter, scale, exposed, level):
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, scale < (1.0 / (1 << level)))
+        factor = 1 << level
+        span = TILE_SIZE * factor
+        level_w, level_h = self.source.levelSize(level)
+        cols, rows = self._tile_range(exposed, span)
+        for row in rows:
+            if row * TILE_SIZE >= level_h:
+                continue
+            band = self.source.bandPixels(level, row)
+            if band is None:
+                continue
+            for col in cols:
+                if col * TILE_SIZE >= level_w:
+                    continue
+                image = self.source.tile(level, band, col, row, band=True)
+                target = QRectF(col * span, row * span, image.width() * factor, image.height() * factor)
+                painter.drawImage(target, image)
+
+
+class TiledImageView(QGraphicsView):
+    """Pan/zoom viewer for large images; wheel zooms around the cursor, drag pans."""
+    zoomChanged = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        self.setBackgroundBrush(QBrush(QColor(30, 30, 30)))
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.source = None
+        self._tile_item = None
+        self._overlay_items = []
+
+    def setImage(self, file_path, base_pixels=None, base_level=0):
+        """Shows file_path; base_pixels, if already decoded, are its level base_level (0 for full resolution)."""
+        self.clear()
+        self.source = TiledImageSource(file_path, base_pixels, base_level, parent=self)
+        self.source.levelReady.connect(lambda _: self.viewport().update())
+        self._tile_item = _TileLayerItem(self.source)
+        self.scene().addItem(self._tile_item)
+        self.scene().setSceneRect(self._tile_item.boundingRect())
+        self.fitToWindow()
+
+    def setDetections(self, detections):
+        """Overlays detection boxes as separate items so zooming never redraws the image pixels."""
+        for item in self._overlay_items:
+            self.scene().removeItem(item)
+        self._overlay_items = []
+        if self.source is None:
+            return
+        pen = QPen(QColor(0, 255, 0, 200), 2)
+        pen.setCosmetic(True)  # Constant on-screen width at every zoom level
+        for (xmin, ymin, xmax, ymax), text in zip(detections.boxes.tolist(), detections.labels()):
+            rect = QGraphicsRectItem(xmin, ymin, xmax - xmin, ymax - ymin)
+            rect.setPen(pen)
+            label = QGraphicsSimpleTextItem(text)
+            label.setBrush(QColor(0, 255, 0))
+            label.setPos(xmin, ymin)
+            label.setFlag(QGraphicsItem.ItemIgnoresTransformations, True)
+            for item in (rect, label):
+                item.setZValue(1)
+                self.scene().addItem(item)
+                self._overlay_items.append(item)
+
+    def clear(self):
+        if self.source is not None:
+            self.source.shutdown()
+            self.source.deleteLater()
+        self.scene().clear()
+        self.source = None
+        self._tile_item = None
+        self._overlay_items = []
+
+    def zoomFactor(self):
+        return self.transform().m11()
+
+    def fitToWindow(self):
+        if self._tile_item is not None:
+            self.fitInView(self._tile_item, Qt.KeepAspectRatio)
+            self.zoomChanged.emit(self.zoomFactor())
+
+    def zoomBy(self, factor):
+        new_zoom = self.zoomFactor() * factor
+        if MIN_ZOOM <= new_zoom <= MAX_ZOOM:
+            self.scale(factor, factor)
+            self.zoomChanged.emit(new_zoom)
+
+    def wheelEvent(self, event):
+        if self.source is None:
+            return
+        self.zoomBy(1.25 if event.angleDelta().y() > 0 else 0.8)
@@ -0,0 +1,206 @@
+# video_source.py
+"""
+Video files as a stream of frames.
+
+VideoReader decodes one frame at a time through OpenCV, so a video is never
+held in memory as a whole; frames() walks it sequentially (skipped frames
+are grabbed without being converted) and readFrame() seeks for scrubbing.
+VideoAnalyzer runs the detection model over a video at a sampling rate,
+batching sampled frames into the model and skipping frames that are nearly
+identical to the last analyzed one.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from detections import detections_from_results
+from perf_trace import tracer
+
+logger = logging.getLogger(__name__)
+
+VIDEO_FORMATS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.wmv')
+DIFFERENCE_SIZE = 64  # Frames are compared on a grayscale grid of about this many points per side
+
+
+class VideoReader:
+    """
+    Sequential and random access to the frames of a video file as read-only
+    (H, W, 3) RGB uint8 arrays. Has the width/height/format/mode/file_size
+    attributes the statistics panel reads. Not thread-safe; use one reader per thread.
+    """
+
+    def __init__(self, file_path):
+        try:
+            import cv2  # Deferred: only needed once a video is opened
+        except ImportError as e:
+            raise ImportError("Reading video files requires OpenCV (pip install opencv-python)") from e
+        self._cv2 = cv2
+        self.file_path = file_path
+        self._capture = cv2.VideoCapture(file_path)
+        if not self._capture.isOpened():
+            raise OSError(f"Cannot open video {file_path}")
+        self.frame_count = max(0, int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.format = os.path.splitext(file_path)[1].lstrip('.').upper() or None
+        self.mode = 'RGB'
+        self.file_size = os.path.getsize(file_path)
+        self._next_index = 0  # Index of the frame the next read() returns
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._capture.release()
+
+    def timestamp(self, index):
+        """Seconds from the start of the video to frame index."""
+        return index / self.fps if self.fps > 0 else 0.0
+
+    def _to_rgb(self, bgr):
+        rgb = self._cv2.cvtColor(bgr, self._cv2.COLOR_BGR2RGB)
+        rgb.setflags(write=False)
+        return rgb
+
+    def readFrame(self, index):
+        """Returns frame index as RGB, or None past the end. Reading index + 1 next avoids a seek."""
+        with tracer.span("video.read_frame"):
+            if index != self._next_index:
+                self._capture.set(self._cv2.CAP_PROP_POS_FRAMES, index)
+            ok, bgr = self._capture.read()
+            if not ok:
+                self._next_index = -1  # Position unknown; seek on the next call
+                return None
+            self._next_index = index + 1
+            return self._to_rgb(bgr)
+
+    def frames(self, step=1, start=0):
+        """Yields (index, rgb) for every step-th frame from start; the frames in between are grabbed but not decoded to RGB."""
+        step = max(1, int(step))
+        if start != self._next_index:
+            self._capture.set(self._cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while True:
+            if (index - start) % step:
+                ok = self._capture.grab()
+                bgr = None
+            else:
+                ok, bgr = self._capture.read()
+            if not ok:
+                self._next_index = -1
+                return
+            self._next_index = index + 1
+            if bgr is not None:
+                yield index, self._to_rgb(bgr)
+            index += 1
+
+
+def sample_step(fps, sample_fps):
+    """Frames to advance between analyzed frames so that about sample_fps frames per second are analyzed; 0 analyzes every frame."""
+    if sample_fps <= 0 or fps <= 0:
+        return 1
+    return max(1, int(round(fps / sample_fps)))
+
+
+def difference_signature(rgb):
+    """A small float32 grayscale grid of the frame, taken by striding rather than resizing."""
+    stride_y = max(1, rgb.shape[0] // DIFFERENCE_SIZE)
+    stride_x = max(1, rgb.shape[1] // DIFFERENCE_SIZE)
+    grid = rgb[::stride_y, ::stride_x, :3].astype(np.float32)
+    return grid @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def frame_difference(signature_a, signature_b):
+    """Mean absolute grayscale difference (0-255) between two difference_signature grids."""
+    if signature_a.shape != signature_b.shape:
+        return float('inf')
+    return float(np.abs(signature_a - signature_b).mean())
+
+
+class VideoAnalyzer(QObject):
+    """
+    Runs the detection model over a video's sampled frames, batch_size frames per forward pass.
+
+    A sampled frame whose difference from the last analyzed frame is at most
+    duplicate_threshold reuses that frame's detections instead of being
+    batched. Only the frames of the batch being filled are held in memory.
+    run() is meant to be executed on an InferenceWorkerPool thread; progress
+    is delivered on the GUI thread like BatchAnalyzer's.
+    """
+    # frames read so far, total frames (0 if unknown), analyzed frames per second
+    progress = pyqtSignal(int, int, float)
+
+    def __init__(self, model, sample_fps=5.0, batch_size=8, duplicate_threshold=2.0, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.sample_fps = sample_fps
+        self.batch_size = max(1, int(batch_size))
+        self.duplicate_threshold = duplicate_threshold
+
+    def run(self, file_path, cancel_event=None):
+        """
+        Returns a dict with 'detections' ({frame index: Detections} for every
+        sampled frame, duplicates included), 'duplicates' ({frame index: index
+        whose detections it reuses}), 'step', 'frame_count', 'analyzed' and 'elapsed'.
+        """
+        start = time.perf_counter()
+        detections = {}
+        duplicates = {}
+        analyzed = 0
+        batch = []  # (index, rgb) waiting for the model
+        last_signature = None
+        last_index = None
+
+        def flush():
+            nonlocal analyzed
+            with tracer.span("inference.batch", images=len(batch)):
+                results = self.model([rgb for _, rgb in batch])
+            for (index, _), frame_detections in zip(batch, detections_from_results(results)):
+                detections[index] = frame_detections
+            analyzed += len(batch)
+            batch.clear()
+
+        with VideoReader(file_path) as reader:
+            step = sample_step(reader.fps, self.sample_fps)
+            frame_count = reader.frame_count
+            for index, rgb in reader.frames(step):
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.debug("Video analysis cancelled.")
+                    break
+                signature = difference_signature(rgb)
+                if last_signature is not None and frame_difference(signature, last_signature) <= self.duplicate_threshold:
+                    duplicates[index] = last_index
+                    continue
+                last_signature, last_index = signature, index
+                batch.append((index, rgb))
+                if len(batch) >= self.batch_size:
+                    flush()
+                    elapsed = time.perf_counter() - start
+                    self.progress.emit(index + 1, frame_count, analyzed / elapsed if elapsed > 0 else 0.0)
+            if batch and not (cancel_event is not None and cancel_event.is_set()):
+                flush()
+
+        for index, source in duplicates.items():
+            if source in detections:
+                detections[index] = detections[source]
+        elapsed = time.perf_counter() - start
+        logger.debug("Video analysis: %s frames analyzed, %s near-duplicates skipped.", analyzed, len(duplicates))
+        return {
+            'detections': detections,
+            'duplicates': duplicates,
+            'step': step,
+            'frame_count': frame_count,
+            'analyzed': analyzed,
+            'elapsed': elapsed,
+        }
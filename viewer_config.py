@@ -0,0 +1,97 @@
+# viewer_config.py
+"""
+Viewer settings.
+
+Defaults below can be overridden by a viewer_config.json file next to this
+module (same keys) and then by IMAGE_VIEWER_<KEY> environment variables,
+e.g. IMAGE_VIEWER_BACKEND=onnx.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(APP_DIR, "viewer_config.json")
+WEIGHTS_DIR = os.path.join(APP_DIR, "AIModel", "experiment1_gpu", "weights")
+
+DEFAULTS = {
+    # "torch" (YOLOv5 via torch.hub), "torchscript" or "onnx" (ONNX Runtime)
+    "backend": "torch",
+    # .pt for the torch backend; the exported .torchscript / .onnx file otherwise.
+    # Empty means <WEIGHTS_DIR>/best.pt|best.torchscript|best.onnx depending on the backend.
+    "weights_path": "",
+    # Local clone of ultralytics/yolov5 for the torch backend; empty tries torch.hub's cache before GitHub
+    "yolov5_repo": "",
+    # Initial display threshold; the confidence slider changes it without re-running the model
+    "conf_threshold": 0.35,
+    # Inference keeps every detection above this floor so the slider can go lower without a new forward pass
+    "conf_floor": 0.05,
+    "iou_threshold": 0.45,
+    "img_size": 640,
+    # Intra-op threads for CPU inference; 0 lets the runtime decide (or, with several workers, shares the cores evenly)
+    "cpu_threads": 0,
+    # Processes CPU inference runs in: 0 measures the process/thread splits when a model is first loaded
+    # on a machine (cached afterwards) and uses the fastest, 1 runs the model in the viewer itself,
+    # N splits every batch across N worker processes. GPU inference always runs in-process.
+    "cpu_workers": 0,
+    "batch_size": 8,
+    # Queue images that appear in the watched folder for analysis as soon as they are written
+    "auto_analyze_new_files": False,
+    # DEBUG, INFO, WARNING or ERROR; the console panel always shows INFO and above
+    "log_level": "INFO",
+    # Perceptual-hash bits (out of 64) within which two images count as near-duplicates
+    "duplicate_max_distance": 6,
+    # What folder analysis does with near-duplicates of an image in the same run:
+    # "reuse" its detections, "skip" them, or "analyze" every image anyway
+    "batch_duplicates": "reuse",
+    # Frames per second analyzed when a video is analyzed; 0 analyzes every frame
+    "video_sample_fps": 5.0,
+    # Sampled frames whose mean grayscale difference (0-255) from the last analyzed frame is at most this reuse its detections
+    "video_duplicate_threshold": 2.0,
+    # Record timing spans around loading, display, drawing and inference; always on with the
+    # performance panel or main.py --trace-out
+    "perf_tracing": False,
+    # Show per-stage p50/p95/p99 timings under the statistics panel
+    "performance_panel": False,
+    # Threads rendering annotated images when a folder is exported
+    "export_workers": 4,
+}
+
+_WEIGHTS_SUFFIXES = {"torch": ".pt", "torchscript": ".torchscript", "onnx": ".onnx"}
+
+
+def _coerce(value, default):
+    if isinstance(default, bool):
+        return str(value).lower() in ("1", "true", "yes", "on")
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return str(value)
+
+
+def load_config(path=CONFIG_FILE, environ=None):
+    """Returns the settings dict with file and environment overrides applied."""
+    environ = os.environ if environ is None else environ
+    config = dict(DEFAULTS)
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+            config.update({k: _coerce(v, DEFAULTS[k]) for k, v in overrides.items() if k in DEFAULTS})
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable config file %s: %s", path, e)
+    for key, default in DEFAULTS.items():
+        env_value = environ.get(f"IMAGE_VIEWER_{key.upper()}")
+        if env_value is not None:
+            try:
+                config[key] = _coerce(env_value, default)
+            except ValueError:
+                logger.warning("Ignoring invalid IMAGE_VIEWER_%s=%r", key.upper(), env_value)
+    if not config["weights_path"]:
+        config["weights_path"] = default_weights_path(config["backend"])
+    return config
+
+
+def default_weights_path(backend):
+    return os.path.join(WEIGHTS_DIR, "best" + _WEIGHTS_SUFFIXES.get(backend, ".pt"))